@@ -0,0 +1,97 @@
+"""
+Per-call overhead of the CRUD point lookups, statements rebuilt per call vs reused
+
+Times building a `SELECT ... WHERE tag = ?` plus its cache key (pure Python, what every call paid before statements
+were reused), then whole `get_by_tag` round trips against a throwaway database with `--rows` inbounds.
+
+```shell
+python benchmarks/crud_statements.py --rows 10000 --calls 20000
+```
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+
+
+def _row(i: int) -> dict:
+    return dict(
+        user_id=1, up=0, down=0, total=0, remark=f'remark-{i}', enable=True, expiry_time=0, listen='', port=i + 1,
+        protocol='vless', settings='{}', stream_settings='{}', tag=f'inbound-{i + 1}', sniffing='{}',
+    )
+
+
+def timed(func, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def timed_async(func, calls: int) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        await func(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def main(rows: int, calls: int) -> None:
+    from sqlalchemy import text
+    from sqlalchemy.future import select
+
+    from xtls_crud.database import crud
+    from xtls_crud.database.db.session import engine, get_session
+    from xtls_crud.database.models.inbounds import Inbounds
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+    await crud.inbounds.create_many(objs_in=[_row(i) for i in range(rows)], chunk_size=900)
+
+    def tag(i: int) -> str:
+        return f'inbound-{i % rows + 1}'
+
+    build = {
+        'rebuilt': lambda i: select(Inbounds).filter_by(tag=tag(i))._generate_cache_key(),
+        'reused': lambda i: crud.inbounds._select_by('tag')._generate_cache_key(),
+    }
+
+    async def rebuilt(i: int):
+        _ = await crud.inbounds.session.execute(select(Inbounds).filter_by(tag=tag(i)))
+        return _.scalar_one_or_none()
+
+    async def reused(i: int):
+        return await crud.inbounds.get_by_tag(tag=tag(i))
+
+    results = {name: [timed(func, calls)] for name, func in build.items()}
+    async with get_session():
+        results['rebuilt'].append(await timed_async(rebuilt, calls))
+    async with get_session():
+        results['reused'].append(await timed_async(reused, calls))
+
+    print(f'{rows} rows, {calls} lookups by tag, microseconds per call')
+    print(f'{"statement":<15}{"build + key":>15}{"get_by_tag":>15}')
+    for name, (built, looked_up) in results.items():
+        print(f'{name:<15}{built:>15.1f}{looked_up:>15.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000, help='Inbounds in the table')
+    parser.add_argument('--calls', type=int, default=20000, help='Lookups per variant')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ASYNC_DB_URL'] = f'sqlite+aiosqlite:///{directory}/x-ui.db'
+        asyncio.run(main(args.rows, args.calls))
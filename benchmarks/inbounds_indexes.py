@@ -0,0 +1,92 @@
+"""
+Query latency on the inbounds table before and after the optional secondary indexes
+
+Fills a throwaway database with `--rows` inbounds, then times the filtered reads that used to scan the whole table.
+
+```shell
+python benchmarks/inbounds_indexes.py --rows 100000
+```
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+PROTOCOLS = ('vmess', 'vless', 'trojan', 'shadowsocks')
+
+
+def _row(i: int) -> dict:
+    return dict(
+        user_id=i % 1000, up=0, down=0, total=0, remark=f'remark-{i}', enable=i % 10 != 0,
+        expiry_time=1_700_000_000_000 + i * 60_000, listen='', port=i + 1, protocol=PROTOCOLS[i % len(PROTOCOLS)],
+        settings='{}', stream_settings='{}', tag=f'inbound-{i + 1}', sniffing='{}',
+    )
+
+
+async def timed(query, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await query()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def main(rows: int, repeat: int) -> None:
+    from sqlalchemy import select, text
+
+    from xtls_crud.database import crud
+    from xtls_crud.database.db import indexes
+    from xtls_crud.database.db.session import engine, get_session
+    from xtls_crud.database.models.inbounds import Inbounds
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+    await crud.inbounds.create_many(objs_in=[_row(i) for i in range(rows)], chunk_size=900)
+
+    async def expiring():
+        query = select(Inbounds.id).where(Inbounds.enable == True, Inbounds.expiry_time < 1_700_000_060_000)  # noqa
+        await crud.inbounds.session.execute(query)
+
+    queries = {
+        'user_id = ?': lambda: crud.inbounds.get_multi_filter(filters={'user_id': 7}),
+        'protocol = ?': lambda: crud.inbounds.get_multi_filter(filters={'protocol': 'trojan'}, limit=10),
+        'user_id = ? AND enable': lambda: crud.inbounds.get_multi_filter(filters={'user_id': 7, 'enable': True}),
+        'enable AND expiry_time < ?': expiring,
+    }
+
+    results = {}
+    async with get_session():
+        for name, query in queries.items():
+            results[name] = [await timed(query, repeat)]
+
+    await indexes.create_indexes()
+
+    async with get_session():
+        for name, query in queries.items():
+            results[name].append(await timed(query, repeat))
+
+    print(f'{rows} rows, ms per query')
+    print(f'{"query":<30}{"before":>10}{"after":>10}')
+    for name, (before, after) in results.items():
+        print(f'{name:<30}{before:>10.2f}{after:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000, help='Inbounds in the table')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ASYNC_DB_URL'] = f'sqlite+aiosqlite:///{directory}/x-ui.db'
+        asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,79 @@
+"""
+Time to render the `GET /api/v1/inbounds/` body, in ms per 1000 inbounds
+
+Compares the `response_model` path (`PrettyInbound` models, then FastAPI's validation, `jsonable_encoder` and
+`JSONResponse`) with `pretty_inbounds_json` (`FAST_JSON_RESPONSES`). No database is needed, rows are plain objects.
+
+```shell
+python benchmarks/inbounds_listing.py --rows 1000 --distinct 10
+```
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+SNIFFING = '{"enabled":true,"destOverride":["http","tls"]}'
+
+
+def _row(i: int, distinct: int) -> SimpleNamespace:
+    path = f'/p{i % distinct:05d}'
+    return SimpleNamespace(
+        id=i + 1, user_id=1, up=i, down=i, total=0, remark=f'remark-{i}', enable=True,
+        expiry_time=1_700_000_000_000 + i, listen='', port=i + 1, protocol='vmess', tag=f'inbound-{i + 1}',
+        settings='{"clients":[{"id":"4bde567b-425a-4fb9-f03b-aa5cf7d02e51","alterId":0}],'
+                 '"disableInsecureEncryption":false}',
+        stream_settings='{"network":"ws","security":"tls","tlsSettings":{"serverName":"example.com",'
+                        '"certificates":[{"certificateFile":"/root/cert.crt","keyFile":"/root/private.key"}]},'
+                        f'"wsSettings":{{"path":"{path}","headers":{{}}}}}}',
+        sniffing=SNIFFING,
+    )
+
+
+def timed(render, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(rows: int, distinct: int, repeat: int) -> None:
+    import json
+    import typing as t
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import parse_obj_as
+
+    from xtls_crud.models.inbounds.inbounds import PrettyInbound, pretty_inbounds_json
+
+    data = [_row(i, distinct) for i in range(rows)]
+
+    def response_model():
+        result = [PrettyInbound.from_orm(item) for item in data]
+        validated = parse_obj_as(t.Optional[t.List[PrettyInbound]], result)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    def fast():
+        return pretty_inbounds_json(data)
+
+    assert json.loads(response_model()) == json.loads(fast())
+
+    scale = 1000 / rows
+    print(f'{rows} inbounds, {distinct} distinct stream settings, ms per 1000 inbounds')
+    print(f'{"response_model":<20}{timed(response_model, repeat) * scale:>10.2f}')
+    print(f'{"fast":<20}{timed(fast, repeat) * scale:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000, help='Inbounds in the listing')
+    parser.add_argument('--distinct', type=int, default=10, help='Distinct stream settings among them')
+    parser.add_argument('--repeat', type=int, default=20, help='Renders per mode')
+    args = parser.parse_args()
+
+    main(args.rows, args.distinct, args.repeat)
@@ -0,0 +1,68 @@
+"""
+Batch provisioning throughput, against one builder and one insert per inbound
+
+Creates `--count` inbounds in a throwaway database with `provision_inbounds`, then `--sample` more the one at a time
+way (`EasyInboundBuilder` with every `with_*` call, `allocate_port`, `create`), and reports inbounds per second.
+
+```shell
+python benchmarks/inbounds_provisioning.py --count 10000
+```
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+
+
+async def main(count: int, sample: int) -> None:
+    from sqlalchemy import text
+
+    from xtls_crud.database import crud
+    from xtls_crud.database.db.session import engine, get_session
+    from xtls_crud.services.provision import ProvisionDefaults, provision_inbounds
+    from xtls_crud.utils.builders.inbounds_builder import EasyInboundBuilder
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+
+    defaults = ProvisionDefaults(total='100GB', expiry='30d')
+    report = await provision_inbounds([{'remark': f'user-{i}'} for i in range(count)], defaults=defaults)
+
+    start = time.perf_counter()
+    async with get_session():
+        for i in range(sample):
+            port = await crud.inbounds.allocate_port()
+            inbound = EasyInboundBuilder().with_user_id(1).with_up(0).with_down(0).with_total(
+                100 << 30).with_remark(f'single-{i}').with_enable(True).with_expiry_time(0).with_listen(
+                '').with_port(port).with_protocol('vmess').with_uuid(uuid4()).with_network('ws').with_security(
+                'tls').with_server_name('127.0.0.1').with_ws_path('/abcdef').with_tag(
+                f'single-{port}').with_sniffing(True).build()
+            await crud.inbounds.create(obj_in=inbound)
+    single = sample / (time.perf_counter() - start)
+
+    print(f'{"provision_inbounds":<25}{report.rate:>12,.0f} inbounds/s ({count} in {report.seconds:.2f}s)')
+    print(f'{"one at a time":<25}{single:>12,.0f} inbounds/s ({sample} sampled)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=10000, help='Inbounds to provision in bulk')
+    parser.add_argument('--sample', type=int, default=200, help='Inbounds created one at a time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ASYNC_DB_URL'] = f'sqlite+aiosqlite:///{directory}/x-ui.db'
+        asyncio.run(main(args.count, args.sample))
@@ -0,0 +1,79 @@
+"""
+NDJSON export and import throughput of the inbounds table
+
+Fills a throwaway database with `--rows` inbounds, exports them, then imports the file into a second empty table.
+
+```shell
+python benchmarks/inbounds_transfer.py --rows 100000 --compression gzip
+```
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+SETTINGS = '{"clients":[{"id":"4bde567b-425a-4fb9-f03b-aa5cf7d02e51","alterId":0}],"disableInsecureEncryption":false}'
+STREAM_SETTINGS = '{"network":"ws","security":"tls","wsSettings":{"path":"/ask21","headers":{}}}'
+SNIFFING = '{"enabled":true,"destOverride":["http","tls"]}'
+
+
+def _row(i: int) -> dict:
+    # ports go past 65535 above 65535 rows, nothing checks the range here
+    return dict(
+        user_id=1, up=i, down=i, total=0, remark=f'remark-{i}', enable=True, expiry_time=0, listen='',
+        port=i + 1, protocol='vmess', settings=SETTINGS, stream_settings=STREAM_SETTINGS,
+        tag=f'inbound-{i + 1}', sniffing=SNIFFING,
+    )
+
+
+async def main(rows: int, directory: str, compression: str) -> None:
+    from sqlalchemy import text
+
+    from xtls_crud.database import crud
+    from xtls_crud.database.db.session import engine
+    from xtls_crud.services.transfer import export_inbounds, import_inbounds
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+    for start in range(0, rows, 10000):
+        await crud.inbounds.create_many(
+            objs_in=[_row(i) for i in range(start, min(start + 10000, rows))], chunk_size=900)
+
+    path = os.path.join(directory, 'inbounds.ndjson')
+    start = time.perf_counter()
+    await export_inbounds(path, compression=compression or None)
+    exported = time.perf_counter() - start
+    size = os.path.getsize(path)
+
+    async with engine.begin() as conn:
+        await conn.execute(text('DELETE FROM inbounds'))
+
+    start = time.perf_counter()
+    await import_inbounds(path, compression=compression or None, chunk_size=1000)
+    imported = time.perf_counter() - start
+
+    print(f'{rows} rows, {size / 1024 / 1024:.1f} MiB ({compression or "plain"})')
+    print(f'{"export":<10}{rows / exported:>12,.0f} rows/s')
+    print(f'{"import":<10}{rows / imported:>12,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000, help='Inbounds in the table')
+    parser.add_argument('--compression', choices=('', 'gzip', 'zstd'), default='', help='File compression')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ASYNC_DB_URL'] = f'sqlite+aiosqlite:///{directory}/x-ui.db'
+        asyncio.run(main(args.rows, directory, args.compression))
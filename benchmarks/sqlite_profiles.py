@@ -0,0 +1,82 @@
+"""
+Read/write throughput of the SQLite storage profiles
+
+Every profile gets a fresh database with the x-ui `inbounds` table, then runs:
+
+- writes: one committed INSERT per inbound (what `CRUDInbounds.create` does)
+- reads: point lookups by port on the rows written above
+
+```shell
+python benchmarks/sqlite_profiles.py --rows 2000
+```
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from xtls_crud.core.settings import SQLITE_PROFILES  # noqa: E402
+from xtls_crud.database.db.session import apply_sqlite_pragmas  # noqa: E402
+from xtls_crud.database.models.inbounds import Inbounds  # noqa: E402
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+
+
+def _row(i: int) -> dict:
+    return dict(
+        user_id=1, up=0, down=0, total=0, remark=f'remark-{i}', enable=True, expiry_time=0, listen='',
+        port=i + 1, protocol='vmess', settings='{}', stream_settings='{}', tag=f'inbound-{i + 1}', sniffing='{}',
+    )
+
+
+async def run(profile: str, rows: int, directory: str) -> tuple:
+    engine = create_async_engine(f'sqlite+aiosqlite:///{directory}/{profile}.db')
+    pragmas = SQLITE_PROFILES.get(profile, {})
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):  # noqa
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+
+    async with engine.connect() as conn:
+        start = time.perf_counter()
+        for i in range(rows):
+            await conn.execute(insert(Inbounds), _row(i))
+            await conn.commit()
+        writes = rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(rows):
+            (await conn.execute(select(Inbounds.id).where(Inbounds.port == i + 1))).scalar()
+        reads = rows / (time.perf_counter() - start)
+
+    await engine.dispose()
+    return writes, reads
+
+
+async def main(rows: int) -> None:
+    print(f'{"profile":<12}{"writes/s":>12}{"reads/s":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in ('default', *SQLITE_PROFILES):
+            writes, reads = await run(profile, rows, directory)
+            print(f'{profile:<12}{writes:>12.0f}{reads:>12.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000, help='Inbounds written then read per profile')
+    asyncio.run(main(parser.parse_args().rows))
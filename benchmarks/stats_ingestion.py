@@ -0,0 +1,80 @@
+"""
+Xray stats ingestion rate, in counters per second
+
+Fills a throwaway database with `--rows` inbounds, then feeds `--rounds` fake statsquery payloads covering every
+inbound through `StatsIngestor`, flushing once per payload.
+
+```shell
+python benchmarks/stats_ingestion.py --rows 10000 --rounds 20
+```
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+INBOUNDS_DDL = (
+    "CREATE TABLE `inbounds` (`id` integer,`user_id` integer,`up` integer,`down` integer,`total` integer,"
+    "`remark` text,`enable` numeric,`expiry_time` integer,`listen` text,`port` integer UNIQUE,`protocol` text,"
+    "`settings` text,`stream_settings` text,`tag` text UNIQUE,`sniffing` text,PRIMARY KEY (`id`))"
+)
+
+
+def _row(i: int) -> dict:
+    return dict(
+        user_id=1, up=0, down=0, total=0, remark=f'remark-{i}', enable=True, expiry_time=0, listen='', port=i + 1,
+        protocol='vless', settings='{}', stream_settings='{}', tag=f'inbound-{i + 1}', sniffing='{}',
+    )
+
+
+async def main(rows: int, rounds: int) -> None:
+    from sqlalchemy import text
+
+    from xtls_crud.database import crud
+    from xtls_crud.database.db.session import engine
+    from xtls_crud.services.stats import FakeStatsSource, StatsIngestor
+
+    async with engine.begin() as conn:
+        await conn.execute(text(INBOUNDS_DDL))
+    await crud.inbounds.create_many(objs_in=[_row(i) for i in range(rows)], chunk_size=900)
+
+    source = FakeStatsSource(tags=[f'inbound-{i + 1}' for i in range(rows)], rounds=rounds, seed=0)
+    payloads = [json.dumps(source.payload()) for _ in range(rounds)]
+    counters = rows * 2 * rounds
+
+    start = time.perf_counter()
+    aggregator = StatsIngestor()
+    for payload in payloads:
+        aggregator.add(payload)
+    parsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await StatsIngestor().run(iter_payloads(payloads), interval=0)
+    total = time.perf_counter() - start
+
+    print(f'{rows} inbounds, {rounds} payloads, {counters} counters')
+    print(f'{"parse + aggregate":<25}{counters / parsed:>15,.0f} counters/s')
+    print(f'{"parse + apply":<25}{counters / total:>15,.0f} counters/s')
+
+
+async def iter_payloads(payloads):
+    for payload in payloads:
+        yield payload
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000, help='Inbounds in the table')
+    parser.add_argument('--rounds', type=int, default=20, help='Payloads to ingest')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['ASYNC_DB_URL'] = f'sqlite+aiosqlite:///{directory}/x-ui.db'
+        asyncio.run(main(args.rows, args.rounds))
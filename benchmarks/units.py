@@ -0,0 +1,69 @@
+"""
+Parse and arithmetic throughput of the byte size and time value types
+
+Parses `--values` quota/duration strings drawn from a small set of distinct values (as in bulk provisioning, where
+most inbounds share a quota), with and without the parse cache, one at a time and in bulk (`parse_sizes`,
+`parse_durations`), then runs arithmetic and comparisons on the results.
+
+```shell
+python benchmarks/units.py --values 100000
+```
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+
+def rate(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main(values: int, distinct: int) -> None:
+    from xtls_crud.constants import byte_size, time_info
+
+    rand = random.Random(0)
+    sizes = [f'{rand.randint(1, 1000)}{rand.choice(["MB", "GB", "TB"])}' for _ in range(distinct)]
+    durations = [f'{rand.randint(1, 365)}{rand.choice(["d", "w", "mo"])}' for _ in range(distinct)]
+    sizes = [rand.choice(sizes) for _ in range(values)]
+    durations = [rand.choice(durations) for _ in range(values)]
+
+    results = {
+        'size, uncached': rate(byte_size._parse.__wrapped__, sizes),  # noqa
+        'size, cached': rate(byte_size.from_string, sizes),
+        'time, uncached': rate(time_info._parse.__wrapped__, durations),  # noqa
+        'time, cached': rate(time_info.from_string, durations),
+    }
+
+    durations = [f'{duration}12h' for duration in durations]
+    bulk = {'parse_sizes': (byte_size.parse_sizes, sizes), 'parse_durations': (time_info.parse_durations, durations)}
+    for name, (parse, items) in bulk.items():
+        start = time.perf_counter()
+        parse(items)
+        results[name] = values / (time.perf_counter() - start)
+
+    parsed = [byte_size.from_string(size) for size in sizes]
+    results['size + size'] = rate(lambda size: size + byte_size.GIGABYTE, parsed)
+    results['size * int'] = rate(lambda size: size * 2, parsed)
+    results['size < size'] = rate(lambda size: size < byte_size.TERABYTE, parsed)
+
+    print(f'{values} values, {distinct} distinct')
+    print(f'{"operation":<20}{"ops/s":>15}')
+    for name, ops in results.items():
+        print(f'{name:<20}{ops:>15,.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--values', type=int, default=100000, help='Strings to parse')
+    parser.add_argument('--distinct', type=int, default=100, help='Distinct strings among them')
+    args = parser.parse_args()
+
+    main(args.values, args.distinct)
@@ -0,0 +1,37 @@
+import unittest
+import os
+
+print(f"Setting up environment for {__name__}")
+os.environ['DEBUG'] = 'True'
+os.environ['ENVIRONMENT'] = 'dev'
+
+
+try:
+    from xtls_crud.xtls_crud import web_app
+    from xtls_crud.xtls_crud.commands.main import app as cli_app
+except ModuleNotFoundError:
+    print('ModuleNotFoundError caught, adding parent directory to path')
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+    from xtls_crud.xtls_crud import web_app
+    from xtls_crud.xtls_crud.commands.main import app as cli_app
+
+
+class Test(unittest.TestCase):
+    def test_web_app(self):
+        paths = {route.path for route in web_app.routes}
+
+        self.assertIn('/api/v1/inbounds/', paths)
+        self.assertIn('/api/v1/inbounds/stats', paths)
+
+    def test_cli_app(self):
+        names = {group.name for group in cli_app.registered_groups}
+
+        self.assertEqual(names, {'web', 'db', 'inbounds'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import pickle
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from xtls_crud.xtls_crud.constants import byte_size, time_info
+    from xtls_crud.xtls_crud.models.inbounds.easy_inbounds_builder import EasyBuilderSchemaCreate
+except ModuleNotFoundError:
+    print('ModuleNotFoundError caught, adding parent directory to path')
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+    from xtls_crud.xtls_crud.constants import byte_size, time_info
+    from xtls_crud.xtls_crud.models.inbounds.easy_inbounds_builder import EasyBuilderSchemaCreate
+
+
+class Test(unittest.TestCase):
+    def test_size_from_string(self):
+        self.assertEqual(byte_size.from_string('100 MB').bytes, 100 * 1048576)
+        self.assertEqual(byte_size.from_string('1gigabyte').symbol, 'GB')
+        self.assertIs(byte_size.from_string('100GB'), byte_size.from_string('100GB'))
+        self.assertEqual(byte_size.from_string(5).bytes, 5)
+        self.assertIs(byte_size.from_string(byte_size.SizeUnit.TERABYTE), byte_size.TERABYTE)
+        self.assertIs(byte_size.from_string(byte_size.KILOBYTE), byte_size.KILOBYTE)
+        self.assertEqual(tuple(byte_size.from_string('2 mb'))[:2], (('name', 'MEGABYTE'), ('symbol', 'MB')))
+
+        for invalid in ('', 'GB', '0GB', '10 XB'):
+            with self.assertRaises(ValueError):
+                byte_size.from_string(invalid)
+        with self.assertRaises(ValueError):
+            byte_size.from_string(-1)
+        with self.assertRaises(TypeError):
+            byte_size.from_string(1.5)
+
+    def test_size_arithmetic(self):
+        self.assertEqual(byte_size.GIGABYTE * 100, 100 * 1073741824)
+        self.assertEqual(3 * byte_size.KILOBYTE, 3072)
+        self.assertEqual(2048 - byte_size.KILOBYTE, 1024)
+        self.assertTrue(byte_size.KILOBYTE < byte_size.MEGABYTE <= 1048576)
+        self.assertEqual(byte_size.KILOBYTE, 'KB')
+        self.assertEqual(sorted([byte_size.GIGABYTE, byte_size.BYTE]), [byte_size.BYTE, byte_size.GIGABYTE])
+
+        with self.assertRaises(AttributeError):
+            byte_size.GIGABYTE.bytes = 1
+        self.assertEqual(pickle.loads(pickle.dumps(byte_size.GIGABYTE)), byte_size.GIGABYTE)
+
+    def test_time_from_string(self):
+        self.assertEqual(time_info.from_string('1mo').seconds, 2629746)
+        self.assertEqual(time_info.from_string('2 week').seconds, 2 * 604800)
+        self.assertEqual(time_info.from_string('90m') // time_info.HOUR, 1)
+        self.assertEqual(time_info.from_string('1 Day').dict(), {'name': 'DAY', 'symbol': 'D', 'seconds': 86400})
+        self.assertEqual(time_info.from_string(30).seconds, 30)
+        self.assertIs(time_info.from_string(time_info.TimeUnit.WEEK), time_info.WEEK)
+        self.assertIs(time_info.from_string(time_info.HOUR), time_info.HOUR)
+
+        with self.assertRaises(ValueError):
+            time_info.from_string('1.5h')
+
+    def test_parse_sizes(self):
+        values, invalid = byte_size.parse_sizes(
+            ['1.5GB', '100 MB', 'lots', 0, '2 gigabytes', '', None], use_numpy=False)
+        self.assertEqual(list(values), [1610612736, 104857600, 0, 0, 2147483648, 0, 0])
+        self.assertEqual(list(invalid), [False, False, True, False, False, True, True])
+
+    def test_parse_durations(self):
+        values, invalid = time_info.parse_durations(
+            ['1d12h', '1w 2d', '1.5h', '2 days', '90', '5ms'], use_numpy=False)
+        self.assertEqual(list(values), [129600, 777600, 5400, 172800, 90, 0])
+        self.assertEqual(list(invalid), [False, False, False, False, False, True])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_parse_sizes_numpy(self):
+        values, invalid = byte_size.parse_sizes(['10GB', '10GB', 'x'] * 1000)
+        self.assertEqual(values.dtype, numpy.int64)
+        self.assertEqual(int(values[:3].sum()), 2 * 10 * 1073741824)
+        self.assertEqual(int(invalid.sum()), 1000)
+
+    def test_pydantic_fields(self):
+        schema = EasyBuilderSchemaCreate(remark='test', tag=1, up=byte_size.SizeUnit.GIGABYTE, down='10GB')
+        self.assertEqual(int(byte_size.from_string(schema.up)), 1073741824)
+        self.assertEqual(byte_size.from_string(schema.down).bytes, 10 * 1073741824)
+        schema_json = EasyBuilderSchemaCreate.schema_json()
+        self.assertIn('"GB"', schema_json)
+        self.assertIn('"MO"', schema_json)
+
+    def test_unit_lookup(self):
+        self.assertIs(byte_size.SizeUnit('GB'), byte_size.SizeUnit.GIGABYTE)
+        self.assertIs(byte_size.SizeUnit('kilobyte'), byte_size.SizeUnit.KILOBYTE)
+        self.assertIs(byte_size.SizeUnit(byte_size.MEGABYTE), byte_size.SizeUnit.MEGABYTE)
+        self.assertIs(time_info.TimeUnit('mo'), time_info.TimeUnit.MONTH)
+        self.assertIs(time_info.TimeUnit('M'), time_info.TimeUnit.MINUTE)
+
+        with self.assertRaises(ValueError):
+            byte_size.SizeUnit('XB')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from uuid import uuid4
 import random
@@ -16,6 +17,7 @@ def random_string(length):
 try:
     from xtls_crud.xtls_crud.database import crud
     from xtls_crud.xtls_crud.database import schemas
+    from xtls_crud.xtls_crud.database.db.session import get_session
     from xtls_crud.xtls_crud.utils.builders.inbounds_builder import (
         InboundBuilder,
         SettingBuilder,
@@ -36,6 +38,7 @@ except ModuleNotFoundError:
     sys.path.append(str(Path(__file__).parent.parent.parent))
     from xtls_crud.xtls_crud.database import crud
     from xtls_crud.xtls_crud.database import schemas
+    from xtls_crud.xtls_crud.database.db.session import get_session
     from xtls_crud.xtls_crud.utils.builders.inbounds_builder import (
         InboundBuilder,
         SettingBuilder,
@@ -55,6 +58,43 @@ class Test(unittest.IsolatedAsyncioTestCase):
         _ = await crud.inbounds.get_multi()
         print(_)
 
+    async def test_session_per_task(self):
+        with self.assertRaises(RuntimeError):
+            _ = crud.inbounds.session
+
+        async with get_session() as session:
+            self.assertIs(crud.inbounds.session, session)
+
+            async def spawned():
+                with self.assertRaises(RuntimeError):
+                    _ = crud.inbounds.session
+                return await crud.inbounds.get_multi(limit=1)  # in a session of its own
+
+            await asyncio.create_task(spawned())
+
+    async def test_get_multi_cursor(self):
+        first = await crud.inbounds.get_multi(limit=2)
+        cursor = crud.inbounds.next_cursor(first, limit=2)
+
+        if cursor:
+            second = await crud.inbounds.get_multi(limit=2, cursor=cursor)
+            self.assertTrue(all(item.id < first[-1].id for item in second))
+
+    async def test_get_multi_projection(self):
+        rows = await crud.inbounds.get_multi(limit=2, columns=['id', 'tag', 'up', 'down', 'total'], as_dicts=True)
+        self.assertTrue(all(set(row) == {'id', 'tag', 'up', 'down', 'total'} for row in rows))
+
+        cursor = crud.inbounds.next_cursor(rows, limit=2)
+        if cursor:
+            tuples = await crud.inbounds.get_multi(limit=2, cursor=cursor, columns=['id', 'tag'], as_rows=True)
+            self.assertTrue(all(row.id < rows[-1]['id'] for row in tuples))
+
+        data = await crud.inbounds.get_multi(limit=2, defer=crud.inbounds.JSON_COLUMNS)
+        self.assertEqual([item.id for item in data], [row['id'] for row in rows])
+
+        with self.assertRaises(ValueError):
+            await crud.inbounds.get_multi(columns=['nope'], as_rows=True)
+
     async def deprecated_test_create_from_sample(self):  # noqa  # deprecated
         sample = schemas.InboundsCreate(
             user_id=1,
@@ -138,6 +178,166 @@ class Test(unittest.IsolatedAsyncioTestCase):
 
         print(_)
 
+    async def test_create_many(self):
+        samples = []
+        for port in random.sample(range(40001, 50000), 10):
+            samples.append(schemas.InboundsCreate(
+                user_id=1,
+                up=0,
+                down=0,
+                total=0,
+                remark=random_string(10),
+                enable=True,
+                expiry_time=0,
+                listen='',
+                port=port,
+                protocol='vless',
+                settings='{}',
+                stream_settings='{}',
+                tag=random_string(10),
+                sniffing='{}'
+            ))
+
+        ids = await crud.inbounds.create_many(objs_in=samples, chunk_size=3)
+        self.assertEqual(len(ids), len(samples))
+
+        with self.assertRaises(ValueError):
+            await crud.inbounds.create_many(objs_in=samples[:1])
+
+        print(ids)
+
+    async def test_import_many(self):
+        data = await crud.inbounds.get_multi(limit=2)
+        rows = [{column: getattr(item, column) for column in schemas.InboundsCreate.__fields__} for item in data]
+
+        _ = await crud.inbounds.import_many(rows=rows, on_conflict='skip')
+        self.assertEqual(_, {'inserted': 0, 'updated': 0, 'skipped': len(rows)})
+
+        _ = await crud.inbounds.import_many(rows=rows, on_conflict='overwrite')
+        self.assertEqual(_['updated'], len(rows))
+
+        if rows:
+            with self.assertRaises(ValueError):
+                await crud.inbounds.import_many(rows=rows, on_conflict='fail')
+
+    async def test_get_by_tags(self):
+        data = await crud.inbounds.get_multi(limit=5)
+
+        found = await crud.inbounds.get_by_tags(tags=[item.tag for item in data] + [random_string(12)])
+        self.assertEqual(set(found), {item.tag for item in data})
+
+    async def test_cache(self):
+        data = await crud.inbounds.get_multi(limit=1)
+        cache = crud.inbounds.enable_cache(ttl=60, maxsize=10)
+
+        try:
+            for item in data:
+                await crud.inbounds.get_by_tag(tag=item.tag)
+                await crud.inbounds.get_by_tag(tag=item.tag)
+                self.assertEqual(cache.hits, 1)
+
+                tag, port = item.tag, item.port
+                await crud.inbounds.update(db_obj=item, obj_in={'remark': item.remark})
+                self.assertEqual(len(cache), 0)
+
+                await crud.inbounds.get_by_port(port=port)
+                await crud.inbounds.increment_traffic({tag: (0, 0)})
+                self.assertEqual(len(cache), 0)
+
+                await crud.inbounds.get_by_tag(tag=tag)
+                async with get_session():
+                    db_obj = await crud.inbounds.get(item.id)
+                    db_obj.remark = random_string(10)  # not flushed
+
+                    cached = await crud.inbounds.get_by_tag(tag=tag)
+                    self.assertIs(cached, db_obj)
+                    self.assertEqual(cached.remark, db_obj.remark)
+        finally:
+            crud.inbounds.disable_cache()
+
+    async def test_allocate_port(self):
+        ports = await crud.inbounds.allocate_ports(3)
+        self.assertEqual(len(set(ports)), 3)
+
+        found = await crud.inbounds.get_by_ports(ports=ports)
+        self.assertEqual(found, {})
+
+        for port in ports:
+            crud.inbounds.release_port(port)
+
+    async def test_disable_expired(self):
+        next_expiry = await crud.inbounds.next_expiry()
+
+        tags = await crud.inbounds.disable_expired(now=0)
+        self.assertEqual(tags, [])
+
+        if next_expiry is not None:
+            tags = await crud.inbounds.disable_expired(now=next_expiry)
+            self.assertTrue(tags)
+
+    async def test_quota(self):
+        tags = await crud.inbounds.disable_over_quota()
+        self.assertEqual(await crud.inbounds.disable_over_quota(), [])
+
+        usage = await crud.inbounds.quota_usage(threshold=0.8)
+        self.assertTrue(all(0.8 <= ratio < 1 for _, ratio in usage))
+        print(tags, usage)
+
+    async def test_statements_reused(self):
+        self.assertIs(crud.inbounds._select_by('tag'), crud.inbounds._select_by('tag'))
+        self.assertIsNot(crud.inbounds._select_by('tag'), crud.inbounds._select_by('port'))
+
+        inbound = (await crud.inbounds.get_multi(limit=1))[0]
+        self.assertEqual((await crud.inbounds.get_by_tag(tag=inbound.tag)).id, inbound.id)
+        self.assertEqual((await crud.inbounds.get_by_port(port=inbound.port)).id, inbound.id)
+        self.assertEqual(list(await crud.inbounds.get_by_tags(tags=[inbound.tag])), [inbound.tag])
+
+    async def test_get_multi_filter_operators(self):
+        rows = await crud.inbounds.get_multi(limit=1000)
+
+        disabled = await crud.inbounds.get_multi_filter(filters={'enable': False}, limit=1000)
+        self.assertEqual({row.id for row in disabled}, {row.id for row in rows if row.enable is False})
+
+        ports = await crud.inbounds.get_multi_filter(
+            filters=schemas.InboundsFilter(port_gte=20000, port_lte=30000), limit=1000)
+        self.assertEqual({row.id for row in ports}, {row.id for row in rows if 20000 <= row.port <= 30000})
+
+        tags = [row.tag for row in rows[:3]]
+        in_tags = await crud.inbounds.get_multi_filter(filters=schemas.InboundsFilter(tag_in=tags), limit=1000)
+        self.assertEqual(sorted(row.tag for row in in_tags), sorted(tags))
+
+        heavy = await crud.inbounds.get_multi_filter(filters={'usage_ratio_gte': 0.9}, limit=1000)
+        self.assertEqual(
+            {row.id for row in heavy},
+            {row.id for row in rows if row.total and (row.up or 0) + (row.down or 0) >= row.total * 0.9})
+
+        with self.assertRaises(ValueError):
+            await crud.inbounds.get_multi_filter(filters={'port_between': 1})
+
+    async def test_aggregate(self):
+        total = await crud.inbounds.aggregate(metrics=['count', 'sum_traffic'])
+        per_user = await crud.inbounds.aggregate(group_by=['user_id'], metrics=['count', 'sum_traffic'])
+
+        self.assertEqual(len(total), 1)
+        self.assertEqual(total[0]['count'], sum(row['count'] for row in per_user))
+        self.assertEqual(total[0]['sum_traffic'], sum(row['sum_traffic'] for row in per_user))
+
+        with self.assertRaises(ValueError):
+            await crud.inbounds.aggregate(group_by=['settings'])
+
+    async def test_update_where(self):
+        _ = await crud.inbounds.set_enable(enable=True, user_id=1)
+        print(_)
+
+        with self.assertRaises(ValueError):
+            await crud.inbounds.set_enable(enable=False)
+        with self.assertRaises(ValueError):
+            await crud.inbounds.update_where(filters={'user_id': None}, values={'enable': False})
+
+        data = await crud.inbounds.get_multi(limit=2)
+        _ = await crud.inbounds.update_many({item.id: {'enable': True} for item in data})
+        self.assertEqual(_, len(data))
+
 
 if __name__ == '__main__':
     unittest.main()
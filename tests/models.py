@@ -1,5 +1,9 @@
 import unittest
+import json
 import os
+from types import SimpleNamespace
+
+from fastapi.encoders import jsonable_encoder
 
 print(f"Setting up environment for {__name__}")
 os.environ['DEBUG'] = 'True'
@@ -12,6 +16,7 @@ try:
         Sniffing,
         StreamSettings
     )
+    from xtls_crud.xtls_crud.models.inbounds.inbounds import PrettyInbound, pretty_inbounds_json
 except ModuleNotFoundError:
     print('ModuleNotFoundError caught, adding parent directory to path')
     import sys
@@ -24,6 +29,7 @@ except ModuleNotFoundError:
         Sniffing,
         StreamSettings
     )
+    from xtls_crud.xtls_crud.models.inbounds.inbounds import PrettyInbound, pretty_inbounds_json
 
 
 class Test(unittest.TestCase):
@@ -78,6 +84,37 @@ class Test(unittest.TestCase):
         print(stream_settings_.json())
         return stream_settings_
 
+    def test_pretty_inbound_shares_json_columns(self):
+        _sample = {
+            "user_id": 1,
+            "up": 0,
+            "down": 0,
+            "total": 0,
+            "remark": "test",
+            "enable": True,
+            "expiry_time": 1669836498529,
+            "listen": "",
+            "port": 49428,
+            "protocol": "vmess",
+            "settings": '{"clients": [{"id": "4bde567b-425a-4fb9-f03b-aa5cf7d02e51", "alterId": 0}], '
+                        '"disableInsecureEncryption": false}',
+            "stream_settings": '{"network": "ws", "security": "tls", "tlsSettings": {"serverName": "example.com", '
+                               '"certificates": []}, "wsSettings": {"path": "/ask21", "headers": {}}}',
+            "tag": "inbound-49428",
+            "sniffing": '{"enabled": true, "destOverride": ["http", "tls"]}',
+            "id": 1
+        }
+
+        first = PrettyInbound(**_sample)
+        second = PrettyInbound(**{**_sample, "id": 2, "port": 49429, "tag": "inbound-49429"})
+
+        self.assertIs(first.sniffing, second.sniffing)
+        self.assertIs(first.stream_settings, second.stream_settings)
+        self.assertEqual(first.dict()['settings'], second.dict()['settings'])
+
+        rows = [SimpleNamespace(**_sample), SimpleNamespace(**{**_sample, "id": 2, "sniffing": "not json"})]
+        self.assertEqual(json.loads(pretty_inbounds_json(rows)), jsonable_encoder([first]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import json
+import os
+
+print(f"Setting up environment for {__name__}")
+os.environ['DEBUG'] = 'True'
+os.environ['ENVIRONMENT'] = 'dev'
+
+
+try:
+    from xtls_crud.xtls_crud.services.provision import ProvisionDefaults, build_inbounds, plan_inbounds
+except ModuleNotFoundError:
+    print('ModuleNotFoundError caught, adding parent directory to path')
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+    from xtls_crud.xtls_crud.services.provision import ProvisionDefaults, build_inbounds, plan_inbounds
+
+
+class Test(unittest.TestCase):
+    def test_plan(self):
+        defaults = ProvisionDefaults(total='100GB', expiry='30d')
+        specs = [
+            {'user_id': 7, 'remark': 'alice'},
+            {'port': '8443', 'total': '1.5GB', 'expiry': '1d12h', 'enable': 'false'},
+        ]
+
+        plan = plan_inbounds(specs, defaults=defaults, ports=[20000], now=1_000)
+
+        self.assertEqual([inbound['port'] for inbound in plan], [20000, 8443])
+        self.assertEqual([inbound['tag'] for inbound in plan], ['inbound-20000', 'inbound-8443'])
+        self.assertEqual(plan[0]['remark'], 'alice')
+        self.assertEqual(plan[1]['user_id'], 1)
+        self.assertEqual(plan[0]['total'], 100 * 1073741824)
+        self.assertEqual(plan[1]['total'], 1610612736)
+        self.assertEqual(plan[1]['expiry_time'], 1_000 + 36 * 3600 * 1000)
+        self.assertEqual([inbound['enable'] for inbound in plan], [True, False])
+        self.assertNotEqual(plan[0]['uuid'], plan[1]['uuid'])
+
+    def test_plan_invalid(self):
+        with self.assertRaises(ValueError):
+            plan_inbounds([{'total': 'lots'}], ports=[20000])
+        with self.assertRaises(ValueError):
+            plan_inbounds([{'colour': 'red'}], ports=[20000])
+        with self.assertRaises(ValueError):
+            plan_inbounds([{}, {}], ports=[20000])
+
+    def test_build(self):
+        defaults = ProvisionDefaults(protocol='vless')
+        plan = plan_inbounds([{}, {'ws_path': '/custom'}], defaults=defaults, ports=[20000, 20001])
+
+        rows = build_inbounds(plan, defaults=defaults)
+
+        self.assertEqual([row['protocol'] for row in rows], ['vless', 'vless'])
+        for row, inbound in zip(rows, plan):
+            self.assertEqual(json.loads(row['settings'])['clients'][0]['id'], inbound['uuid'])
+            self.assertEqual(json.loads(row['stream_settings'])['wsSettings']['path'], inbound['ws_path'])
+            self.assertEqual(row['port'], inbound['port'])
+        self.assertEqual(json.loads(rows[1]['stream_settings'])['wsSettings']['path'], '/custom')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+
+print(f"Setting up environment for {__name__}")
+os.environ['DEBUG'] = 'True'
+os.environ['ENVIRONMENT'] = 'dev'
+
+
+try:
+    from xtls_crud.xtls_crud.database import crud
+    from xtls_crud.xtls_crud.services.stats import FakeStatsSource, StatsIngestor, TagIndex, parse_stats
+except ModuleNotFoundError:
+    print('ModuleNotFoundError caught, adding parent directory to path')
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+    from xtls_crud.xtls_crud.database import crud
+    from xtls_crud.xtls_crud.services.stats import FakeStatsSource, StatsIngestor, TagIndex, parse_stats
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+    def test_parse_stats(self):
+        _ = parse_stats('''{
+            "stat": [
+                {"name": "inbound>>>inbound-443>>>traffic>>>uplink", "value": "1024"},
+                {"name": "inbound>>>inbound-443>>>traffic>>>downlink"},
+                {"name": "outbound>>>direct>>>traffic>>>uplink", "value": "7"},
+                {"name": "user>>>someone@example.com>>>traffic>>>downlink", "value": "7"}
+            ]
+        }''')
+        self.assertEqual(_, {'inbound-443': (1024, 0)})
+
+        self.assertEqual(parse_stats('{}'), {})
+
+    def test_cumulative(self):
+        ingestor = StatsIngestor(cumulative=True)
+        for value in ('10', '15', '3'):
+            ingestor.add({'stat': [{'name': 'inbound>>>inbound-443>>>traffic>>>uplink', 'value': value}]})
+
+        self.assertEqual(ingestor._pending, {'inbound-443': [8, 0]})  # noqa
+
+    async def test_ingest_fake_source(self):
+        data = await crud.inbounds.get_multi(limit=5)
+        before = {item.tag: ((item.up or 0), (item.down or 0)) for item in data}
+
+        source = FakeStatsSource(tags=list(before), rounds=3, seed=0)
+        ingestor = StatsIngestor()
+        await ingestor.run(source, interval=0)
+
+        # every flush updates each inbound once and drops the `api` inbound
+        self.assertGreaterEqual(ingestor.dropped, 1)
+        self.assertEqual(ingestor.applied, ingestor.dropped * len(before))
+
+        after = await crud.inbounds.get_by_tags(tags=list(before))  # loaded by a new session
+        for tag, (up, down) in source.totals.items():
+            self.assertEqual(after[tag].up, before[tag][0] + up)
+            self.assertEqual(after[tag].down, before[tag][1] + down)
+
+    async def test_flush_failure_is_retried(self):
+        class LockedOnce(TagIndex):
+            failures = 1
+
+            async def resolve(self, tags):
+                if self.failures:
+                    self.failures -= 1
+                    raise RuntimeError('database is locked')
+                return await super().resolve(tags)
+
+        data = await crud.inbounds.get_multi(limit=2)
+        before = {item.tag: ((item.up or 0), (item.down or 0)) for item in data}
+
+        # the first periodic flush fails, the deltas stay pending and are written later
+        source = FakeStatsSource(tags=list(before), rounds=2, interval=0.2, seed=1)
+        ingestor = StatsIngestor(tag_index=LockedOnce())
+        with self.assertLogs('xtls_crud', level='ERROR'):
+            await ingestor.run(source, interval=0.05)
+
+        self.assertEqual(ingestor._pending, {})  # noqa
+        after = await crud.inbounds.get_by_tags(tags=list(before))
+        for tag, (up, down) in source.totals.items():
+            self.assertEqual(after[tag].up, before[tag][0] + up)
+            self.assertEqual(after[tag].down, before[tag][1] + down)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import json
+import os
+import stat
+import tempfile
+
+print(f"Setting up environment for {__name__}")
+os.environ['DEBUG'] = 'True'
+os.environ['ENVIRONMENT'] = 'dev'
+
+
+try:
+    from xtls_crud.xtls_crud.database import crud
+    from xtls_crud.xtls_crud.services.xray_config import ConfigRenderer
+except ModuleNotFoundError:
+    print('ModuleNotFoundError caught, adding parent directory to path')
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+    from xtls_crud.xtls_crud.database import crud
+    from xtls_crud.xtls_crud.services.xray_config import ConfigRenderer
+
+
+class Test(unittest.IsolatedAsyncioTestCase):
+    async def test_render(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.json')
+            renderer = ConfigRenderer(path=path, template={'log': {}, 'inbounds': [{'tag': 'api', 'port': 62789}]})
+
+            report = await renderer.render()
+            self.assertTrue(report.written)
+            self.assertEqual(report.reused, 0)
+
+            with open(path) as file:
+                config = json.load(file)
+            self.assertEqual(config['inbounds'][0]['tag'], 'api')
+            self.assertEqual(len(config['inbounds']), 1 + report.rendered)
+
+            report = await renderer.render()
+            self.assertFalse(report.written)
+            self.assertEqual(report.rendered, 0)
+
+            data = await crud.inbounds.get_multi_filter(filters={'enable': True}, limit=1)
+            for item in data:
+                # `item` expires on the first commit, keep what is needed
+                tag, listen, remark = item.tag, item.listen, item.remark
+                await crud.inbounds.update_where(filters={'tag': tag}, values={'remark': remark + '-'})
+
+                report = await renderer.render()
+                self.assertEqual(report.rendered, 0)  # remark is not part of the config
+
+                await crud.inbounds.update_where(filters={'tag': tag}, values={'listen': '127.0.0.1'})
+                report = await renderer.render()
+                self.assertEqual(report.rendered, 1)
+                self.assertTrue(report.written)
+
+                await crud.inbounds.update_where(filters={'tag': tag}, values={'listen': listen, 'remark': remark})
+
+    async def test_file_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'config.json')
+            renderer = ConfigRenderer(path=path)
+
+            await renderer.render()
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+            os.chmod(path, 0o640)
+            renderer._write([])  # noqa
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,4 +14,39 @@ xtls_crud web serve --host="0.0.0.0" --port=8080
 ```shell
 xtls_crud web serve --help
 ```
-"""
\ No newline at end of file
+
+## Secondary indexes
+```shell title="List, create and drop optional indexes on the inbounds table"
+xtls_crud db indexes
+xtls_crud db create-indexes
+xtls_crud db drop-indexes ix_inbounds_enable
+```
+
+## Inbounds
+```shell title="Disable expired inbounds once, or keep watching"
+xtls_crud inbounds expire
+xtls_crud inbounds expire --watch
+```
+
+```shell title="Disable over-quota inbounds, warn at 80% and 95% of the quota"
+xtls_crud inbounds enforce-quota --warn 0.8 --warn 0.95
+```
+
+```shell title="Add Xray traffic counters to the inbounds"
+xray api statsquery --server=127.0.0.1:10085 -reset | xtls_crud inbounds ingest-stats
+```
+
+```shell title="Copy inbounds to another server"
+xtls_crud inbounds export inbounds.ndjson.gz
+xtls_crud inbounds import inbounds.ndjson.gz --on-conflict=skip
+```
+
+```shell title="Create an inbound per CSV row (user_id, remark, total, expiry... columns), or 10k from defaults"
+xtls_crud inbounds provision users.csv --protocol=vless --total=100GB --expiry=30d --output=created.ndjson
+xtls_crud inbounds provision --count=10000 --total=50GB
+```
+
+```shell title="Render the enabled inbounds into an Xray config"
+xtls_crud inbounds render-config /usr/local/x-ui/bin/config.json --template=template.json --watch
+```
+"""
@@ -0,0 +1,56 @@
+import asyncio
+import typing as t
+
+from typer import Typer, Argument, BadParameter, echo
+
+from ...database.db import indexes
+
+app = Typer(
+    name='db',
+    help='XTLS_CRUD Database Commands',
+)
+
+
+@app.command('indexes')
+def list_indexes():
+    """
+    List available secondary indexes and whether they exist.
+    """
+
+    existing = asyncio.run(indexes.list_indexes())
+    for name, columns in indexes.INDEXES.items():
+        echo(f"{'*' if name in existing else ' '} {name} ({', '.join(columns)})")
+
+
+@app.command('create-indexes')
+def create_indexes(
+        names: t.Optional[t.List[str]] = Argument(
+            None, help='Indexes to create (default: all)', metavar='NAMES'),
+):
+    """
+    Create secondary indexes on the inbounds table (idempotent).
+    """
+
+    try:
+        created = asyncio.run(indexes.create_indexes(names or None))
+    except ValueError as exc:
+        raise BadParameter(str(exc), param_hint='NAMES') from exc
+
+    echo(f"Created: {', '.join(created) or 'nothing'}")
+
+
+@app.command('drop-indexes')
+def drop_indexes(
+        names: t.Optional[t.List[str]] = Argument(
+            None, help='Indexes to drop (default: all)', metavar='NAMES'),
+):
+    """
+    Drop secondary indexes from the inbounds table (idempotent).
+    """
+
+    try:
+        dropped = asyncio.run(indexes.drop_indexes(names or None))
+    except ValueError as exc:
+        raise BadParameter(str(exc), param_hint='NAMES') from exc
+
+    echo(f"Dropped: {', '.join(dropped) or 'nothing'}")
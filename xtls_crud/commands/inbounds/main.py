@@ -0,0 +1,256 @@
+import asyncio
+import csv
+import json
+import sys
+import typing as t
+from enum import Enum
+
+from typer import Typer, Argument, Option, BadParameter, Exit, echo
+
+from ...services.expiry import ExpirySweeper
+from ...services.provision import ProvisionDefaults, provision_inbounds
+from ...services.quota import enforce_quota
+from ...services.stats import StatsIngestor, file_source, stdin_source
+from ...services.xray_config import ConfigRenderer
+from ...services.transfer import export_inbounds, import_inbounds
+from ...core.settings import settings
+
+
+class CompressionChoice(str, Enum):
+    gzip = 'gzip'
+    zstd = 'zstd'
+
+
+class ConflictChoice(str, Enum):
+    skip = 'skip'
+    overwrite = 'overwrite'
+    fail = 'fail'
+
+
+app = Typer(
+    name='inbounds',
+    help='XTLS_CRUD Inbounds Commands',
+)
+
+
+def _print_tags(tags: t.List[str]) -> None:
+    echo(f"Disabled: {', '.join(tags)}")
+
+
+@app.command('expire')
+def expire(
+        watch: bool = Option(
+            False, help='Keep running and disable inbounds as they expire'),
+        max_interval: float = Option(
+            60.0, help='Maximum seconds between two checks (with --watch)', metavar='SECONDS'),
+):
+    """
+    Disable every enabled inbound whose expiry time is due.
+    """
+
+    if watch:
+        try:
+            asyncio.run(ExpirySweeper(max_interval=max_interval, on_expired=_print_tags).run())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    tags = asyncio.run(ExpirySweeper.sweep())
+    if tags:
+        _print_tags(tags)
+    else:
+        echo('Disabled: nothing')
+
+
+@app.command('enforce-quota')
+def enforce_quota_(
+        warn: t.Optional[t.List[float]] = Option(
+            None, help='Used fraction of the quota to warn at, repeatable (default: QUOTA_WARNINGS)',
+            metavar='FRACTION'),
+):
+    """
+    Disable every enabled inbound whose traffic reached its quota, and list the ones close to it.
+    """
+
+    try:
+        report = asyncio.run(enforce_quota(thresholds=warn or None))
+    except ValueError as exc:
+        raise BadParameter(str(exc), param_hint='--warn') from exc
+
+    if report.disabled:
+        _print_tags(report.disabled)
+    else:
+        echo('Disabled: nothing')
+    for threshold, tags in sorted(report.warnings.items(), reverse=True):
+        echo(f"Above {threshold:.0%}: {', '.join(tags)}")
+
+
+@app.command('ingest-stats')
+def ingest_stats(
+        path: str = Argument(
+            '-', help='File holding `xray api statsquery` output, `-` reads concatenated outputs from stdin',
+            metavar='PATH'),
+        interval: float = Option(
+            10.0, help='Seconds between two database writes (and file checks with --watch)', metavar='SECONDS'),
+        watch: bool = Option(
+            False, help='Keep reading the file every interval when it changed'),
+        cumulative: bool = Option(
+            False, help='Values are running totals (statsquery without -reset)'),
+):
+    """
+    Add Xray traffic counters to the up/down columns of the matching inbounds.
+    """
+
+    source = stdin_source() if path == '-' else file_source(path, interval=interval if watch else None)
+    ingestor = StatsIngestor(cumulative=cumulative)
+
+    try:
+        asyncio.run(ingestor.run(source, interval=interval))
+    except KeyboardInterrupt:
+        pass
+
+    echo(f"Updated: {ingestor.applied} | Unknown tags: {ingestor.dropped}")
+
+
+@app.command('render-config')
+def render_config(
+        path: str = Argument(
+            settings.XRAY_CONFIG_PATH, help='Xray config file to write', envvar='XRAY_CONFIG_PATH', metavar='PATH'),
+        template: t.Optional[str] = Option(
+            settings.XRAY_CONFIG_TEMPLATE, help='JSON file holding the rest of the config (log, outbounds...)',
+            envvar='XRAY_CONFIG_TEMPLATE', metavar='TEMPLATE'),
+        watch: bool = Option(
+            False, help='Keep rendering, only rewriting the file when an inbound changed'),
+        interval: float = Option(
+            10.0, help='Seconds between two renders (with --watch)', metavar='SECONDS'),
+):
+    """
+    Write the enabled inbounds into the inbounds array of an Xray config.
+    """
+
+    renderer = ConfigRenderer(path=path, template=template)
+
+    async def run():
+        while True:
+            report = await renderer.render()
+            if report.written:
+                echo(f"Written: {path} | Rendered: {report.rendered} | Reused: {report.reused}")
+            if report.invalid:
+                echo(f"Invalid JSON: {', '.join(report.invalid)}")
+            if not watch:
+                return
+            await asyncio.sleep(interval)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command('export')
+def export(
+        path: str = Argument(
+            '-', help='NDJSON file to write (.gz/.zst suffixes compress), `-` writes to stdout', metavar='PATH'),
+        compression: t.Optional[CompressionChoice] = Option(
+            None, help='gzip or zstd (default: from the suffix)', case_sensitive=False),
+):
+    """
+    Export every inbound as NDJSON.
+    """
+
+    try:
+        count = asyncio.run(export_inbounds(path, compression=compression and compression.value))
+    except ImportError as exc:
+        echo(str(exc), err=True)
+        raise Exit(1) from exc
+    if path != '-':
+        echo(f"Exported: {count}")
+
+
+@app.command('import')
+def import_(
+        path: str = Argument(
+            '-', help='NDJSON file to read (.gz/.zst suffixes are decompressed), `-` reads from stdin', metavar='PATH'),
+        on_conflict: ConflictChoice = Option(
+            ConflictChoice.fail, help='When a port or tag exists', case_sensitive=False),
+        compression: t.Optional[CompressionChoice] = Option(
+            None, help='gzip or zstd (default: from the suffix)', case_sensitive=False),
+        chunk_size: int = Option(
+            500, help='Inbounds per transaction', metavar='ROWS'),
+):
+    """
+    Import inbounds from NDJSON (as written by export), with new ids.
+    """
+
+    try:
+        report = asyncio.run(import_inbounds(
+            path, on_conflict=on_conflict.value, compression=compression and compression.value, chunk_size=chunk_size))
+    except ImportError as exc:
+        echo(str(exc), err=True)
+        raise Exit(1) from exc
+    except ValueError as exc:
+        echo(f"Import stopped: {exc}", err=True)
+        raise Exit(1) from exc
+
+    echo(f"Inserted: {report.inserted} | Updated: {report.updated} | Skipped: {report.skipped}")
+
+
+@app.command('provision')
+def provision(
+        path: t.Optional[str] = Argument(
+            None, help='CSV of specs (user_id, remark, total, expiry, port, tag, uuid... columns, empty cells take '
+                       'the defaults), `-` reads stdin', metavar='PATH'),
+        count: int = Option(
+            0, help='Without PATH, provision this many inbounds from the defaults alone', metavar='N'),
+        user_id: int = Option(1, help='Default owner', metavar='ID'),
+        total: str = Option('0', help='Default quota, e.g. 100GB (0: unlimited)', metavar='SIZE'),
+        expiry: str = Option('0', help='Default lifetime, e.g. 30d or 1d12h (0: never expires)', metavar='DURATION'),
+        protocol: str = Option('vmess', help='Protocol', metavar='PROTOCOL'),
+        network: str = Option('ws', help='Network', metavar='NETWORK'),
+        security: str = Option('tls', help='Security', metavar='SECURITY'),
+        server_name: str = Option(settings.SITE_URL, help='TLS server name', metavar='HOST'),
+        tag_prefix: str = Option('inbound-', help='Tags are <prefix><port> unless a spec has one', metavar='PREFIX'),
+        chunk_size: int = Option(500, help='Inbounds per transaction', metavar='ROWS'),
+        output: t.Optional[str] = Option(
+            None, help='Write the created inbounds (id, tag, port, uuid, ws_path...) as NDJSON, `-` for stdout',
+            metavar='PATH'),
+):
+    """
+    Create many inbounds at once, allocating ports, tags, UUIDs and ws paths.
+    """
+
+    if path is None:
+        if count <= 0:
+            raise BadParameter('give a PATH or a positive --count', param_hint='--count')
+        specs = [{}] * count
+    else:
+        file = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            specs = [{key: value for key, value in row.items() if value not in ('', None)}
+                     for row in csv.DictReader(file)]
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    try:
+        defaults = ProvisionDefaults(
+            user_id=user_id, total=total, expiry=expiry, protocol=protocol, network=network, security=security,
+            server_name=server_name, tag_prefix=tag_prefix)
+    except ValueError as exc:
+        raise BadParameter(str(exc)) from exc
+
+    try:
+        report = asyncio.run(provision_inbounds(specs, defaults=defaults, chunk_size=chunk_size))
+    except ValueError as exc:
+        echo(f"Provisioning stopped: {exc}", err=True)
+        raise Exit(1) from exc
+
+    if output is not None:
+        file = sys.stdout if output == '-' else open(output, 'w')
+        try:
+            file.writelines(json.dumps(inbound) + '\n' for inbound in report.inbounds)
+        finally:
+            if file is not sys.stdout:
+                file.close()
+
+    echo(f"Created: {report.created} in {report.seconds:.2f}s ({report.rate:.0f} inbounds/s)", err=output == '-')
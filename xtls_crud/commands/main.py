@@ -1,6 +1,8 @@
 from typer import Typer
 
 from .web.main import app as cachers_app
+from .db.main import app as db_app
+from .inbounds.main import app as inbounds_app
 
 app = Typer(
     name='XTLS_CRUD',
@@ -8,6 +10,8 @@ app = Typer(
 )
 
 app.add_typer(cachers_app, name='web')
+app.add_typer(db_app, name='db')
+app.add_typer(inbounds_app, name='inbounds')
 
 if __name__ == '__main__':
     app()
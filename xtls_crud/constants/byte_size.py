@@ -6,208 +6,151 @@ This module contains constants, types and enums for byte sizes.
 Like: 1GB = 1 Gigabyte | 1TB = 1 Terabyte | 1PB = 1 Petabyte | 1EB = 1 Exabyte
 """
 
+import functools
+import operator
+import re
+import typing as t
+from decimal import Decimal
 from enum import Enum
-from pydantic import BaseModel
-from pydantic import root_validator
 
+from ..utils.bulk import parse_many
 
-class Size(BaseModel):
-    """
-    Size Model
-    """
-
-    name: str
-    symbol: str
-    bytes: int
-
-    @root_validator()
-    def upper_case_name(cls, values):
-        values['name'] = values['name'].upper()
-        return values
-
-    @root_validator()
-    def upper_case_symbol(cls, values):
-        values['symbol'] = values['symbol'].upper()
-        return values
-
-    @root_validator()
-    def positive_bytes(cls, values):
-        if values['bytes'] < 0:
-            raise ValueError('bytes must be positive')
-        return values
-
-    def __str__(self):
-        return f"Time('{self.name}', '{self.symbol}', {self.bytes})"
-
-    def __repr__(self):
-        return f"Time('{self.name}', '{self.symbol}', {self.bytes})"
-
-    def __eq__(self, other):
-        if isinstance(other, Size):
-            return self.bytes == other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes == other
-        if isinstance(other, str):
-            return self.symbol == other
-
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __lt__(self, other):
-        if isinstance(other, Size):
-            return self.bytes < other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes < other
-        if isinstance(other, str):
-            raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
-
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
-
-    def __le__(self, other):
-        if isinstance(other, Size):
-            return self.bytes <= other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes <= other
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
+def _operand(other: t.Any) -> t.Any:
+    if isinstance(other, Size):
+        return other.bytes
+    if isinstance(other, (int, float)) and not isinstance(other, bool):
+        return other
 
-    def __gt__(self, other):
-        if isinstance(other, Size):
-            return self.bytes > other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes > other
+    return NotImplemented
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
 
-    def __ge__(self, other):
-        if isinstance(other, Size):
-            return self.bytes >= other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes >= other
+def _binary(op: t.Callable[[t.Any, t.Any], t.Any], *, reflected: bool = False) -> t.Callable[['Size', t.Any], t.Any]:
+    # arithmetic works on the byte count and returns a plain number, like the `bytes` it is computed from
+    def method(self: 'Size', other: t.Any) -> t.Any:
+        value = _operand(other)
+        if value is NotImplemented:
+            return NotImplemented
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
+        return op(value, self.bytes) if reflected else op(self.bytes, value)
 
-    def __add__(self, other):
-        if isinstance(other, Size):
-            return self.bytes + other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes + other
+    return method
 
-        raise TypeError(f'Cannot add {type(self)} with {type(other)}')
 
-    def __sub__(self, other):
-        if isinstance(other, Size):
-            return self.bytes - other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes - other
+class Size:
+    """
+    Size value, immutable
 
-        raise TypeError(f'Cannot subtract {type(self)} with {type(other)}')
+    Name and symbol are upper-cased. Comparisons and arithmetic use `bytes` (a `str` compares equal to the symbol),
+    arithmetic returns plain numbers. Usable as a pydantic field type, validated from a `Size`, a `SizeUnit`, a number
+    of bytes or a string such as `100GB` (see `from_string`).
 
-    def __mul__(self, other):
-        if isinstance(other, Size):
-            return self.bytes * other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes * other
+    Keyword Args:
+        name (str): Unit name
+        symbol (str): Unit symbol
+        bytes (int): Number of bytes
 
-        raise TypeError(f'Cannot multiply {type(self)} with {type(other)}')
+    Raises:
+        ValueError: If `bytes` is negative
+    """
 
-    def __truediv__(self, other):
-        if isinstance(other, Size):
-            return self.bytes / other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes / other
+    __slots__ = ('name', 'symbol', 'bytes')
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+    def __init__(self, *, name: str, symbol: str, bytes: int):  # noqa
+        if bytes < 0:
+            raise ValueError('bytes must be positive')
 
-    def __floordiv__(self, other):
-        if isinstance(other, Size):
-            return self.bytes // other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes // other
+        object.__setattr__(self, 'name', name.upper())
+        object.__setattr__(self, 'symbol', symbol.upper())
+        object.__setattr__(self, 'bytes', bytes)
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
 
-    def __mod__(self, other):
-        if isinstance(other, Size):
-            return self.bytes % other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes % other
+    def __delattr__(self, key):
+        raise AttributeError(f'{type(self).__name__} is immutable')
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    def __reduce__(self):
+        return _size, (self.name, self.symbol, self.bytes)
 
-    def __divmod__(self, other):
-        if isinstance(other, Size):
-            return divmod(self.bytes, other.bytes)
-        if isinstance(other, int) or isinstance(other, float):
-            return divmod(self.bytes, other)
+    @classmethod
+    def __get_validators__(cls):
+        yield from_string
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    @classmethod
+    def __modify_schema__(cls, field_schema: t.Dict[str, t.Any]) -> None:
+        field_schema.update(type='string', example='100GB')
 
-    def __pow__(self, other):
-        if isinstance(other, Size):
-            return self.bytes ** other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            return self.bytes ** other
+    def __iter__(self) -> t.Iterator[t.Tuple[str, t.Any]]:
+        yield 'name', self.name
+        yield 'symbol', self.symbol
+        yield 'bytes', self.bytes
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    def dict(self) -> t.Dict[str, t.Any]:
+        """
+        Fields as a dict
 
-    def __radd__(self, other):
-        return self.__add__(other)
+        Returns:
+            Dict[str, Any]: `name`, `symbol` and `bytes`
+        """
 
-    def __rsub__(self, other):
-        return self.__sub__(other)
+        return dict(self)
 
-    def __rmul__(self, other):
-        return self.__mul__(other)
+    def __int__(self) -> int:
+        return int(self.bytes)
 
-    def __rtruediv__(self, other):
-        return self.__truediv__(other)
+    def __index__(self) -> int:
+        return int(self.bytes)
 
-    def __rfloordiv__(self, other):
-        return self.__floordiv__(other)
+    def __float__(self) -> float:
+        return float(self.bytes)
 
-    def __rmod__(self, other):
-        return self.__mod__(other)
+    def __str__(self):
+        return f"Size('{self.name}', '{self.symbol}', {self.bytes})"
 
-    def __rdivmod__(self, other):
-        return self.__divmod__(other)
+    def __repr__(self):
+        return f"Size('{self.name}', '{self.symbol}', {self.bytes})"
 
-    def __rpow__(self, other):
-        return self.__pow__(other)
+    def __hash__(self):
+        return hash(self.bytes)
 
-    def __iadd__(self, other):
-        if isinstance(other, Size):
-            self.bytes += other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            self.bytes += other
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.symbol == other
 
-        raise TypeError(f'Cannot add {type(self)} with {type(other)}')
+        value = _operand(other)
+        return value if value is NotImplemented else self.bytes == value
 
-    def __isub__(self, other):
-        if isinstance(other, Size):
-            self.bytes -= other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            self.bytes -= other
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
 
-        raise TypeError(f'Cannot subtract {type(self)} with {type(other)}')
+    __lt__ = _binary(operator.lt)
+    __le__ = _binary(operator.le)
+    __gt__ = _binary(operator.gt)
+    __ge__ = _binary(operator.ge)
 
-    def __imul__(self, other):
-        if isinstance(other, Size):
-            self.bytes *= other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            self.bytes *= other
+    __add__ = _binary(operator.add)
+    __sub__ = _binary(operator.sub)
+    __mul__ = _binary(operator.mul)
+    __truediv__ = _binary(operator.truediv)
+    __floordiv__ = _binary(operator.floordiv)
+    __mod__ = _binary(operator.mod)
+    __divmod__ = _binary(divmod)
+    __pow__ = _binary(operator.pow)
 
-        raise TypeError(f'Cannot multiply {type(self)} with {type(other)}')
+    __radd__ = _binary(operator.add, reflected=True)
+    __rsub__ = _binary(operator.sub, reflected=True)
+    __rmul__ = _binary(operator.mul, reflected=True)
+    __rtruediv__ = _binary(operator.truediv, reflected=True)
+    __rfloordiv__ = _binary(operator.floordiv, reflected=True)
+    __rmod__ = _binary(operator.mod, reflected=True)
+    __rdivmod__ = _binary(divmod, reflected=True)
+    __rpow__ = _binary(operator.pow, reflected=True)
 
-    def __itruediv__(self, other):
-        if isinstance(other, Size):
-            self.bytes /= other.bytes
-        if isinstance(other, int) or isinstance(other, float):
-            self.bytes /= other
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+def _size(name: str, symbol: str, bytes: int) -> Size:  # noqa
+    return Size(name=name, symbol=symbol, bytes=bytes)
 
 
 BYTE = Size(name='byte', symbol='B', bytes=1)
@@ -232,6 +175,21 @@ class SizeUnit(Enum):
     PETABYTE = PETABYTE
     EXABYTE = EXABYTE
 
+    @classmethod
+    def _missing_(cls, value: t.Any) -> t.Optional['SizeUnit']:
+        # `SizeUnit('GB')`: look members up by symbol or name, any case (the values themselves only match by hash)
+        if isinstance(value, str):
+            unit = UNITS_BY_KEY.get(value.strip().upper())
+            if unit is not None:
+                return cls(unit)
+
+        return None
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: t.Dict[str, t.Any]) -> None:
+        # the values themselves are not JSON, members are validated from their symbol (or name, see `_missing_`)
+        field_schema.update(type='string', enum=list(_SYMBOLS))
+
     @property
     def name(self) -> str:
         """
@@ -274,7 +232,7 @@ class SizeUnit(Enum):
             list[str]: All the names of the units
         """
 
-        return [unit.name for unit in cls]
+        return list(_NAMES)
 
     @classmethod
     def all_symbols(cls) -> list[str]:
@@ -285,7 +243,7 @@ class SizeUnit(Enum):
             list[str]: All the symbols of the units
         """
 
-        return [unit.symbol for unit in cls]
+        return list(_SYMBOLS)
 
     @classmethod
     def all_bytes(cls) -> list[int]:
@@ -296,7 +254,7 @@ class SizeUnit(Enum):
             list[int]: All the number of bytes in the units
         """
 
-        return [unit.bytes for unit in cls]
+        return [unit.bytes for unit in _UNITS]
 
     @classmethod
     def map_symbols_by_name(cls) -> dict[str, str]:
@@ -307,7 +265,7 @@ class SizeUnit(Enum):
             dict[str, str]: The symbols of the units mapped by their names
         """
 
-        return {name: symbol for name, symbol in zip(cls.all_names(), cls.all_symbols())}
+        return dict(zip(_NAMES, _SYMBOLS))
 
     @classmethod
     def map_names_by_symbol(cls) -> dict[str, str]:
@@ -318,7 +276,7 @@ class SizeUnit(Enum):
             dict[str, str]: The names of the units mapped by their symbols
         """
 
-        return {symbol: name for name, symbol in zip(cls.all_names(), cls.all_symbols())}
+        return dict(zip(_SYMBOLS, _NAMES))
 
     @classmethod
     def map_bytes_by_name(cls) -> dict[str, int]:
@@ -329,7 +287,7 @@ class SizeUnit(Enum):
             dict[str, int]: The number of bytes in the units mapped by their names
         """
 
-        return {name: bytes for name, bytes in zip(cls.all_names(), cls.all_bytes())}  # noqa
+        return {unit.name: unit.bytes for unit in _UNITS}
 
     @classmethod
     def map_bytes_by_symbol(cls) -> dict[str, int]:
@@ -340,51 +298,142 @@ class SizeUnit(Enum):
             dict[str, int]: The number of bytes in the units mapped by their symbols
         """
 
-        return {symbol: bytes for symbol, bytes in zip(cls.all_symbols(), cls.all_bytes())}  # noqa
+        return {unit.symbol: unit.bytes for unit in _UNITS}
+
 
+# Lookup tables, built once: units by symbol and by name (upper case)
+_UNITS = tuple(unit.value for unit in SizeUnit)
+_NAMES = tuple(unit.name for unit in _UNITS)
+_SYMBOLS = tuple(unit.symbol for unit in _UNITS)
+UNITS_BY_KEY: t.Dict[str, Size] = {**{unit.name: unit for unit in _UNITS}, **{unit.symbol: unit for unit in _UNITS}}
+
+_PATTERN = re.compile(r'\s*(\d+)\s*([A-Z]+)\s*')
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse(string: str) -> Size:
+    match = _PATTERN.fullmatch(string.upper())
+    if match is None:
+        raise ValueError(f'Cannot convert string to Size: {string!r}')
+
+    digits, key = match.groups()
+    unit = UNITS_BY_KEY.get(key)
+    if unit is None:
+        raise ValueError(f'Cannot convert string to Size: {key=} | {list(_SYMBOLS)} | {list(_NAMES)}')
+    if not int(digits):
+        raise ValueError('Cannot convert string to Size')
 
-def from_string(string: str) -> Size:
+    return Size(name=unit.name, symbol=unit.symbol, bytes=unit.bytes * int(digits))
+
+
+def from_string(string: t.Union[str, int, Size, SizeUnit]) -> Size:
     """
     Create a size from a string
 
+    A string is a whole number and a unit, given by symbol or by name in any case (`100 MB`, `1gigabyte`). The size
+    takes the unit's name and symbol (`Size('MEGABYTE', 'MB', ...)`). Besides strings, a number of bytes, a `Size`
+    (returned as is) or a `SizeUnit` (its size) are accepted, which is what the builders and pydantic fields pass.
+
+    Parsed strings are cached, so repeated values (e.g. the same quota for many inbounds) are parsed once.
+
     Args:
-        string (str): The string to create the size from
+        string (Union[str, int, Size, SizeUnit]): The string to create the size from (e.g. `100 MB`, `1 gigabyte`),
+            a number of bytes, a size or a unit
 
     Returns:
-        Size: The size (e.g. 100 MB)
+        Size: The size
 
     Raises:
-        ValueError: If the string is not a valid size
-        TypeError: If the string is not a string
-        KeyError: If the string is not a valid size unit
+        ValueError: If the string is not a valid size, or the number of bytes is negative
+        TypeError: If the value is neither a string, an int, a `Size` nor a `SizeUnit`
 
     Examples:
         >>> from_string('100 MB')
-        MB (MEGABYTE)
+        Size('MEGABYTE', 'MB', 104857600)
 
     """
 
-    if not isinstance(string, str):
-        raise TypeError(f'Expected str, got {type(string)}')
+    if isinstance(string, str):
+        if not string:
+            raise ValueError('Cannot convert empty string to Size')
 
-    if not string:
-        raise ValueError('Cannot convert empty string to Size')
+        return _parse(string)
 
-    string = string.upper()
+    if isinstance(string, Size):
+        return string
+    if isinstance(string, SizeUnit):
+        return string.value
+    if isinstance(string, int) and not isinstance(string, bool):
+        return Size(name=BYTE.name, symbol=BYTE.symbol, bytes=string)
 
-    digits = int(''.join(filter(str.isdigit, string)))
-    unit = ''.join(filter(str.isalpha, string))
+    raise TypeError(f'Expected str, int, Size or SizeUnit, got {type(string)}')
 
-    if not digits:
-        raise ValueError('Cannot convert string to Size')
 
-    if not unit:
-        raise ValueError('Cannot convert string to Size')
+_AMOUNT = re.compile(r'\s*(\d+(?:\.\d*)?|\.\d+)\s*([A-Z]*)\s*')
+
+
+def to_bytes(value: t.Union[str, int, float, Size, SizeUnit]) -> int:
+    """
+    Number of bytes of a value, more lenient than `from_string`
 
-    if (unit not in SizeUnit.all_symbols()) and (unit not in SizeUnit.all_names()):
-        raise ValueError(f'Cannot convert string to Size: {unit=} | {SizeUnit.all_symbols()} | {SizeUnit.all_names()}')
+    Strings may have decimals (`1.5GB`), a plural unit name (`2 gigabytes`), no unit (bytes) or be `0` (unlimited).
+    Fractions of a byte are rounded.
 
-    symbol = SizeUnit.map_names_by_symbol()[unit]
-    bytes = SizeUnit.map_bytes_by_symbol()[unit]  # noqa
+    Args:
+        value (Union[str, int, float, Size, SizeUnit]): Value
+
+    Returns:
+        int: Bytes
+
+    Raises:
+        ValueError: If the value is not a valid size
+        TypeError: If the value has an unsupported type
+    """
+
+    if isinstance(value, str):
+        match = _AMOUNT.fullmatch(value.upper())
+        if match is None:
+            raise ValueError(f'Cannot convert string to Size: {value!r}')
+
+        number, key = match.groups()
+        if not key:
+            return round(Decimal(number))
+        if key not in UNITS_BY_KEY and key[:-1] in _NAMES:
+            key = key[:-1]
+        if key not in UNITS_BY_KEY:
+            raise ValueError(f'Cannot convert string to Size: {key=} | {list(_SYMBOLS)} | {list(_NAMES)}')
+
+        return round(Decimal(number) * UNITS_BY_KEY[key].bytes)
+
+    if isinstance(value, Size):
+        return value.bytes
+    if isinstance(value, SizeUnit):
+        return value.bytes
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError('bytes must be positive')
+        return round(value)
+
+    raise TypeError(f'Expected str or number, got {type(value)}')
+
+
+def parse_sizes(
+        values: t.Iterable[t.Union[str, int, float, Size, SizeUnit]], *, use_numpy: t.Optional[bool] = None
+) -> t.Tuple[t.Sequence[int], t.Sequence[bool]]:
+    """
+    Bytes of many values at once (see `to_bytes`), without raising on bad ones
+
+    Args:
+        values (Iterable[Union[str, int, float, Size, SizeUnit]]): Values, e.g. a CSV column
+        use_numpy (Optional[bool]): Return NumPy arrays (default: when NumPy is installed)
+
+    Returns:
+        Tuple[Sequence[int], Sequence[bool]]: Bytes (`0` where invalid) and the error mask (`True` where invalid), see
+            `xtls_crud.utils.bulk.parse_many`
+
+    Examples:
+        >>> parse_sizes(['1.5GB', '100 MB', 'lots', 0])
+        (array([1610612736,  104857600,          0,          0]), array([False, False,  True, False]))
+    """
 
-    return Size(name=unit, symbol=symbol, bytes=bytes * digits)
+    return parse_many(values, to_bytes, use_numpy=use_numpy)
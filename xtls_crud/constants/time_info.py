@@ -1,214 +1,156 @@
 """
 ## Time Constants, Types and Enums for xtls_crud
 
-This module contains constants, types and enums for byte sizes.
+This module contains constants, types and enums for time units.
 
 Like: 1d = 1 day | 1w = 1 week | 1mo = 1 month | 1y = 1 year
 """
 
+import functools
+import operator
+import re
+import typing as t
+from decimal import Decimal
 from enum import Enum
 
-from pydantic import BaseModel
-from pydantic import root_validator
+from ..utils.bulk import parse_many
 
 
-class Time(BaseModel):
-    """
-    Time Model
-    """
-
-    name: str
-    symbol: str
-    seconds: int
+def _operand(other: t.Any) -> t.Any:
+    if isinstance(other, Time):
+        return other.seconds
+    if isinstance(other, (int, float)) and not isinstance(other, bool):
+        return other
 
-    @root_validator()
-    def upper_case_name(cls, values):
-        values['name'] = values['name'].upper()
-        return values
-
-    @root_validator()
-    def upper_case_symbol(cls, values):
-        values['symbol'] = values['symbol'].upper()
-        return values
-
-    @root_validator()
-    def positive_seconds(cls, values):
-        if values['seconds'] < 0:
-            raise ValueError('seconds must be positive')
-        return values
-
-    def __str__(self):
-        return f"Time('{self.name}', '{self.symbol}', {self.seconds})"
-
-    def __repr__(self):
-        return f"Time('{self.name}', '{self.symbol}', {self.seconds})"
-
-    def __eq__(self, other):
-        if isinstance(other, Time):
-            return self.seconds == other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds == other
-        if isinstance(other, str):
-            return self.symbol == other
-
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __lt__(self, other):
-        if isinstance(other, Time):
-            return self.seconds < other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds < other
-        if isinstance(other, str):
-            raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
+    return NotImplemented
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
 
-    def __le__(self, other):
-        if isinstance(other, Time):
-            return self.seconds <= other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds <= other
+def _binary(op: t.Callable[[t.Any, t.Any], t.Any], *, reflected: bool = False) -> t.Callable[['Time', t.Any], t.Any]:
+    # arithmetic works on the byte count and returns a plain number, like the `seconds` it is computed from
+    def method(self: 'Time', other: t.Any) -> t.Any:
+        value = _operand(other)
+        if value is NotImplemented:
+            return NotImplemented
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
+        return op(value, self.seconds) if reflected else op(self.seconds, value)
 
-    def __gt__(self, other):
-        if isinstance(other, Time):
-            return self.seconds > other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds > other
+    return method
 
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
 
-    def __ge__(self, other):
-        if isinstance(other, Time):
-            return self.seconds >= other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds >= other
-
-        raise TypeError(f'Cannot compare {type(self)} with {type(other)}')
-
-    def __add__(self, other):
-        if isinstance(other, Time):
-            return self.seconds + other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds + other
-
-        raise TypeError(f'Cannot add {type(self)} with {type(other)}')
-
-    def __sub__(self, other):
-        if isinstance(other, Time):
-            return self.seconds - other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds - other
+class Time:
+    """
+    Time value, immutable
 
-        raise TypeError(f'Cannot subtract {type(self)} with {type(other)}')
+    Name and symbol are upper-cased. Comparisons and arithmetic use `seconds` (a `str` compares equal to the symbol),
+    arithmetic returns plain numbers. Usable as a pydantic field type, validated from a `Time`, a `TimeUnit`, a number
+    of seconds or a string such as `1MO` (see `from_string`).
 
-    def __mul__(self, other):
-        if isinstance(other, Time):
-            return self.seconds * other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds * other
+    Keyword Args:
+        name (str): Unit name
+        symbol (str): Unit symbol
+        seconds (int): Number of seconds
 
-        raise TypeError(f'Cannot multiply {type(self)} with {type(other)}')
+    Raises:
+        ValueError: If `seconds` is negative
+    """
 
-    def __truediv__(self, other):
-        if isinstance(other, Time):
-            return self.seconds / other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds / other
+    __slots__ = ('name', 'symbol', 'seconds')
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+    def __init__(self, *, name: str, symbol: str, seconds: int):
+        if seconds < 0:
+            raise ValueError('seconds must be positive')
 
-    def __floordiv__(self, other):
-        if isinstance(other, Time):
-            return self.seconds // other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds // other
+        object.__setattr__(self, 'name', name.upper())
+        object.__setattr__(self, 'symbol', symbol.upper())
+        object.__setattr__(self, 'seconds', seconds)
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
 
-    def __mod__(self, other):
-        if isinstance(other, Time):
-            return self.seconds % other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds % other
+    def __delattr__(self, key):
+        raise AttributeError(f'{type(self).__name__} is immutable')
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    def __reduce__(self):
+        return _time, (self.name, self.symbol, self.seconds)
 
-    def __divmod__(self, other):
-        if isinstance(other, Time):
-            return divmod(self.seconds, other.seconds)
-        if isinstance(other, int) or isinstance(other, float):
-            return divmod(self.seconds, other)
+    @classmethod
+    def __get_validators__(cls):
+        yield from_string
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    @classmethod
+    def __modify_schema__(cls, field_schema: t.Dict[str, t.Any]) -> None:
+        field_schema.update(type='string', example='1MO')
 
-    def __pow__(self, other):
-        if isinstance(other, Time):
-            return self.seconds ** other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            return self.seconds ** other
+    def __iter__(self) -> t.Iterator[t.Tuple[str, t.Any]]:
+        yield 'name', self.name
+        yield 'symbol', self.symbol
+        yield 'seconds', self.seconds
 
-        raise TypeError(f'Cannot mod {type(self)} with {type(other)}')
+    def dict(self) -> t.Dict[str, t.Any]:
+        """
+        Fields as a dict
 
-    def __radd__(self, other):
-        return self.__add__(other)
+        Returns:
+            Dict[str, Any]: `name`, `symbol` and `seconds`
+        """
 
-    def __rsub__(self, other):
-        return self.__sub__(other)
+        return dict(self)
 
-    def __rmul__(self, other):
-        return self.__mul__(other)
+    def __int__(self) -> int:
+        return int(self.seconds)
 
-    def __rtruediv__(self, other):
-        return self.__truediv__(other)
+    def __index__(self) -> int:
+        return int(self.seconds)
 
-    def __rfloordiv__(self, other):
-        return self.__floordiv__(other)
+    def __float__(self) -> float:
+        return float(self.seconds)
 
-    def __rmod__(self, other):
-        return self.__mod__(other)
+    def __str__(self):
+        return f"Time('{self.name}', '{self.symbol}', {self.seconds})"
 
-    def __rdivmod__(self, other):
-        return self.__divmod__(other)
+    def __repr__(self):
+        return f"Time('{self.name}', '{self.symbol}', {self.seconds})"
 
-    def __rpow__(self, other):
-        return self.__pow__(other)
+    def __hash__(self):
+        return hash(self.seconds)
 
-    def __iadd__(self, other):
-        if isinstance(other, Time):
-            self.seconds += other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            self.seconds += other
+    def __eq__(self, other):
+        if isinstance(other, str):
+            return self.symbol == other
 
-        raise TypeError(f'Cannot add {type(self)} with {type(other)}')
+        value = _operand(other)
+        return value if value is NotImplemented else self.seconds == value
 
-    def __isub__(self, other):
-        if isinstance(other, Time):
-            self.seconds -= other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            self.seconds -= other
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
 
-        raise TypeError(f'Cannot subtract {type(self)} with {type(other)}')
+    __lt__ = _binary(operator.lt)
+    __le__ = _binary(operator.le)
+    __gt__ = _binary(operator.gt)
+    __ge__ = _binary(operator.ge)
 
-    def __imul__(self, other):
-        if isinstance(other, Time):
-            self.seconds *= other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            self.seconds *= other
+    __add__ = _binary(operator.add)
+    __sub__ = _binary(operator.sub)
+    __mul__ = _binary(operator.mul)
+    __truediv__ = _binary(operator.truediv)
+    __floordiv__ = _binary(operator.floordiv)
+    __mod__ = _binary(operator.mod)
+    __divmod__ = _binary(divmod)
+    __pow__ = _binary(operator.pow)
 
-        raise TypeError(f'Cannot multiply {type(self)} with {type(other)}')
+    __radd__ = _binary(operator.add, reflected=True)
+    __rsub__ = _binary(operator.sub, reflected=True)
+    __rmul__ = _binary(operator.mul, reflected=True)
+    __rtruediv__ = _binary(operator.truediv, reflected=True)
+    __rfloordiv__ = _binary(operator.floordiv, reflected=True)
+    __rmod__ = _binary(operator.mod, reflected=True)
+    __rdivmod__ = _binary(divmod, reflected=True)
+    __rpow__ = _binary(operator.pow, reflected=True)
 
-    def __itruediv__(self, other):
-        if isinstance(other, Time):
-            self.seconds /= other.seconds
-        if isinstance(other, int) or isinstance(other, float):
-            self.seconds /= other
 
-        raise TypeError(f'Cannot divide {type(self)} with {type(other)}')
+def _time(name: str, symbol: str, seconds: int) -> Time:
+    return Time(name=name, symbol=symbol, seconds=seconds)
 
 
 SECOND = Time(name='second', symbol='s', seconds=1)
@@ -233,6 +175,21 @@ class TimeUnit(Enum):
     MONTH = MONTH
     YEAR = YEAR
 
+    @classmethod
+    def _missing_(cls, value: t.Any) -> t.Optional['TimeUnit']:
+        # `TimeUnit('MO')`: look members up by symbol or name, any case (the values themselves only match by hash)
+        if isinstance(value, str):
+            unit = UNITS_BY_KEY.get(value.strip().upper())
+            if unit is not None:
+                return cls(unit)
+
+        return None
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: t.Dict[str, t.Any]) -> None:
+        # the values themselves are not JSON, members are validated from their symbol (or name, see `_missing_`)
+        field_schema.update(type='string', enum=list(_SYMBOLS))
+
     @property
     def name(self) -> str:
         """
@@ -275,7 +232,7 @@ class TimeUnit(Enum):
             list[str]: All the names of the time units
         """
 
-        return [unit.name for unit in cls]
+        return list(_NAMES)
 
     @classmethod
     def all_symbols(cls) -> list[str]:
@@ -286,7 +243,7 @@ class TimeUnit(Enum):
             list[str]: All the symbols of the time units
         """
 
-        return [unit.symbol for unit in cls]
+        return list(_SYMBOLS)
 
     @classmethod
     def all_seconds(cls) -> list[int]:
@@ -297,7 +254,7 @@ class TimeUnit(Enum):
             list[int]: All the number of seconds in the time units
         """
 
-        return [unit.seconds for unit in cls]
+        return [unit.seconds for unit in _UNITS]
 
     @classmethod
     def map_symbols_by_name(cls) -> dict[str, str]:
@@ -308,7 +265,7 @@ class TimeUnit(Enum):
             dict[str, str]: A dictionary mapping the symbols of the time units by their names
         """
 
-        return {name: symbol for name, symbol in zip(cls.all_names(), cls.all_symbols())}
+        return dict(zip(_NAMES, _SYMBOLS))
 
     @classmethod
     def map_names_by_symbol(cls) -> dict[str, str]:
@@ -319,7 +276,7 @@ class TimeUnit(Enum):
             dict[str, str]: A dictionary mapping the names of the time units by their symbols
         """
 
-        return {symbol: name for name, symbol in zip(cls.all_names(), cls.all_symbols())}
+        return dict(zip(_SYMBOLS, _NAMES))
 
     @classmethod
     def map_seconds_by_name(cls) -> dict[str, int]:
@@ -330,7 +287,7 @@ class TimeUnit(Enum):
             dict[str, int]: A dictionary mapping the number of seconds in the time units by their names
         """
 
-        return {name: seconds for name, seconds in zip(cls.all_names(), cls.all_seconds())}
+        return {unit.name: unit.seconds for unit in _UNITS}
 
     @classmethod
     def map_seconds_by_symbol(cls) -> dict[str, int]:
@@ -341,50 +298,146 @@ class TimeUnit(Enum):
             dict[str, int]: A dictionary mapping the number of seconds in the time units by their symbols
         """
 
-        return {symbol: seconds for symbol, seconds in zip(cls.all_symbols(), cls.all_seconds())}
+        return {unit.symbol: unit.seconds for unit in _UNITS}
+
+
+# Lookup tables, built once: units by symbol and by name (upper case)
+_UNITS = tuple(unit.value for unit in TimeUnit)
+_NAMES = tuple(unit.name for unit in _UNITS)
+_SYMBOLS = tuple(unit.symbol for unit in _UNITS)
+UNITS_BY_KEY: t.Dict[str, Time] = {**{unit.name: unit for unit in _UNITS}, **{unit.symbol: unit for unit in _UNITS}}
+
+_PATTERN = re.compile(r'\s*(\d+)\s*([A-Z]+)\s*')
+
 
+@functools.lru_cache(maxsize=1024)
+def _parse(string: str) -> Time:
+    match = _PATTERN.fullmatch(string.upper())
+    if match is None:
+        raise ValueError(f'Cannot convert string to Time: {string!r}')
 
-def from_string(string: str) -> Time:
+    digits, key = match.groups()
+    unit = UNITS_BY_KEY.get(key)
+    if unit is None:
+        raise ValueError(f'Cannot convert string to Time: {key=} | {list(_SYMBOLS)} | {list(_NAMES)}')
+    if not int(digits):
+        raise ValueError('Cannot convert string to Time')
+
+    return Time(name=unit.name, symbol=unit.symbol, seconds=unit.seconds * int(digits))
+
+
+def from_string(string: t.Union[str, int, Time, TimeUnit]) -> Time:
     """
     Create a time from a string
 
+    A string is a whole number and a unit, given by symbol or by name in any case (`90m`, `2 WEEK`). The time takes
+    the unit's name and symbol (`Time('WEEK', 'W', 1209600)`). Besides strings, a number of seconds, a `Time`
+    (returned as is) or a `TimeUnit` (its time) are accepted, which is what the builders and pydantic fields pass.
+
+    Parsed strings are cached, so repeated values (e.g. the same duration for many inbounds) are parsed once.
+
     Args:
-        string (str): The string to create the time from
+        string (Union[str, int, Time, TimeUnit]): The string to create the time from (e.g. `1s`, `2 week`), a number of
+            seconds, a time or a unit
 
     Returns:
         Time: The time
 
     Raises:
-        ValueError: If the string is not a valid time
-        TypeError: If the string is not a string
-        KeyError: If the string is not a valid time unit
+        ValueError: If the string is not a valid time, or the number of seconds is negative
+        TypeError: If the value is neither a string, an int, a `Time` nor a `TimeUnit`
 
     Examples:
         >>> from_string('1s')
-        Time('S', 'SECOND', 1)
+        Time('SECOND', 'S', 1)
     """
 
-    if not isinstance(string, str):
-        raise TypeError(f'Expected str, got {type(string)}')
+    if isinstance(string, str):
+        if not string:
+            raise ValueError('Cannot convert empty string to Time')
 
-    if not string:
-        raise ValueError('Cannot convert empty string to Time')
+        return _parse(string)
 
-    string = string.upper()
+    if isinstance(string, Time):
+        return string
+    if isinstance(string, TimeUnit):
+        return string.value
+    if isinstance(string, int) and not isinstance(string, bool):
+        return Time(name=SECOND.name, symbol=SECOND.symbol, seconds=string)
 
-    digits = int(''.join(filter(str.isdigit, string)))
-    unit = ''.join(filter(str.isalpha, string))
+    raise TypeError(f'Expected str, int, Time or TimeUnit, got {type(string)}')
 
-    if not digits:
-        raise ValueError('Cannot convert string to Time')
 
-    if not unit:
-        raise ValueError('Cannot convert string to Time')
+_NUMBER = re.compile(r'\s*(\d+(?:\.\d*)?|\.\d+)\s*')
+_DURATION = re.compile(r'\s*(?:(?:\d+(?:\.\d*)?|\.\d+)\s*[A-Z]+\s*)+')
+_PART = re.compile(r'(\d+(?:\.\d*)?|\.\d+)\s*([A-Z]+)')
+
+
+def to_seconds(value: t.Union[str, int, float, Time, TimeUnit]) -> int:
+    """
+    Number of seconds of a value, more lenient than `from_string`
+
+    Strings may be compound (`1d12h`, `1w 2d`), have decimals (`1.5h`), plural unit names (`2 days`) or no unit
+    (seconds). Fractions of a second are rounded.
+
+    Args:
+        value (Union[str, int, float, Time, TimeUnit]): Value
+
+    Returns:
+        int: Seconds
+
+    Raises:
+        ValueError: If the value is not a valid duration
+        TypeError: If the value has an unsupported type
+    """
+
+    if isinstance(value, str):
+        string = value.upper()
+        match = _NUMBER.fullmatch(string)
+        if match is not None:
+            return round(Decimal(match.group(1)))
+        if _DURATION.fullmatch(string) is None:
+            raise ValueError(f'Cannot convert string to Time: {value!r}')
+
+        seconds = Decimal(0)
+        for number, key in _PART.findall(string):
+            if key not in UNITS_BY_KEY and key[:-1] in _NAMES:
+                key = key[:-1]
+            if key not in UNITS_BY_KEY:
+                raise ValueError(f'Cannot convert string to Time: {key=} | {list(_SYMBOLS)} | {list(_NAMES)}')
+            seconds += Decimal(number) * UNITS_BY_KEY[key].seconds
+
+        return round(seconds)
+
+    if isinstance(value, Time):
+        return value.seconds
+    if isinstance(value, TimeUnit):
+        return value.seconds
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError('seconds must be positive')
+        return round(value)
+
+    raise TypeError(f'Expected str or number, got {type(value)}')
+
+
+def parse_durations(
+        values: t.Iterable[t.Union[str, int, float, Time, TimeUnit]], *, use_numpy: t.Optional[bool] = None
+) -> t.Tuple[t.Sequence[int], t.Sequence[bool]]:
+    """
+    Seconds of many values at once (see `to_seconds`), without raising on bad ones
 
-    if (unit not in TimeUnit.all_symbols()) and (unit not in TimeUnit.all_names()):
-        raise ValueError(f'Cannot convert string to Time: {unit=} | {TimeUnit.all_symbols()} | {TimeUnit.all_names()}')
+    Args:
+        values (Iterable[Union[str, int, float, Time, TimeUnit]]): Values, e.g. a CSV column
+        use_numpy (Optional[bool]): Return NumPy arrays (default: when NumPy is installed)
+
+    Returns:
+        Tuple[Sequence[int], Sequence[bool]]: Seconds (`0` where invalid) and the error mask (`True` where invalid),
+            see `xtls_crud.utils.bulk.parse_many`
 
-    symbol = TimeUnit.map_names_by_symbol()[unit]
-    seconds = TimeUnit.map_seconds_by_symbol()[unit]
+    Examples:
+        >>> parse_durations(['1d12h', '30d', 'soon'])
+        (array([129600, 2592000,       0]), array([False, False,  True]))
+    """
 
-    return Time(name=unit, symbol=symbol, seconds=seconds * digits)
+    return parse_many(values, to_seconds, use_numpy=use_numpy)
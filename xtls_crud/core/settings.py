@@ -4,6 +4,36 @@ from pydantic import BaseSettings, HttpUrl
 from pathlib import Path
 
 
+SqliteProfile = t.Literal['safe', 'balanced', 'throughput']
+
+# PRAGMAs applied to every new SQLite connection for each storage profile
+SQLITE_PROFILES: t.Dict[str, t.Dict[str, t.Union[str, int]]] = {
+    # durability first, keeps the rollback journal x-ui creates the database with
+    'safe': {
+        'synchronous': 'FULL',
+        'busy_timeout': 10000,
+    },
+    # WAL lets readers run beside the x-ui panel's writer, NORMAL sync is still crash safe in WAL mode
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -16384,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+    },
+    # may lose the last transactions on power loss (never corrupts the database)
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'busy_timeout': 5000,
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
 class Settings(BaseSettings):
     class Config:
         env_file = '.env'
@@ -24,7 +54,62 @@ class Settings(BaseSettings):
 
     ASYNC_DB_URL: str = DATABASE_URL.replace('sqlite://', 'sqlite+aiosqlite://')
 
+    # Connection pool (None keeps SQLAlchemy's default: a new connection per session)
+    DB_POOL_SIZE: t.Optional[int] = None
+    DB_MAX_OVERFLOW: int = 10
+
+    # SQLite storage profile (None keeps SQLite defaults), single PRAGMAs below override the profile
+    SQLITE_PROFILE: t.Optional[SqliteProfile] = None
+    SQLITE_JOURNAL_MODE: t.Optional[t.Literal['DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF']] = None
+    SQLITE_SYNCHRONOUS: t.Optional[t.Literal['OFF', 'NORMAL', 'FULL', 'EXTRA']] = None
+    SQLITE_BUSY_TIMEOUT: t.Optional[int] = None  # milliseconds
+    SQLITE_CACHE_SIZE: t.Optional[int] = None  # pages, or KiB when negative
+    SQLITE_MMAP_SIZE: t.Optional[int] = None  # bytes
+    SQLITE_TEMP_STORE: t.Optional[t.Literal['DEFAULT', 'FILE', 'MEMORY']] = None
+
+    # Read-through cache for inbounds point lookups (get, get_by_tag, get_by_port, get_by_remark)
+    INBOUNDS_CACHE: bool = False
+    INBOUNDS_CACHE_TTL: t.Optional[float] = 30.0  # seconds
+    INBOUNDS_CACHE_MAXSIZE: int = 1024
+
+    # Free port allocation: inclusive ranges tried in order (env: JSON, e.g. '[[20000, 30000]]')
+    PORT_RANGES: t.List[t.Tuple[int, int]] = [(10000, 65535)]
+    PORT_RESERVE_TTL: t.Optional[float] = 300.0  # seconds an allocated port stays reserved for an in-flight build
+    PORT_RELOAD_INTERVAL: t.Optional[float] = 60.0  # seconds before used ports are reloaded from the database
+
+    # Background job of the web app disabling inbounds once their expiry_time is due (opt in: it writes to the panel's
+    # database, and wants the ix_inbounds_enable_expiry_time index, see `reyes db create-indexes`)
+    EXPIRY_SWEEP: bool = False
+    EXPIRY_SWEEP_MAX_INTERVAL: float = 60.0  # seconds
+
+    # Used fractions of an inbound's quota reported by quota enforcement (env: JSON, e.g. '[0.8, 0.95]')
+    QUOTA_WARNINGS: t.List[float] = [0.8, 0.95]
+
+    # Xray config rendered from the enabled inbounds, and the JSON file holding the rest of it (log, outbounds...)
+    XRAY_CONFIG_PATH: str = 'config.json'
+    XRAY_CONFIG_TEMPLATE: t.Optional[str] = None
+
+    # Distinct settings/stream_settings/sniffing JSON strings kept parsed for API listings (0 disables the cache)
+    JSON_PARSE_CACHE_SIZE: int = 4096
+
     SITE_URL: HttpUrl = 'http://127.0.0.1/'
 
+    def sqlite_pragmas(self) -> t.Dict[str, t.Union[str, int]]:
+        """
+        PRAGMAs of the configured storage profile, with single overrides applied
+
+        Returns:
+            Dict[str, Union[str, int]]: PRAGMA values by name
+        """
+
+        pragmas = dict(SQLITE_PROFILES[self.SQLITE_PROFILE]) if self.SQLITE_PROFILE else {}
+
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+            value = getattr(self, f'SQLITE_{name.upper()}')
+            if value is not None:
+                pragmas[name] = value
+
+        return pragmas
+
 
 settings = Settings()
@@ -1,53 +1,380 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import functools
+import json
+import operator
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Type, TypeVar, Union
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
+from sqlalchemy import bindparam, desc, tuple_, update
+from sqlalchemy.orm import defer as defer_, load_only
 
 from ..db.base_class import Base
-from ..db.session import SessionLocal as _session  # noqa
+from ..db.session import current_session, unit_of_work
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 FilterType = TypeVar("FilterType", bound=BaseModel)
+T = TypeVar("T")
+
+# `<column>_<op>` filter operators understood by `CRUDBase._where`
+FILTER_OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    'is_null': lambda column, value: column.is_(None) if value else column.isnot(None),
+    'gte': operator.ge,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'lt': operator.lt,
+    'ne': operator.ne,
+    'in': lambda column, value: column.in_(list(value)),
+}
+
+# Lowest bound-parameter limit of the SQLite builds we run against (SQLITE_MAX_VARIABLE_NUMBER before 3.32)
+SQLITE_MAX_VARIABLES = 999
+
+
+def _chunks(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    if size < 1:
+        raise ValueError('chunk size must be positive')
+
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode keyset values into an opaque, url safe pagination cursor
+
+    Args:
+        *values (Any): JSON serializable keyset values (e.g. the last row's id)
+
+    Returns:
+        str: Cursor
+    """
+
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor made by `encode_cursor`
+
+    Args:
+        cursor (str): Cursor
+
+    Returns:
+        List[Any]: Keyset values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from exc
+
+    if not isinstance(values, list) or not values:
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+
+    return values
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
-        self.session = _session
+        self._statements: Dict[Any, Any] = {}
+
+    @property
+    def session(self) -> AsyncSession:
+        return current_session()
+
+    def _invalidate(self, ids: Optional[Iterable[Any]] = None) -> None:
+        """
+        Called after every write, with the written ids (`None` when they are unknown), for subclasses that cache reads
+        """
+
+    def _statement(self, key: Any, build: Callable[[], T]) -> T:
+        """
+        Statement built by `build` on first use and reused afterwards, for hot queries whose values all go through bind
+        parameters: construction and SQLAlchemy's cache key (memoized on the statement) are then paid only once
+        """
+
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = build()
 
+        return statement
+
+    def _select_by(self, field: str):
+        # SELECT ... WHERE <field> = :value
+        return self._statement(
+            ('select_by', field), lambda: select(self.model).where(getattr(self.model, field) == bindparam('value')))
+
+    def _select_in(self, field: str):
+        # SELECT ... WHERE <field> IN (:values), the list is expanded at execution
+        return self._statement(
+            ('select_in', field),
+            lambda: select(self.model).where(getattr(self.model, field).in_(bindparam('values', expanding=True))))
+
+    def _columns(self, names: Sequence[str]) -> list:
+        known = self.model.__table__.columns.keys()
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ValueError(f'Unknown column: {unknown} | {known}')
+
+        return [getattr(self.model, name) for name in names]
+
+    def _select(
+            self,
+            *,
+            columns: Optional[Sequence[str]] = None,
+            as_rows: bool = False,
+            as_dicts: bool = False,
+            defer: Optional[Sequence[str]] = None
+    ):
+        if as_rows or as_dicts:
+            return select(*self._columns(columns or self.model.__table__.columns.keys()))
+
+        query = select(self.model)
+        if columns:
+            query = query.options(load_only(*self._columns(columns)))
+        if defer:
+            query = query.options(*(defer_(column) for column in self._columns(defer)))
+
+        return query
+
+    @staticmethod
+    def _fetch(result, *, as_rows: bool = False, as_dicts: bool = False) -> list:
+        if as_dicts:
+            return [dict(row) for row in result.mappings()]
+        if as_rows:
+            return result.all()
+
+        return result.scalars().all()
+
+    @unit_of_work
     async def get(self, id: Any) -> Optional[ModelType]:
-        _ = await self.session.execute(select(self.model).where(self.model.id == id))
+        _ = await self.session.execute(self._select_by('id'), {'value': id})
         return _.scalar()
 
-    async def get_multi_filter(
-            self, *, filters: FilterType, skip: int = 0, limit: int = 100
-    ) -> List[ModelType]:
-        if isinstance(filters, dict):
-            filter_data = filters
+    @unit_of_work
+    async def get_many(self, *, ids: Iterable[Any]) -> Dict[Any, ModelType]:
+        """
+        Get many rows by id
+
+        Args:
+            ids (Iterable[Any]): Ids to look up
+
+        Returns:
+            Dict[Any, ModelType]: Found rows keyed by id (missing ids are left out)
+        """
+
+        return await self._get_many_by('id', ids)
+
+    async def _get_many_by(self, field: str, values: Iterable[Any]) -> Dict[Any, ModelType]:
+        query = self._select_in(field)
+        values = list(dict.fromkeys(values))
+
+        result = {}
+        for chunk in _chunks(values, SQLITE_MAX_VARIABLES):
+            _ = await self.session.execute(query, {'values': list(chunk)})
+            for obj in _.scalars():
+                result[getattr(obj, field)] = obj
+
+        return result
+
+    def _paginate(self, query, *, skip: int, limit: int, cursor: Optional[str], order_by: str):
+        column = getattr(self.model, order_by)
+
+        if order_by == 'id':
+            if cursor is not None:
+                query = query.where(self.model.id < decode_cursor(cursor)[0])
+            query = query.order_by(desc(self.model.id))
         else:
-            filter_data = filters.dict(exclude_unset=True)
+            # `id` breaks ties so pages stay stable on non unique columns
+            if cursor is not None:
+                values = decode_cursor(cursor)
+                if len(values) != 2:
+                    raise ValueError(f'Invalid cursor: {cursor!r}')
+                query = query.where(tuple_(column, self.model.id) < tuple_(*values))
+            query = query.order_by(desc(column), desc(self.model.id))
 
-        where = []
-        for k, v in filter_data.items():
-            if v:
-                where.append(getattr(self.model, k) == v)
+        if cursor is None and skip:
+            query = query.offset(skip)
+
+        return query.limit(limit)
+
+    def next_cursor(self, rows: Sequence[ModelType], *, limit: int, order_by: str = 'id') -> Optional[str]:
+        """
+        Cursor of the page following `rows`
+
+        Args:
+            rows (Sequence[ModelType]): Page returned by `get_multi` or `get_multi_filter`
+            limit (int): Limit used to fetch the page
+            order_by (str): Keyset column used to fetch the page
 
-        query = select(self.model).where(*where).offset(skip).limit(limit)
+        Returns:
+            Optional[str]: Cursor, `None` when `rows` is the last page
+        """
+
+        if not rows or len(rows) < limit:
+            return None
+
+        last = rows[-1]
+        value = last.__getitem__ if isinstance(last, dict) else functools.partial(getattr, last)
+        if order_by == 'id':
+            return encode_cursor(value('id'))
+
+        return encode_cursor(value(order_by), value('id'))
+
+    @unit_of_work
+    async def get_multi_filter(
+            self,
+            *,
+            filters: FilterType,
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            order_by: str = 'id',
+            columns: Optional[Sequence[str]] = None,
+            as_rows: bool = False,
+            as_dicts: bool = False,
+            defer: Optional[Sequence[str]] = None
+    ) -> List[Union[ModelType, Row, Dict[str, Any]]]:
+        """
+        Get a page of rows matching `filters`
+
+        Args:
+            filters (FilterType): Column filters, `<column>` or `<column>_<op>` keys (see `FILTER_OPERATORS`), `None`
+                values are ignored
+            skip (int): Offset, when no cursor is given
+            limit (int): Page size
+            cursor (Optional[str]): Cursor from `next_cursor`
+            order_by (str): Keyset column (descending, ties broken by id)
+            columns (Optional[Sequence[str]]): Only load these columns (include `id` to use `next_cursor`)
+            as_rows (bool): Return named tuples instead of ORM objects
+            as_dicts (bool): Return dicts instead of ORM objects
+            defer (Optional[Sequence[str]]): Columns left unloaded on ORM objects (e.g. `CRUDInbounds.JSON_COLUMNS`),
+                they must not be read outside of `AsyncSession.run_sync`
+
+        Returns:
+            List[Union[ModelType, Row, Dict[str, Any]]]: Rows
+
+        Raises:
+            ValueError: On an unknown filter or a malformed cursor
+        """
+
+        query = self._select(columns=columns, as_rows=as_rows, as_dicts=as_dicts, defer=defer)
+        query = self._paginate(
+            query.where(*self._where(filters)), skip=skip, limit=limit, cursor=cursor, order_by=order_by)
 
         _ = await self.session.execute(query)
-        return _.scalars().all()
+        return self._fetch(_, as_rows=as_rows, as_dicts=as_dicts)
 
+    @unit_of_work
     async def get_multi(
-            self, *, skip: int = 0, limit: int = 100
-    ) -> List[ModelType]:
-        _ = await self.session.execute(select(self.model).offset(skip).limit(limit).order_by(desc(self.model.id)))
-        return _.scalars().all()
+            self,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            order_by: str = 'id',
+            columns: Optional[Sequence[str]] = None,
+            as_rows: bool = False,
+            as_dicts: bool = False,
+            defer: Optional[Sequence[str]] = None
+    ) -> List[Union[ModelType, Row, Dict[str, Any]]]:
+        """
+        Get a page of rows (see `get_multi_filter` for the arguments)
+
+        Examples:
+            ```py linenums="1"
+            rows = await inbounds.get_multi(columns=['id', 'tag', 'up', 'down', 'total'], as_dicts=True)
+            ```
+        """
+
+        query = self._select(columns=columns, as_rows=as_rows, as_dicts=as_dicts, defer=defer)
+        query = self._paginate(query, skip=skip, limit=limit, cursor=cursor, order_by=order_by)
+
+        _ = await self.session.execute(query)
+        return self._fetch(_, as_rows=as_rows, as_dicts=as_dicts)
+
+    async def stream(
+            self,
+            *,
+            filters: Optional[Union[FilterType, Dict[str, Any]]] = None,
+            batch_size: int = 500,
+            batches: bool = False,
+            columns: Optional[Sequence[str]] = None,
+            as_rows: bool = False,
+            as_dicts: bool = False,
+            defer: Optional[Sequence[str]] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate over every row matching `filters` (ordered by id) with bounded memory
+
+        Rows are fetched through a server side cursor `batch_size` at a time, and every batch is expunged from the
+        session once the consumer moves past it, so the identity map does not grow with the table. Iterate inside
+        `get_session`: the cursor belongs to that unit of work.
 
+        Args:
+            filters (Optional[Union[FilterType, Dict[str, Any]]]): Column filters (see `get_multi_filter`)
+            batch_size (int): Number of rows fetched per round trip
+            batches (bool): Yield lists of up to `batch_size` rows instead of single rows
+            columns (Optional[Sequence[str]]): Only load these columns
+            as_rows (bool): Yield named tuples instead of ORM objects (nothing enters the identity map)
+            as_dicts (bool): Yield dicts instead of ORM objects (nothing enters the identity map)
+            defer (Optional[Sequence[str]]): Columns left unloaded on ORM objects
+
+        Yields:
+            Any: Rows (ORM objects, tuples or dicts), or batches of rows
+
+        Examples:
+            ```py linenums="1"
+            async for inbound in inbounds.stream(filters={'enable': True}):
+                print(inbound.tag)
+            ```
+        """
+
+        orm = not (as_rows or as_dicts)
+        query = self._select(columns=columns, as_rows=as_rows, as_dicts=as_dicts, defer=defer)
+        query = query.where(*self._where(filters or {})).order_by(self.model.id).execution_options(
+            yield_per=batch_size)
+
+        result = await self.session.stream(query)
+        if orm:
+            rows = result.scalars()
+        elif as_dicts:
+            rows = result.mappings()
+        else:
+            rows = result
+
+        try:
+            async for partition in rows.partitions(batch_size):
+                if as_dicts:
+                    partition = [dict(row) for row in partition]
+                try:
+                    if batches:
+                        yield partition
+                    else:
+                        for obj in partition:
+                            yield obj
+                finally:
+                    if orm:
+                        for obj in partition:
+                            if obj in self.session:
+                                self.session.expunge(obj)
+        finally:
+            await result.close()
+
+    @unit_of_work
     async def create(self, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
@@ -55,36 +382,150 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self.session.add(db_obj)
         await self.session.commit()
         await self.session.refresh(db_obj)
+        self._invalidate([db_obj.id])
 
         return db_obj
 
+    @unit_of_work
     async def update(
             self,
             *,
             db_obj: ModelType,
             obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
+        for field in self.model.__table__.columns.keys():
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
 
         self.session.add(db_obj)
         await self.session.commit()
         await self.session.refresh(db_obj)
+        self._invalidate([db_obj.id])
 
         return db_obj
 
+    def _where(self, filters: Union[FilterType, Dict[str, Any]]) -> list:
+        """
+        WHERE clauses of `filters`: `<column>` is an equality check, `<column>_<op>` applies one of `FILTER_OPERATORS`
+
+        `None` values are ignored.
+
+        Raises:
+            ValueError: On a key that is neither a column nor a column with an operator
+        """
+
+        if isinstance(filters, dict):
+            filter_data = filters
+        else:
+            filter_data = filters.dict(exclude_unset=True)
+
+        columns = self.model.__table__.columns
+        where = []
+        for key, value in filter_data.items():
+            if value is None:
+                continue
+
+            if key in columns:
+                where.append(getattr(self.model, key) == value)
+                continue
+
+            for op, clause in FILTER_OPERATORS.items():
+                name = key[:-len(op) - 1]
+                if key.endswith(f'_{op}') and name in columns:
+                    where.append(clause(getattr(self.model, name), value))
+                    break
+            else:
+                raise ValueError(f'Unknown filter: {key}')
+
+        return where
+
+    @unit_of_work
+    async def update_where(
+            self,
+            *,
+            filters: Union[FilterType, Dict[str, Any]],
+            values: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> int:
+        """
+        Update every row matching `filters` with a single `UPDATE ... WHERE` statement
+
+        Filters are the ones of `get_multi_filter`, `None` values are ignored. At least one filter must remain, so
+        that a missing value never turns into an update of the whole table. Rows are never loaded, objects already in
+        the session are not synchronized.
+
+        Args:
+            filters (Union[FilterType, Dict[str, Any]]): Column filters
+            values (Union[UpdateSchemaType, Dict[str, Any]]): Columns to set
+
+        Returns:
+            int: Number of affected rows
+
+        Raises:
+            ValueError: If no filter is left once `None` values are dropped, or on an unknown filter
+        """
+
+        where = self._where(filters)
+        if not where:
+            raise ValueError('update_where needs at least one filter, refusing to update every row')
+
+        if not isinstance(values, dict):
+            values = values.dict(exclude_unset=True)
+        if not values:
+            return 0
+
+        query = update(self.model).where(*where).values(**values).execution_options(
+            synchronize_session=False)
+
+        _ = await self.session.execute(query)
+        await self.session.commit()
+        self._invalidate()
+
+        return _.rowcount
+
+    @unit_of_work
+    async def update_many(self, objs_in: Dict[Any, Dict[str, Any]]) -> int:
+        """
+        Update many rows by id using one executemany per distinct set of updated columns
+
+        Args:
+            objs_in (Dict[Any, Dict[str, Any]]): Columns to set, keyed by row id
+
+        Returns:
+            int: Number of affected rows
+        """
+
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for id_, values in objs_in.items():
+            if values:
+                groups.setdefault(tuple(sorted(values)), []).append({'_id': id_, **values})
+
+        table = self.model.__table__
+        rowcount = 0
+        try:
+            for params in groups.values():
+                _ = await self.session.execute(update(table).where(table.c.id == bindparam('_id')), params)
+                rowcount += _.rowcount
+
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        finally:
+            self._invalidate(objs_in)
+
+        return rowcount
+
+    @unit_of_work
     async def remove(self, *, id: int) -> ModelType:
-        obj = await self.session.execute(select(self.model).where(self.model.id == id))
-        obj = obj.get(id)
+        obj = await self.session.execute(self._select_by('id'), {'value': id})
+        obj = obj.scalar()
 
         await self.session.delete(obj)
         await self.session.commit()
+        self._invalidate([id])
 
         return obj
@@ -1,16 +1,258 @@
-from typing import Any, Dict, Union, Optional
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Literal, Sequence, Tuple, Type, Union, Optional
+from sqlalchemy import Integer, bindparam, cast, func, insert, or_, update
 from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 
-from ..crud.base import CRUDBase
+from ..crud.base import CRUDBase, SQLITE_MAX_VARIABLES, _chunks
+from ..db.session import unit_of_work
 from ..models.inbounds import Inbounds
-from ..schemas.inbounds import InboundsCreate, InboundsUpdate
+from ..schemas.inbounds import InboundsCreate, InboundsFilter, InboundsUpdate
+from ...core.settings import settings
+from ...utils.cache import LRUCache
+from ...utils.ports import PortAllocator, PortRange
+
+ConflictPolicy = Literal['skip', 'overwrite', 'fail']
+
+_TRAFFIC = func.coalesce(Inbounds.up, 0) + func.coalesce(Inbounds.down, 0)
+
+# Aggregates available to `CRUDInbounds.aggregate`, by name
+AGGREGATE_METRICS = {
+    'count': func.count(),
+    'enabled': func.coalesce(func.sum(cast(Inbounds.enable, Integer)), 0),
+    'sum_up': func.coalesce(func.sum(Inbounds.up), 0),
+    'sum_down': func.coalesce(func.sum(Inbounds.down), 0),
+    'sum_traffic': func.coalesce(func.sum(_TRAFFIC), 0),
+    'sum_total': func.coalesce(func.sum(Inbounds.total), 0),
+    'max_traffic': func.max(_TRAFFIC),
+    'min_expiry_time': func.min(func.nullif(Inbounds.expiry_time, 0)),
+    'max_expiry_time': func.max(func.nullif(Inbounds.expiry_time, 0)),
+}
+
+# Columns `CRUDInbounds.aggregate` can group by
+AGGREGATE_GROUPS = ('user_id', 'protocol', 'enable', 'listen')
+
+
+def _increment_traffic(key: str):
+    # UPDATE inbounds SET up = coalesce(up, 0) + :_up, down = coalesce(down, 0) + :_down WHERE <key> = :_key
+    table = Inbounds.__table__
+    return update(table).where(table.c[key] == bindparam('_key')).values(
+        up=func.coalesce(table.c.up, 0) + bindparam('_up'), down=func.coalesce(table.c.down, 0) + bindparam('_down'))
 
 
 class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
     """
     CRUD for Inbounds Table
+
+    Point lookups (`get`, `get_by_tag`, `get_by_port`, `get_by_remark`) can be served from an in-process read-through
+    cache, see `enable_cache`.
+
+    Free ports are handed out by `allocate_port`, from a bitmap of used ports kept in sync with writes made here.
+
+    List reads that do not need the JSON columns can skip them with `columns=[...]` or `defer=JSON_COLUMNS`.
     """
 
+    JSON_COLUMNS = ('settings', 'stream_settings', 'sniffing')
+
+    def __init__(self, model: Type[Inbounds]):
+        super().__init__(model)
+        self.cache: Optional[LRUCache] = None
+        self.ports: Optional[PortAllocator] = None
+
+    def enable_cache(self, *, ttl: Optional[float] = 30.0, maxsize: int = 1024) -> LRUCache:
+        """
+        Serve point lookups from an LRU cache
+
+        Writes made through this object invalidate the cache, writes made by others (e.g. the x-ui panel) are only
+        picked up once `ttl` expires.
+
+        Args:
+            ttl (Optional[float]): Seconds a row stays cached (None: until evicted or invalidated)
+            maxsize (int): Maximum number of cached lookup keys
+
+        Returns:
+            LRUCache: The cache (see `LRUCache.stats` for hit/miss counters)
+        """
+
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        return self.cache
+
+    def disable_cache(self) -> None:
+        """
+        Stop caching point lookups
+        """
+
+        self.cache = None
+
+    def _invalidate(self, ids: Optional[Iterable[Any]] = None) -> None:
+        if self.cache is None:
+            return
+
+        if ids is None:
+            self.cache.clear()
+        else:
+            for id_ in ids:
+                self.cache.invalidate_group(id_)
+
+    def _where(self, filters: Union[InboundsFilter, Dict[str, Any]]) -> list:
+        """
+        Column filters (see `CRUDBase._where`) plus the computed ones of `InboundsFilter`: `expires_within` (SECONDS)
+        and `usage_ratio_gte`/`usage_ratio_lt`
+        """
+
+        filter_data = dict(filters) if isinstance(filters, dict) else filters.dict(exclude_unset=True)
+        expires_within = filter_data.pop('expires_within', None)
+        ratio_gte = filter_data.pop('usage_ratio_gte', None)
+        ratio_lt = filter_data.pop('usage_ratio_lt', None)
+
+        where = super()._where(filter_data)
+        if expires_within is not None:
+            where += [Inbounds.expiry_time > 0, Inbounds.expiry_time < int((time.time() + expires_within) * 1000)]
+        if ratio_gte is not None or ratio_lt is not None:
+            # multiplied out so no division happens per row, and unlimited (total 0) inbounds never match
+            where.append(Inbounds.total > 0)
+            if ratio_gte is not None:
+                where.append(_TRAFFIC >= Inbounds.total * ratio_gte)
+            if ratio_lt is not None:
+                where.append(_TRAFFIC < Inbounds.total * ratio_lt)
+
+        return where
+
+    @unit_of_work
+    async def port_allocator(self, *, reload: bool = False) -> PortAllocator:
+        """
+        Port allocator, (re)loaded from the database with one query when missing, stale or `reload` is set
+
+        Ports taken by other writers (e.g. the x-ui panel) are picked up every `PORT_RELOAD_INTERVAL` seconds.
+
+        Args:
+            reload (bool): Reload used ports now
+
+        Returns:
+            PortAllocator: Allocator
+        """
+
+        interval = settings.PORT_RELOAD_INTERVAL
+        if self.ports is None or self.ports.stale:
+            reload = True
+        elif interval is not None and time.monotonic() - self.ports.loaded_at > interval:
+            reload = True
+
+        if reload:
+            _ = await self.session.execute(select(Inbounds.port))
+            used = [port for port in _.scalars() if port is not None]
+
+            # published only once loaded: callers arriving during the query above keep reloading (or using the
+            # previous ports) instead of allocating from an empty bitmap
+            if self.ports is None:
+                self.ports = PortAllocator(
+                    ranges=settings.PORT_RANGES, used=used, reserve_ttl=settings.PORT_RESERVE_TTL)
+            else:
+                self.ports.load(used)
+
+        return self.ports
+
+    @unit_of_work
+    async def allocate_port(self, *, ranges: Optional[Sequence[PortRange]] = None) -> int:
+        """
+        Reserve a free port for an inbound about to be created
+
+        The reservation ends when an inbound is created with the port, on `release_port`, or after `PORT_RESERVE_TTL`.
+
+        Args:
+            ranges (Optional[Sequence[Tuple[int, int]]]): Inclusive port ranges (default: `PORT_RANGES`)
+
+        Returns:
+            int: Port
+
+        Raises:
+            ValueError: If every range is full
+        """
+
+        port = (await self.port_allocator()).allocate(ranges=ranges)
+        if port is None:
+            raise ValueError('No free port left')
+
+        return port
+
+    @unit_of_work
+    async def allocate_ports(self, count: int, *, ranges: Optional[Sequence[PortRange]] = None) -> List[int]:
+        """
+        Reserve `count` free ports at once (see `allocate_port`)
+
+        Args:
+            count (int): Number of ports
+            ranges (Optional[Sequence[Tuple[int, int]]]): Inclusive port ranges (default: `PORT_RANGES`)
+
+        Returns:
+            List[int]: Ports
+
+        Raises:
+            ValueError: If the ranges do not have `count` free ports
+        """
+
+        return (await self.port_allocator()).allocate_many(count, ranges=ranges)
+
+    def release_port(self, port: int) -> None:
+        """
+        Give back a port reserved by `allocate_port` that will not be used
+
+        Args:
+            port (int): Port
+        """
+
+        if self.ports is not None and port is not None:
+            self.ports.release(port)
+
+    def _ports_written(self, *, used: Iterable[int] = (), freed: Iterable[int] = ()) -> None:
+        if self.ports is None:
+            return
+
+        for port in freed:
+            self.ports.release(port)
+        for port in used:
+            self.ports.commit(port)
+
+    async def _get_cached(self, field: str, value: Any) -> Optional[Inbounds]:
+        query = self._select_by(field)
+
+        if self.cache is None:
+            return (await self.session.execute(query, {'value': value})).scalar_one_or_none()
+
+        snapshot = self.cache.get((field, value))
+        if snapshot is not None:
+            # the session's own instance may hold unflushed changes, never overwrite it with the snapshot
+            present = self.session.identity_map.get(identity_key(Inbounds, snapshot.id))
+            if present is not None:
+                return present
+            # attach a copy to the current session without emitting SQL
+            return await self.session.merge(snapshot, load=False)
+
+        db_obj = (await self.session.execute(query, {'value': value})).scalar_one_or_none()
+        if db_obj is not None:
+            snapshot = Inbounds(**{column: getattr(db_obj, column) for column in Inbounds.__table__.columns.keys()})
+            make_transient_to_detached(snapshot)
+            self.cache.set((field, value), snapshot, group=db_obj.id)
+
+        return db_obj
+
+    @unit_of_work
+    async def get(self, id: Any) -> Optional[Inbounds]:
+        """
+        Get Inbounds by id
+
+        Args:
+            id (Any): ID
+
+        Returns:
+            Inbounds (Optional[Inbounds]): Inbound object model
+        """
+
+        return await self._get_cached('id', id)
+
+    @unit_of_work
     async def create(self, *, obj_in: InboundsCreate) -> Inbounds:
         """
         Create a new Inbounds
@@ -42,9 +284,157 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
         self.session.add(db_obj)
         await self.session.commit()
         await self.session.refresh(db_obj)
+        self._invalidate([db_obj.id])
+        self._ports_written(used=[db_obj.port])
 
         return db_obj
 
+    @unit_of_work
+    async def create_many(
+            self, *, objs_in: Sequence[Union[InboundsCreate, Dict[str, Any]]], chunk_size: int = 500
+    ) -> List[int]:
+        """
+        Create many Inbounds in bulk
+
+        `port` and `tag` uniqueness is checked for the whole batch before anything is written,
+        then every chunk is inserted with a single executemany and committed in its own transaction.
+        No row is refreshed, ids are fetched back with one query per chunk.
+
+        Args:
+            objs_in (Sequence[Union[InboundsCreate, Dict[str, Any]]]): New Inbound object models
+                (dicts are trusted as is and must contain every column)
+            chunk_size (int): Number of rows per transaction
+
+        Returns:
+            List[int]: Generated ids, in the same order as `objs_in`
+
+        Raises:
+            ValueError: If a port or tag is duplicated in the batch or already exists
+        """
+
+        rows = [obj_in if isinstance(obj_in, dict) else obj_in.dict() for obj_in in objs_in]
+        if not rows:
+            return []
+
+        await self._check_unique(rows)
+
+        ids_by_tag = {}
+        try:
+            for chunk in _chunks(rows, min(chunk_size, SQLITE_MAX_VARIABLES)):
+                await self.session.execute(insert(Inbounds), chunk)
+
+                _ = await self.session.execute(
+                    select(Inbounds.tag, Inbounds.id).where(Inbounds.tag.in_([row['tag'] for row in chunk]))
+                )
+                ids_by_tag.update(_.all())
+
+                await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        self._invalidate(ids_by_tag.values())
+        self._ports_written(used=[row['port'] for row in rows if row['tag'] in ids_by_tag])
+
+        return [ids_by_tag[row['tag']] for row in rows]
+
+    @unit_of_work
+    async def import_many(
+            self, *, rows: Sequence[Dict[str, Any]], on_conflict: ConflictPolicy = 'fail'
+    ) -> Dict[str, int]:
+        """
+        Insert many Inbounds in one transaction, resolving `port`/`tag` conflicts with existing rows
+
+        Conflicts are found with one query before anything is written, so a failing batch writes nothing.
+
+        Args:
+            rows (Sequence[Dict[str, Any]]): Every column but `id` (an `id` key is ignored)
+            on_conflict (Literal['skip', 'overwrite', 'fail']): What to do with a row whose port or tag exists:
+                leave the existing row, update it with the row, or raise
+
+        Returns:
+            Dict[str, int]: Number of `inserted`, `updated` and `skipped` rows
+
+        Raises:
+            ValueError: If a port or tag is duplicated in the batch, on conflict with `fail`, or when `overwrite`
+                matches the port and the tag of two different inbounds
+        """
+
+        rows = [{k: v for k, v in row.items() if k != 'id'} for row in rows]
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        if not rows:
+            return counts
+
+        for field in ('port', 'tag'):
+            duplicates = [k for k, v in Counter(row[field] for row in rows).items() if v > 1]
+            if duplicates:
+                raise ValueError(f'Duplicate {field} in batch: {duplicates}')
+
+        by_port, by_tag, old_ports = {}, {}, {}
+        for chunk in _chunks(rows, SQLITE_MAX_VARIABLES // 2):
+            _ = await self.session.execute(
+                select(Inbounds.id, Inbounds.port, Inbounds.tag).where(or_(
+                    Inbounds.port.in_([row['port'] for row in chunk]),
+                    Inbounds.tag.in_([row['tag'] for row in chunk]),
+                ))
+            )
+            for id_, port, tag in _.all():
+                by_port[port], by_tag[tag], old_ports[id_] = id_, id_, port
+
+        inserts, updates = [], []
+        for row in rows:
+            ids = {by_port.get(row['port']), by_tag.get(row['tag'])} - {None}
+            if not ids:
+                inserts.append(row)
+            elif on_conflict == 'fail':
+                raise ValueError(f"Port or tag already exists: {(row['port'], row['tag'])}")
+            elif on_conflict == 'skip':
+                counts['skipped'] += 1
+            elif len(ids) > 1:
+                raise ValueError(f"Port and tag belong to different inbounds: {(row['port'], row['tag'])}")
+            else:
+                updates.append({'_id': ids.pop(), **row})
+
+        table = Inbounds.__table__
+        try:
+            if updates:
+                await self.session.execute(update(table).where(table.c.id == bindparam('_id')), updates)
+            if inserts:
+                await self.session.execute(insert(Inbounds), inserts)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        finally:
+            self._invalidate(params['_id'] for params in updates)
+
+        self._ports_written(
+            used=[row['port'] for row in (*inserts, *updates)],
+            freed=[old_ports[params['_id']] for params in updates if old_ports[params['_id']] != params['port']],
+        )
+
+        counts['inserted'], counts['updated'] = len(inserts), len(updates)
+        return counts
+
+    async def _check_unique(self, rows: Sequence[Dict[str, Any]]) -> None:
+        for field in ('port', 'tag'):
+            duplicates = [k for k, v in Counter(row[field] for row in rows).items() if v > 1]
+            if duplicates:
+                raise ValueError(f'Duplicate {field} in batch: {duplicates}')
+
+        # one query for the whole batch, unless it does not fit in SQLite's variable limit
+        for chunk in _chunks(rows, SQLITE_MAX_VARIABLES // 2):
+            _ = await self.session.execute(
+                select(Inbounds.port, Inbounds.tag).where(or_(
+                    Inbounds.port.in_([row['port'] for row in chunk]),
+                    Inbounds.tag.in_([row['tag'] for row in chunk]),
+                ))
+            )
+            existing = _.all()
+            if existing:
+                raise ValueError(f'Port or tag already exists: {[tuple(row) for row in existing]}')
+
+    @unit_of_work
     async def update(
             self, *, db_obj: Inbounds, obj_in: Union[InboundsUpdate, Dict[str, Any]]
     ):
@@ -59,16 +449,275 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Inbounds): Newly Inbound object model
         """
 
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
+        port = db_obj.port
+        db_obj = await super().update(db_obj=db_obj, obj_in=obj_in)
+        if db_obj.port != port:
+            self._ports_written(used=[db_obj.port], freed=[port])
+
+        return db_obj
+
+    @unit_of_work
+    async def update_where(
+            self,
+            *,
+            filters: Union[InboundsFilter, Dict[str, Any]],
+            values: Union[InboundsUpdate, Dict[str, Any]]
+    ) -> int:
+        if not isinstance(values, dict):
+            values = values.dict(exclude_unset=True)
+
+        rowcount = await super().update_where(filters=filters, values=values)
+        if 'port' in values and self.ports is not None:
+            self.ports.stale = True
+
+        return rowcount
+
+    @unit_of_work
+    async def update_many(self, objs_in: Dict[Any, Dict[str, Any]]) -> int:
+        try:
+            return await super().update_many(objs_in)
+        finally:
+            if self.ports is not None and any('port' in values for values in objs_in.values()):
+                # the previous ports are unknown, reload on next allocation
+                self.ports.stale = True
+
+    @unit_of_work
+    async def remove(self, *, id: int) -> Inbounds:
+        obj = await super().remove(id=id)
+        self._ports_written(freed=[obj.port])
+
+        return obj
+
+    @unit_of_work
+    async def set_enable(self, *, enable: bool, user_id: Optional[int] = None, protocol: Optional[str] = None) -> int:
+        """
+        Enable or disable every Inbounds of a user and/or protocol in one statement
+
+        Args:
+            enable (bool): New enable state
+            user_id (Optional[int]): Only touch inbounds of this user
+            protocol (Optional[str]): Only touch inbounds of this protocol
+
+        Returns:
+            int: Number of affected rows
+
+        Raises:
+            ValueError: If neither `user_id` nor `protocol` is given
+        """
 
-        for k, v in update_data.items():
-            update_data[k] = v
+        if user_id is None and protocol is None:
+            raise ValueError('set_enable needs a user_id or a protocol, refusing to update every inbound')
 
-        return await super().update(db_obj=db_obj, obj_in=update_data)
+        return await self.update_where(
+            filters={'user_id': user_id, 'protocol': protocol}, values={'enable': enable}
+        )
+
+    @unit_of_work
+    async def increment_traffic(self, deltas: Dict[Union[int, str], Tuple[int, int]]) -> int:
+        """
+        Atomically add traffic deltas to the `up`/`down` counters
+
+        Counters are incremented in SQL (`SET up = up + ?, down = down + ?`), so concurrent writers never lose
+        increments. The whole batch runs as at most two executemany statements (by id and by tag) in one transaction.
 
+        Args:
+            deltas (Dict[Union[int, str], Tuple[int, int]]): `(up, down)` deltas keyed by inbound id (int) or tag (str)
+
+        Returns:
+            int: Number of affected rows
+        """
+
+        by_id = [{'_key': k, '_up': up, '_down': down} for k, (up, down) in deltas.items() if isinstance(k, int)]
+        by_tag = [{'_key': k, '_up': up, '_down': down} for k, (up, down) in deltas.items() if isinstance(k, str)]
+
+        ids = [params['_key'] for params in by_id]
+        rowcount = 0
+        try:
+            if by_tag and self.cache is not None:
+                # cached rows are grouped by id, whichever key they were looked up by
+                for chunk in _chunks([params['_key'] for params in by_tag], SQLITE_MAX_VARIABLES):
+                    _ = await self.session.execute(select(Inbounds.id).where(Inbounds.tag.in_(chunk)))
+                    ids.extend(_.scalars())
+
+            for column, params in (('id', by_id), ('tag', by_tag)):
+                if params:
+                    query = self._statement(('increment_traffic', column), lambda: _increment_traffic(column))
+                    rowcount += (await self.session.execute(query, params)).rowcount
+
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        finally:
+            self._invalidate(ids)
+
+        return rowcount
+
+    @unit_of_work
+    async def next_expiry(self) -> Optional[int]:
+        """
+        Earliest `expiry_time` of the enabled Inbounds that expire
+
+        A single seek on the `ix_inbounds_enable_expiry_time` index when it exists (see `reyes db create-indexes`).
+
+        Returns:
+            Optional[int]: Timestamp (MILLISECONDS), `None` when no enabled inbound expires
+        """
+
+        _ = await self.session.execute(self._statement('next_expiry', lambda: select(
+            func.min(Inbounds.expiry_time)).where(Inbounds.enable == True, Inbounds.expiry_time > 0)))  # noqa
+        return _.scalar()
+
+    @unit_of_work
+    async def disable_expired(self, *, now: Optional[int] = None) -> List[str]:
+        """
+        Disable every enabled Inbounds whose `expiry_time` is due
+
+        Only due rows are read (by the `enable, expiry_time` index), then they are disabled with one
+        `UPDATE ... WHERE id IN (...)` per chunk, in one transaction.
+
+        Args:
+            now (Optional[int]): Current timestamp (MILLISECONDS), defaults to the system clock
+
+        Returns:
+            List[str]: Tags of the disabled inbounds
+        """
+
+        if now is None:
+            now = int(time.time() * 1000)
+
+        query = self._statement('expired', lambda: select(Inbounds.id, Inbounds.tag).where(
+            Inbounds.enable == True, Inbounds.expiry_time > 0, Inbounds.expiry_time <= bindparam('now')))  # noqa
+        due = (await self.session.execute(query, {'now': now})).all()
+        if not due:
+            return []
+
+        ids = [id_ for id_, _tag in due]
+        try:
+            for chunk in _chunks(ids, SQLITE_MAX_VARIABLES):
+                await self.session.execute(
+                    update(Inbounds).where(Inbounds.id.in_(chunk)).values(enable=False).execution_options(
+                        synchronize_session=False)
+                )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        finally:
+            self._invalidate(ids)
+
+        return [tag for _id, tag in due]
+
+    @unit_of_work
+    async def disable_over_quota(self) -> List[str]:
+        """
+        Disable every enabled Inbounds whose traffic reached its quota (`total > 0 AND up + down >= total`)
+
+        The over-quota tags are read, then the rows are disabled with one `UPDATE ... WHERE` on the same predicate,
+        in one transaction. No row is loaded.
+
+        Returns:
+            List[str]: Tags of the disabled inbounds
+        """
+
+        where = (
+            Inbounds.enable == True,  # noqa
+            Inbounds.total > 0,
+            func.coalesce(Inbounds.up, 0) + func.coalesce(Inbounds.down, 0) >= Inbounds.total,
+        )
+
+        try:
+            over = (await self.session.execute(select(Inbounds.id, Inbounds.tag).where(*where))).all()
+            if over:
+                await self.session.execute(
+                    update(Inbounds).where(*where).values(enable=False).execution_options(synchronize_session=False)
+                )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        self._invalidate(id_ for id_, _tag in over)
+
+        return [tag for _id, tag in over]
+
+    @unit_of_work
+    async def quota_usage(self, *, threshold: float) -> List[Tuple[str, float]]:
+        """
+        Enabled Inbounds that used at least `threshold` of their quota, without being over it
+
+        Args:
+            threshold (float): Used fraction of `total` (e.g. `0.8`)
+
+        Returns:
+            List[Tuple[str, float]]: `(tag, used fraction)` pairs, most used first
+        """
+
+        used = func.coalesce(Inbounds.up, 0) + func.coalesce(Inbounds.down, 0)
+        ratio = (used * 1.0 / Inbounds.total).label('ratio')
+
+        _ = await self.session.execute(
+            select(Inbounds.tag, ratio).where(
+                Inbounds.enable == True,  # noqa
+                Inbounds.total > 0,
+                used >= Inbounds.total * threshold,
+                used < Inbounds.total,
+            ).order_by(ratio.desc())
+        )
+        return [tuple(row) for row in _.all()]
+
+    @unit_of_work
+    async def aggregate(
+            self,
+            *,
+            group_by: Sequence[str] = (),
+            metrics: Sequence[str] = ('count', 'sum_up', 'sum_down'),
+            filters: Optional[Dict[str, Any]] = None,
+            expires_before: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate statistics computed in SQL, one row per group
+
+        Args:
+            group_by (Sequence[str]): Columns to group by (see `AGGREGATE_GROUPS`), none for a single total row
+            metrics (Sequence[str]): Aggregates to compute (see `AGGREGATE_METRICS`)
+            filters (Optional[Dict[str, Any]]): Filters (see `InboundsFilter`), `None` values are ignored
+            expires_before (Optional[int]): Only inbounds that expire before this timestamp (MILLISECONDS)
+
+        Returns:
+            List[Dict[str, Any]]: Group columns and metrics, ordered by the group columns
+
+        Raises:
+            ValueError: On an unknown group column or metric
+
+        Examples:
+            ```py linenums="1"
+            # traffic per user, and how many inbounds expire within a week
+            await inbounds.aggregate(group_by=['user_id'], metrics=['count', 'sum_traffic'])
+            await inbounds.aggregate(metrics=['count'], expires_before=int(time.time() * 1000) + 7 * 86400000)
+            ```
+        """
+
+        for names, known in ((group_by, AGGREGATE_GROUPS), (metrics, AGGREGATE_METRICS)):
+            unknown = [name for name in names if name not in known]
+            if unknown:
+                raise ValueError(f'Unknown name: {unknown} | {list(known)}')
+        if not metrics:
+            raise ValueError('At least one metric is needed')
+
+        groups = [getattr(Inbounds, name) for name in group_by]
+        where = self._where(filters or {})
+        if expires_before is not None:
+            where += [Inbounds.expiry_time > 0, Inbounds.expiry_time < expires_before]
+
+        query = select(*groups, *(AGGREGATE_METRICS[name].label(name) for name in metrics)).where(*where)
+        if groups:
+            query = query.group_by(*groups).order_by(*groups)
+
+        _ = await self.session.execute(query)
+        return [dict(row) for row in _.mappings()]
+
+    @unit_of_work
     async def get_by_user_id(self, *, user_id: int) -> Optional[Inbounds]:
         """
         Get Inbounds by user_id
@@ -80,8 +729,9 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Optional[Inbounds]): Inbound object model
         """
 
-        return (await self.session.execute(select(Inbounds).filter_by(user_id=user_id))).scalar_one_or_none()
+        return (await self.session.execute(self._select_by('user_id'), {'value': user_id})).scalar_one_or_none()
 
+    @unit_of_work
     async def get_by_remark(self, *, remark: str) -> Optional[Inbounds]:
         """
         Get Inbounds by remark
@@ -93,8 +743,9 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Optional[Inbounds]): Inbound object model
         """
 
-        return (await self.session.execute(select(Inbounds).filter_by(remark=remark))).scalar_one_or_none()
+        return await self._get_cached('remark', remark)
 
+    @unit_of_work
     async def get_by_tag(self, *, tag: str) -> Optional[Inbounds]:
         """
         Get Inbounds by tag
@@ -106,8 +757,9 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Optional[Inbounds]): Inbound object model
         """
 
-        return (await self.session.execute(select(Inbounds).filter_by(tag=tag))).scalar_one_or_none()
+        return await self._get_cached('tag', tag)
 
+    @unit_of_work
     async def get_by_port(self, *, port: int) -> Optional[Inbounds]:
         """
         Get Inbounds by port
@@ -119,8 +771,37 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Optional[Inbounds]): Inbound object model
         """
 
-        return (await self.session.execute(select(Inbounds).filter_by(port=port))).scalar_one_or_none()
+        return await self._get_cached('port', port)
+
+    @unit_of_work
+    async def get_by_tags(self, *, tags: Iterable[str]) -> Dict[str, Inbounds]:
+        """
+        Get many Inbounds by tag, with chunked `IN (...)` queries
+
+        Args:
+            tags (Iterable[str]): Tags
+
+        Returns:
+            Dict[str, Inbounds]: Found inbounds keyed by tag (missing tags are left out)
+        """
+
+        return await self._get_many_by('tag', tags)
+
+    @unit_of_work
+    async def get_by_ports(self, *, ports: Iterable[int]) -> Dict[int, Inbounds]:
+        """
+        Get many Inbounds by port, with chunked `IN (...)` queries
+
+        Args:
+            ports (Iterable[int]): Ports
+
+        Returns:
+            Dict[int, Inbounds]: Found inbounds keyed by port (missing ports are left out)
+        """
+
+        return await self._get_many_by('port', ports)
 
+    @unit_of_work
     async def get_by_protocol(self, *, protocol: str) -> Optional[Inbounds]:
         """
         Get Inbounds by protocol
@@ -132,7 +813,10 @@ class CRUDInbounds(CRUDBase[Inbounds, InboundsCreate, InboundsUpdate]):
             Inbounds (Optional[Inbounds]): Inbound object model
         """
 
-        return (await self.session.execute(select(Inbounds).filter_by(protocol=protocol))).scalar_one_or_none()
+        return (await self.session.execute(self._select_by('protocol'), {'value': protocol})).scalar_one_or_none()
 
 
 inbounds = CRUDInbounds(Inbounds)
+
+if settings.INBOUNDS_CACHE:
+    inbounds.enable_cache(ttl=settings.INBOUNDS_CACHE_TTL, maxsize=settings.INBOUNDS_CACHE_MAXSIZE)
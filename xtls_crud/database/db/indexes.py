@@ -0,0 +1,105 @@
+"""
+Optional secondary indexes for the x-ui `inbounds` table
+
+x-ui only creates the unique `port` and `tag` indexes, so filtering by user, state, protocol or expiry scans the
+whole table. These indexes are not part of the model: they are created and dropped on demand.
+
+Every statement is idempotent (`IF [NOT] EXISTS`) and runs in its own short transaction, so they can be applied
+beside a running x-ui panel (which only waits for `busy_timeout` while an index is being built).
+"""
+
+import typing as t
+
+from sqlalchemy import text
+
+from .session import engine
+
+INDEXES: t.Dict[str, t.Tuple[str, ...]] = {
+    'ix_inbounds_user_id': ('user_id',),
+    'ix_inbounds_enable': ('enable',),
+    'ix_inbounds_protocol': ('protocol',),
+    'ix_inbounds_expiry_time': ('expiry_time',),
+    'ix_inbounds_user_id_enable': ('user_id', 'enable'),
+    'ix_inbounds_protocol_enable': ('protocol', 'enable'),
+    'ix_inbounds_enable_expiry_time': ('enable', 'expiry_time'),
+}
+
+
+def _names(names: t.Optional[t.Iterable[str]]) -> t.List[str]:
+    if names is None:
+        return list(INDEXES)
+
+    names = list(names)
+    unknown = [name for name in names if name not in INDEXES]
+    if unknown:
+        raise ValueError(f'Unknown index: {unknown} | {list(INDEXES)}')
+
+    return names
+
+
+async def list_indexes() -> t.List[str]:
+    """
+    Names of the secondary indexes currently on the inbounds table (unique constraints excluded)
+
+    Returns:
+        List[str]: Index names
+    """
+
+    async with engine.connect() as conn:
+        _ = await conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'inbounds' AND sql IS NOT NULL"
+        ))
+        return list(_.scalars())
+
+
+async def create_indexes(names: t.Optional[t.Iterable[str]] = None) -> t.List[str]:
+    """
+    Create secondary indexes on the inbounds table
+
+    Args:
+        names (Optional[Iterable[str]]): Indexes to create (see `INDEXES`), all of them by default
+
+    Returns:
+        List[str]: Indexes that did not exist before
+
+    Raises:
+        ValueError: If a name is not in `INDEXES`
+    """
+
+    names = _names(names)
+    existing = set(await list_indexes())
+
+    for name in names:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON inbounds ({", ".join(INDEXES[name])})'))
+
+    created = [name for name in names if name not in existing]
+    if created:
+        async with engine.begin() as conn:
+            await conn.execute(text('ANALYZE inbounds'))
+
+    return created
+
+
+async def drop_indexes(names: t.Optional[t.Iterable[str]] = None) -> t.List[str]:
+    """
+    Drop secondary indexes from the inbounds table
+
+    Args:
+        names (Optional[Iterable[str]]): Indexes to drop (see `INDEXES`), all of them by default
+
+    Returns:
+        List[str]: Indexes that existed before
+
+    Raises:
+        ValueError: If a name is not in `INDEXES`
+    """
+
+    names = _names(names)
+    existing = set(await list_indexes())
+
+    for name in names:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+    return [name for name in names if name in existing]
@@ -1,7 +1,140 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar, Union
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from ...core.settings import settings
 
-engine = create_async_engine(settings.ASYNC_DB_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)()
+T = TypeVar('T')
+
+
+def _engine_options() -> dict:
+    options = {'pool_pre_ping': True}
+
+    # SQLite file databases default to one connection per checkout (NullPool), opt in to a bounded pool
+    if settings.DB_POOL_SIZE:
+        options.update(
+            poolclass=AsyncAdaptedQueuePool, pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: Dict[str, Union[str, int]]) -> None:
+    """
+    Run `PRAGMA name=value` for every pragma on a raw DBAPI connection
+
+    Args:
+        dbapi_connection: DBAPI connection
+        pragmas (Dict[str, Union[str, int]]): PRAGMA values by name (see `Settings.sqlite_pragmas`)
+    """
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+engine = create_async_engine(settings.ASYNC_DB_URL, **_engine_options())
+
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine.sync_engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):  # noqa
+        pragmas = settings.sqlite_pragmas()
+        if pragmas:
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+
+# session of the running unit of work, with the task that opened it
+_current_session: ContextVar[Optional[Tuple[AsyncSession, asyncio.Task]]] = ContextVar(
+    'xtls_crud_session', default=None)
+
+
+def _active_session() -> Optional[AsyncSession]:
+    current = _current_session.get()
+    # tasks spawned inside a unit of work inherit the variable, but a session must not be used concurrently
+    if current is None or current[1] is not asyncio.current_task():
+        return None
+
+    return current[0]
+
+
+def current_session() -> AsyncSession:
+    """
+    Session of the running unit of work (see `get_session`)
+
+    Returns:
+        AsyncSession: Session
+
+    Raises:
+        RuntimeError: Outside of a unit of work, or in a task other than the one that opened it
+    """
+
+    session = _active_session()
+    if session is None:
+        raise RuntimeError('No session in this task, run database calls inside `async with get_session():`')
+
+    return session
+
+
+def unit_of_work(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Run a coroutine function in the running unit of work, or in a short-lived one of its own (see `get_session`)
+
+    Args:
+        func (Callable[..., Awaitable[T]]): Coroutine function
+
+    Returns:
+        Callable[..., Awaitable[T]]: Wrapped function
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> T:
+        if _active_session() is not None:
+            return await func(*args, **kwargs)
+
+        async with get_session():
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    Open a session for one unit of work
+
+    Every CRUD call made inside the block by the same task uses this session, which is rolled back on error and
+    closed on exit. CRUD calls made outside of a unit of work each open and close their own session, tasks spawned
+    inside the block do the same (or open their own block): an `AsyncSession` is never shared between tasks.
+
+    Yields:
+        AsyncSession: Session
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.database import crud
+        from xtls_crud.database.db.session import get_session
+
+        async with get_session():
+            inbound = await crud.inbounds.get_by_tag(tag='inbound-443')
+        ```
+    """
+
+    async with SessionLocal() as session:
+        token = _current_session.set((session, asyncio.current_task()))
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            _current_session.reset(token)
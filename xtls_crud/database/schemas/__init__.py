@@ -4,4 +4,4 @@
 [Inbounds](inbounds)
 """
 
-from .inbounds import InboundsBase, InboundsCreate, Inbounds, InboundsOrderGetFilter, InboundsUpdate
+from .inbounds import InboundsBase, InboundsCreate, Inbounds, InboundsFilter, InboundsOrderGetFilter, InboundsUpdate
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -108,6 +108,67 @@ class InboundsOrderGetFilter(BaseModel):
     tag: Optional[str] = None
 
 
+class InboundsFilter(InboundsOrderGetFilter):
+    """
+    Inbounds filter schema, `InboundsOrderGetFilter` plus operators
+
+    `<column>_<op>` fields compare a column (`gt`, `gte`, `lt`, `lte`, `ne`), match a list (`in`) or check for NULL
+    (`is_null`). Unset and `None` fields are ignored, every other value (`False` and `0` included) filters.
+
+    Keyword Args:
+        user_id (Optional[int]): user id
+        enable (Optional[bool]): enable
+        port (Optional[int]): port
+        protocol (Optional[str]): protocol
+        tag (Optional[str]): tag
+        user_id_in (Optional[List[int]]): user id is one of
+        port_gte (Optional[int]): port from
+        port_lte (Optional[int]): port to
+        port_in (Optional[List[int]]): port is one of
+        protocol_in (Optional[List[str]]): protocol is one of
+        tag_in (Optional[List[str]]): tag is one of
+        total_gt (Optional[int]): quota above (`0` leaves unlimited inbounds out)
+        expiry_time_gt (Optional[int]): expiry time after (MILLISECONDS)
+        expiry_time_lt (Optional[int]): expiry time before (MILLISECONDS)
+        listen_is_null (Optional[bool]): listen is (not) NULL
+        remark_is_null (Optional[bool]): remark is (not) NULL
+        expires_within (Optional[int]): expires (or expired) before now + this many SECONDS, never expiring inbounds
+            are left out
+        usage_ratio_gte (Optional[float]): `(up + down) / total` at least, unlimited inbounds are left out
+        usage_ratio_lt (Optional[float]): `(up + down) / total` below, unlimited inbounds are left out
+
+    Returns:
+        InboundsFilter (InboundsFilter): Inbounds filter schema
+
+    Examples:
+        ```py linenums="1" title="inbounds.py"
+        from xtls_crud.database.schemas.inbounds import InboundsFilter
+
+        filters = InboundsFilter(
+            enable=True,
+            protocol_in=["vless", "trojan"],
+            expires_within=7 * 24 * 3600,
+            usage_ratio_gte=0.9,
+        )
+        ```
+    """
+
+    user_id_in: Optional[List[int]] = None
+    port_gte: Optional[int] = None
+    port_lte: Optional[int] = None
+    port_in: Optional[List[int]] = None
+    protocol_in: Optional[List[str]] = None
+    tag_in: Optional[List[str]] = None
+    total_gt: Optional[int] = None
+    expiry_time_gt: Optional[int] = None
+    expiry_time_lt: Optional[int] = None
+    listen_is_null: Optional[bool] = None
+    remark_is_null: Optional[bool] = None
+    expires_within: Optional[int] = None
+    usage_ratio_gte: Optional[float] = None
+    usage_ratio_lt: Optional[float] = None
+
+
 class InboundsCreate(InboundsBase):
     """
     Inbounds create schema
@@ -13,6 +13,7 @@
 """
 
 from .sniffing import Sniffing
+from .sniffing import PrettySniffing
 
 from .settings import Client
 from .settings import Setting
@@ -43,7 +43,7 @@ class EasyBuilderSchemaCreate(BaseModel):
         enable (bool): Enable
         expiry_time (int): Expiry Time (MILLISECONDS)
         listen (str): Listen
-        port (int): Port
+        port (Optional[int]): Port (None: any free port)
         protocol (str): Protocol
         uuid (str): UUID
         network (str): Network
@@ -77,9 +77,9 @@ class EasyBuilderSchemaCreate(BaseModel):
     listen: str = Field(
         "", title="Listen", max_length=255, min_length=1, strip_whitespace=True, regex=r'^[\w\-\s]+$',
         example="", description="Listen")
-    port: int = Field(
-        ..., title="Port", gt=0, multiple_of=1, le=65535,
-        example=443, description="Port to bind")
+    port: t.Optional[int] = Field(
+        None, title="Port", gt=0, multiple_of=1, le=65535,
+        example=443, description="Port to bind Default: any free port")
     protocol: t.Optional[ProtocolsType] = Field(
         "vmess", title="Protocol",
         example="vmess", description="Protocol")
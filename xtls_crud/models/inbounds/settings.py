@@ -55,7 +55,7 @@ class Setting(BaseModel):
 
 class PrettySetting(Setting):
     """
-    Pretty Setting
+    Pretty Setting (instances are shared between inbounds, do not mutate them)
 
     Keyword Args:
         clients (List[PrettyClient]): clients
@@ -68,6 +68,9 @@ class PrettySetting(Setting):
     clients: List[PrettyClient]
     disableInsecureEncryption: bool
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 if __name__ == '__main__':
     _sample = {
@@ -20,6 +20,22 @@ class Sniffing(BaseModel):
     destOverride: Optional[List[str]] = ["http", "tls"]
 
 
+class PrettySniffing(Sniffing):
+    """
+    Pretty Sniffing (Used for API, instances are shared between inbounds, do not mutate them)
+
+    Keyword Args:
+        enabled (Optional[bool]): enabled (default: True)
+        destOverride (Optional[List[str]]): destOverride (default: ['http', 'tls'])
+
+    Returns:
+        PrettySniffing (PrettySniffing): Pretty Sniffing
+    """
+
+    class Config:
+        copy_on_model_validation = 'none'
+
+
 if __name__ == '__main__':
     _sample = {
         "enabled": True,
@@ -110,7 +110,7 @@ class StreamSettings(BaseModel):
 
 class PrettyStreamSettings(BaseModel):
     """
-    Pretty StreamSettings (Used for API)
+    Pretty StreamSettings (Used for API, instances are shared between inbounds, do not mutate them)
 
     Keyword Args:
         network (str): network
@@ -127,6 +127,9 @@ class PrettyStreamSettings(BaseModel):
     tlsSettings: PrettyTlsSettings
     wsSettings: WsSettings
 
+    class Config:
+        copy_on_model_validation = 'none'
+
 
 if __name__ == '__main__':
     _sample = {
@@ -0,0 +1,17 @@
+"""
+# XTLS_CRUD services
+
+Long running jobs built on the CRUD layer
+
+[Expiry](expiry)
+
+[Provision](provision)
+
+[Quota](quota)
+
+[Stats](stats)
+
+[Transfer](transfer)
+
+[Xray config](xray_config)
+"""
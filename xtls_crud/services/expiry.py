@@ -0,0 +1,153 @@
+"""
+# Expiry sweeper
+
+Disables inbounds once their `expiry_time` is due.
+
+The schedule is read from the table itself, so inbounds created or extended by the x-ui panel are seen too (unlike
+with an in-process heap). With the optional `ix_inbounds_enable_expiry_time` index (`reyes db create-indexes`) the
+next due time is one index seek and a sweep only reads the due rows; without it every wake up scans the table, which
+`run` warns about.
+"""
+
+import asyncio
+import logging
+import time
+import typing as t
+
+from ..database.crud.crud_inbounds import inbounds
+from ..database.db.indexes import list_indexes
+from ..database.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+# index the schedule is read from, see `xtls_crud.database.db.indexes`
+INDEX = 'ix_inbounds_enable_expiry_time'
+
+
+class ExpirySweeper:
+    """
+    Background job disabling expired inbounds
+
+    It sleeps until the next expiry is due, but never longer than `max_interval` seconds, so inbounds written meanwhile
+    (which may expire earlier) are picked up. Call `wake` to reschedule right away.
+
+    Keyword Args:
+        max_interval (float): Maximum seconds between two checks
+        on_expired (Optional[Callable[[List[str]], Any]]): Called with the tags disabled by each sweep
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.expiry import ExpirySweeper
+
+        sweeper = ExpirySweeper(max_interval=60, on_expired=print)
+        sweeper.start()
+        ...
+        await sweeper.stop()
+        ```
+    """
+
+    def __init__(
+            self,
+            *,
+            max_interval: float = 60.0,
+            on_expired: t.Optional[t.Callable[[t.List[str]], t.Any]] = None
+    ):
+        if max_interval <= 0:
+            raise ValueError('max_interval must be positive')
+
+        self.max_interval = max_interval
+        self.on_expired = on_expired
+
+        self._task: t.Optional[asyncio.Task] = None
+        self._wake: t.Optional[asyncio.Event] = None
+
+    @staticmethod
+    async def sweep(*, now: t.Optional[int] = None) -> t.List[str]:
+        """
+        Disable every due inbound once
+
+        Args:
+            now (Optional[int]): Current timestamp (MILLISECONDS), defaults to the system clock
+
+        Returns:
+            List[str]: Tags of the disabled inbounds
+        """
+
+        async with get_session():
+            return await inbounds.disable_expired(now=now)
+
+    async def run(self) -> None:
+        """
+        Sweep, then sleep until the next expiry, forever
+
+        Logs a warning once if the `ix_inbounds_enable_expiry_time` index is missing.
+        """
+
+        self._wake = asyncio.Event()
+
+        try:
+            if INDEX not in await list_indexes():
+                logger.warning(
+                    'Index %s is missing, every expiry check scans the inbounds table (see `reyes db create-indexes`)',
+                    INDEX)
+        except Exception:  # noqa  # only a hint, the sweeper works without it
+            logger.exception('Could not list the inbounds indexes')
+
+        while True:
+            try:
+                tags = await self.sweep()
+                if tags and self.on_expired is not None:
+                    self.on_expired(tags)
+
+                async with get_session():
+                    next_expiry = await inbounds.next_expiry()
+            except Exception:  # noqa  # e.g. database locked by the panel, retry later
+                logger.exception('Expiry sweep failed')
+                next_expiry = None
+
+            delay = self.max_interval
+            if next_expiry is not None:
+                delay = min(delay, max(0.0, next_expiry / 1000 - time.time()))
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self) -> None:
+        """
+        Check for due inbounds now (e.g. after an inbound was given an earlier `expiry_time`)
+        """
+
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> asyncio.Task:
+        """
+        Run the sweeper as a task of the running event loop
+
+        Returns:
+            asyncio.Task: Task
+        """
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+        return self._task
+
+    async def stop(self) -> None:
+        """
+        Cancel the task started by `start`
+        """
+
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
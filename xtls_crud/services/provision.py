@@ -0,0 +1,291 @@
+"""
+# Batch provisioning
+
+Creates many inbounds from per-user specs plus shared defaults.
+
+Ports are allocated in one pass, quotas and durations are parsed in bulk, and every payload is derived from a single
+prototype built by `EasyInboundBuilder`: only the client UUID and the ws path differ in the JSON columns, so they are
+substituted into the prototype's JSON instead of validating and serialising the nested models once per inbound. Rows
+are then inserted by `CRUDInbounds.create_many`, one transaction per chunk.
+"""
+
+import json
+import time
+import typing as t
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel
+
+from ..constants.byte_size import parse_sizes
+from ..constants.time_info import parse_durations
+from ..core.settings import settings
+from ..database.crud.crud_inbounds import inbounds
+from ..database.db.session import get_session
+from ..models.inbounds.easy_inbounds_builder import NetworksType, ProtocolsType, _random_path  # noqa
+from ..utils.builders.inbounds_builder import EasyInboundBuilder
+
+# Keys a spec may have, every other one is rejected
+SPEC_KEYS = ('user_id', 'remark', 'total', 'expiry', 'expiry_time', 'port', 'tag', 'uuid', 'ws_path', 'enable')
+
+# placeholders rendered into the prototype and replaced per inbound
+_UUID = UUID('00000000-0000-4000-8000-000000000000')
+_WS_PATH = '/{ws-path}'
+
+
+class ProvisionDefaults(BaseModel):
+    """
+    Values shared by every provisioned inbound, specs may override the per-user ones
+
+    Keyword Args:
+        user_id (int): Owner
+        total (Union[int, str]): Quota, bytes or e.g. `100GB` (`0`: unlimited)
+        expiry (Union[int, str]): Lifetime from now, seconds or e.g. `30d` (`0`: never expires)
+        enable (bool): Enable the inbounds
+        listen (str): Listen address
+        protocol (str): Protocol
+        network (str): Network
+        security (str): Security
+        server_name (str): TLS server name
+        sniffing (bool): Sniffing
+        tag_prefix (str): Tags are `<tag_prefix><port>` unless a spec has one
+    """
+
+    user_id: int = 1
+    total: t.Union[int, str] = 0
+    expiry: t.Union[int, str] = 0
+    enable: bool = True
+    listen: str = ''
+    protocol: ProtocolsType = 'vmess'
+    network: NetworksType = 'ws'
+    security: str = 'tls'
+    server_name: str = settings.SITE_URL
+    sniffing: bool = True
+    tag_prefix: str = 'inbound-'
+
+
+class ProvisionReport(BaseModel):
+    """
+    Result of `provision_inbounds`
+
+    Keyword Args:
+        created (int): Inbounds created
+        seconds (float): Wall time, from the specs to the last commit
+        inbounds (List[Dict[str, Any]]): `id`, `user_id`, `remark`, `tag`, `port`, `uuid` and `ws_path` of every
+            created inbound, in spec order
+    """
+
+    created: int = 0
+    seconds: float = 0.0
+    inbounds: t.List[t.Dict[str, t.Any]] = []
+
+    @property
+    def rate(self) -> float:
+        """
+        Inbounds created per second
+        """
+
+        return self.created / self.seconds if self.seconds else 0.0
+
+
+def _invalid(specs: t.Sequence[t.Mapping[str, t.Any]], key: str, mask: t.Sequence[bool]) -> None:
+    bad = [i for i, invalid in enumerate(mask) if invalid]
+    if bad:
+        examples = ', '.join(f'#{i} {specs[i].get(key)!r}' for i in bad[:5])
+        raise ValueError(f'Invalid {key} in {len(bad)} spec(s): {examples}')
+
+
+def _flag(value: t.Any) -> bool:
+    # CSV cells are strings
+    if isinstance(value, str):
+        if value.lower() not in ('1', '0', 'true', 'false', 'yes', 'no'):
+            raise ValueError(f'enable must be true or false: {value!r}')
+        return value.lower() in ('1', 'true', 'yes')
+
+    return bool(value)
+
+
+def plan_inbounds(
+        specs: t.Sequence[t.Mapping[str, t.Any]],
+        *,
+        defaults: t.Optional[ProvisionDefaults] = None,
+        ports: t.Iterable[int] = (),
+        now: t.Optional[int] = None
+) -> t.List[t.Dict[str, t.Any]]:
+    """
+    Resolve specs: parse quotas and lifetimes, fill in ports, tags, remarks, UUIDs and ws paths
+
+    Every spec is checked before anything is returned, the error names the first offending specs.
+
+    Args:
+        specs (Sequence[Mapping[str, Any]]): Per-user values, keys from `SPEC_KEYS` (all optional). `total` and
+            `expiry` take the forms of `ProvisionDefaults`, `expiry_time` is an absolute timestamp (MILLISECONDS)
+        defaults (Optional[ProvisionDefaults]): Shared values
+        ports (Iterable[int]): Ports handed to the specs without one, in order (e.g. from `allocate_ports`)
+        now (Optional[int]): Current timestamp (MILLISECONDS) lifetimes start from, defaults to the system clock
+
+    Returns:
+        List[Dict[str, Any]]: One dict per spec, with every `SPEC_KEYS` key except `expiry` resolved
+
+    Raises:
+        ValueError: On an unknown key or invalid value, or if `ports` runs out
+    """
+
+    defaults = defaults or ProvisionDefaults()
+    if now is None:
+        now = int(time.time() * 1000)
+
+    for i, spec in enumerate(specs):
+        unknown = spec.keys() - SPEC_KEYS
+        if unknown:
+            raise ValueError(f'Unknown key in spec #{i}: {sorted(unknown)} | {list(SPEC_KEYS)}')
+
+    totals, invalid = parse_sizes([spec.get('total', defaults.total) for spec in specs], use_numpy=False)
+    _invalid(specs, 'total', invalid)
+    lifetimes, invalid = parse_durations([spec.get('expiry', defaults.expiry) for spec in specs], use_numpy=False)
+    _invalid(specs, 'expiry', invalid)
+
+    ports = iter(ports)
+    plan = []
+    for i, spec in enumerate(specs):
+        try:
+            port = spec.get('port')
+            port = next(ports) if port is None else int(port)
+            if not 0 < port <= 65535:
+                raise ValueError(f'port out of range: {port}')
+
+            expiry_time = spec.get('expiry_time')
+            if expiry_time is None:
+                expiry_time = now + lifetimes[i] * 1000 if lifetimes[i] else 0
+
+            tag = spec.get('tag') or f'{defaults.tag_prefix}{port}'
+            ws_path = spec.get('ws_path') or _random_path(6)
+            if not ws_path.startswith('/'):
+                raise ValueError('ws_path must start with /')
+
+            plan.append({
+                'user_id': int(spec.get('user_id', defaults.user_id)),
+                'remark': spec.get('remark') or tag,
+                'total': totals[i],
+                'expiry_time': int(expiry_time),
+                'port': port,
+                'tag': tag,
+                'uuid': str(UUID(str(spec['uuid']))) if spec.get('uuid') else str(uuid4()),
+                'ws_path': ws_path,
+                'enable': _flag(spec.get('enable', defaults.enable)),
+            })
+        except StopIteration:
+            raise ValueError(f'Not enough ports for spec #{i}') from None
+        except (ValueError, TypeError) as exc:
+            raise ValueError(f'Invalid spec #{i}: {exc}') from exc
+
+    return plan
+
+
+def build_inbounds(
+        plan: t.Iterable[t.Mapping[str, t.Any]], *, defaults: t.Optional[ProvisionDefaults] = None
+) -> t.List[t.Dict[str, t.Any]]:
+    """
+    Inbound rows of a plan, ready for `CRUDInbounds.create_many`
+
+    `EasyInboundBuilder` builds one prototype with placeholder UUID and ws path, every row is a copy of it with the
+    planned values and the placeholders replaced.
+
+    Args:
+        plan (Iterable[Mapping[str, Any]]): Output of `plan_inbounds`
+        defaults (Optional[ProvisionDefaults]): Shared values, the ones the plan was made with
+
+    Returns:
+        List[Dict[str, Any]]: Rows (every column but `id`)
+    """
+
+    defaults = defaults or ProvisionDefaults()
+
+    prototype = EasyInboundBuilder().with_user_id(defaults.user_id).with_up(0).with_down(0).with_total(
+        0).with_remark('-').with_enable(defaults.enable).with_expiry_time(0).with_listen(defaults.listen).with_port(
+        1).with_protocol(defaults.protocol).with_uuid(_UUID).with_network(defaults.network).with_security(
+        defaults.security).with_server_name(str(defaults.server_name)).with_ws_path(_WS_PATH).with_tag(
+        '-').with_sniffing(defaults.sniffing).build().dict()
+
+    settings_, stream_settings = prototype['settings'], prototype['stream_settings']
+    uuid_placeholder, ws_path_placeholder = str(_UUID), f'"{_WS_PATH}"'
+    if settings_.count(uuid_placeholder) != 1 or stream_settings.count(ws_path_placeholder) != 1:
+        raise RuntimeError('Prototype JSON does not hold exactly one UUID and one ws path')
+
+    rows = []
+    for inbound in plan:
+        row = dict(prototype)
+        row.update(
+            user_id=inbound['user_id'],
+            up=0,
+            down=0,
+            total=inbound['total'],
+            remark=inbound['remark'],
+            enable=inbound['enable'],
+            expiry_time=inbound['expiry_time'],
+            port=inbound['port'],
+            tag=inbound['tag'],
+            settings=settings_.replace(uuid_placeholder, inbound['uuid']),
+            stream_settings=stream_settings.replace(ws_path_placeholder, json.dumps(inbound['ws_path'])),
+        )
+        rows.append(row)
+
+    return rows
+
+
+async def provision_inbounds(
+        specs: t.Sequence[t.Mapping[str, t.Any]],
+        *,
+        defaults: t.Optional[ProvisionDefaults] = None,
+        chunk_size: int = 500
+) -> ProvisionReport:
+    """
+    Create one inbound per spec
+
+    Ports are reserved for the specs without one (see `CRUDInbounds.allocate_ports`) and given back if nothing is
+    created. Chunks committed before a failing one stay.
+
+    Args:
+        specs (Sequence[Mapping[str, Any]]): Per-user values (see `plan_inbounds`)
+        defaults (Optional[ProvisionDefaults]): Shared values
+        chunk_size (int): Inbounds per transaction
+
+    Returns:
+        ProvisionReport: Created inbounds and throughput
+
+    Raises:
+        ValueError: On an invalid spec, a duplicated or existing port or tag, or if the port ranges are full
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.provision import ProvisionDefaults, provision_inbounds
+
+        defaults = ProvisionDefaults(protocol='vless', total='100GB', expiry='30d')
+        report = await provision_inbounds([{'user_id': 1, 'remark': 'alice'}] * 1000, defaults=defaults)
+        print(report.created, f'{report.rate:.0f} inbounds/s')
+        ```
+    """
+
+    defaults = defaults or ProvisionDefaults()
+    start = time.perf_counter()
+
+    async with get_session():
+        missing = sum(1 for spec in specs if spec.get('port') is None)
+        ports = await inbounds.allocate_ports(missing) if missing else []
+
+        try:
+            plan = plan_inbounds(specs, defaults=defaults, ports=ports)
+            ids = await inbounds.create_many(objs_in=build_inbounds(plan, defaults=defaults), chunk_size=chunk_size)
+        except Exception:
+            for port in ports:
+                inbounds.release_port(port)
+            if inbounds.ports is not None:
+                # earlier chunks may be committed with some of these ports
+                inbounds.ports.stale = True
+            raise
+
+    keys = ('user_id', 'remark', 'tag', 'port', 'uuid', 'ws_path')
+    return ProvisionReport(
+        created=len(ids),
+        seconds=time.perf_counter() - start,
+        inbounds=[{'id': id_, **{key: inbound[key] for key in keys}} for id_, inbound in zip(ids, plan)],
+    )
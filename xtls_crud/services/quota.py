@@ -0,0 +1,73 @@
+"""
+# Quota enforcement
+
+Disables inbounds whose traffic (`up + down`) reached their quota (`total`, `0` meaning unlimited) and reports the ones
+getting close to it. Everything is computed in SQL, only the affected tags are sent back.
+"""
+
+import logging
+import typing as t
+
+from pydantic import BaseModel
+
+from ..core.settings import settings
+from ..database.crud.crud_inbounds import inbounds
+from ..database.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaReport(BaseModel):
+    """
+    Result of `enforce_quota`
+
+    Keyword Args:
+        disabled (List[str]): Tags of the inbounds disabled for reaching their quota
+        warnings (Dict[float, List[str]]): Tags of the inbounds above each warning threshold (highest one only)
+    """
+
+    disabled: t.List[str] = []
+    warnings: t.Dict[float, t.List[str]] = {}
+
+
+async def enforce_quota(*, thresholds: t.Optional[t.Iterable[float]] = None) -> QuotaReport:
+    """
+    Disable over-quota inbounds and collect quota warnings
+
+    Args:
+        thresholds (Optional[Iterable[float]]): Used fractions of the quota to warn at (default: `QUOTA_WARNINGS`)
+
+    Returns:
+        QuotaReport: Disabled tags and warnings
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.quota import enforce_quota
+
+        report = await enforce_quota(thresholds=[0.8, 0.95])
+        print(report.disabled, report.warnings)
+        ```
+    """
+
+    thresholds = sorted(set(settings.QUOTA_WARNINGS if thresholds is None else thresholds))
+    for threshold in thresholds:
+        if not 0 < threshold < 1:
+            raise ValueError(f'Quota warning thresholds must be between 0 and 1: {threshold}')
+
+    report = QuotaReport()
+
+    async with get_session():
+        report.disabled = await inbounds.disable_over_quota()
+
+        if thresholds:
+            # one query for the lowest threshold, rows are bucketed under the highest threshold they reached
+            for tag, ratio in await inbounds.quota_usage(threshold=thresholds[0]):
+                threshold = max((threshold for threshold in thresholds if ratio >= threshold), default=thresholds[0])
+                report.warnings.setdefault(threshold, []).append(tag)
+
+    for tag in report.disabled:
+        logger.info('Inbound %s disabled: quota reached', tag)
+    for threshold, tags in report.warnings.items():
+        logger.warning('Inbounds above %d%% of their quota: %s', threshold * 100, ', '.join(tags))
+
+    return report
@@ -0,0 +1,378 @@
+"""
+# Xray stats ingestion
+
+Feeds the `up`/`down` counters from `xray api statsquery` output:
+
+```json
+{"stat": [{"name": "inbound>>>inbound-443>>>traffic>>>uplink", "value": "1024"}, ...]}
+```
+
+Payloads come from any async iterable (a file, stdin, `FakeStatsSource`...). Deltas are summed per tag in memory and
+applied every `interval` seconds as one `increment_traffic` transaction, tags being mapped to ids by a cached
+`TagIndex`.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import typing as t
+from pathlib import Path
+
+from sqlalchemy.future import select
+
+from ..database.crud.crud_inbounds import inbounds
+from ..database.db.session import get_session
+from ..database.models.inbounds import Inbounds
+
+logger = logging.getLogger(__name__)
+
+Payload = t.Union[str, bytes, dict, list]
+StatsSource = t.AsyncIterable[Payload]
+
+_DIRECTIONS = {'uplink': 0, 'downlink': 1}
+
+
+def parse_stats(payload: Payload) -> t.Dict[str, t.Tuple[int, int]]:
+    """
+    Inbound traffic counters of a statsquery payload
+
+    Other counters (outbounds, users) are ignored. Values may be strings (int64 in protobuf JSON) or missing (zero).
+
+    Args:
+        payload (Union[str, bytes, dict, list]): statsquery JSON output, decoded or not (a list is taken as `stat`)
+
+    Returns:
+        Dict[str, Tuple[int, int]]: `(uplink, downlink)` values keyed by inbound tag
+
+    Raises:
+        ValueError: If the payload is not valid JSON
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.stats import parse_stats
+
+        print(parse_stats({'stat': [{'name': 'inbound>>>inbound-443>>>traffic>>>uplink', 'value': '1024'}]}))
+        ```
+
+        ```shell title="Result"
+        {'inbound-443': (1024, 0)}
+        ```
+    """
+
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    stats = (payload.get('stat') or []) if isinstance(payload, dict) else payload
+
+    counters: t.Dict[str, t.List[int]] = {}
+    for stat in stats:
+        parts = stat.get('name', '').split('>>>')
+        if len(parts) != 4 or parts[0] != 'inbound' or parts[2] != 'traffic' or parts[3] not in _DIRECTIONS:
+            continue
+
+        counters.setdefault(parts[1], [0, 0])[_DIRECTIONS[parts[3]]] += int(stat.get('value') or 0)
+
+    return {tag: (up, down) for tag, (up, down) in counters.items()}
+
+
+class TagIndex:
+    """
+    Cached tag to inbound id mapping
+
+    Loaded with one query. Unknown tags trigger a reload, at most once every `refresh_interval` seconds (Xray reports
+    inbounds that are not in the database, e.g. the `api` one).
+
+    Keyword Args:
+        refresh_interval (float): Minimum seconds between two reloads
+    """
+
+    def __init__(self, *, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+
+        self._ids: t.Dict[str, int] = {}
+        self._loaded_at: t.Optional[float] = None
+
+    async def load(self) -> None:
+        """
+        Reload the mapping (in the current session)
+        """
+
+        _ = await inbounds.session.execute(select(Inbounds.tag, Inbounds.id))
+        self._ids = dict(_.all())
+        self._loaded_at = time.monotonic()
+
+    async def resolve(self, tags: t.Iterable[str]) -> t.Dict[str, int]:
+        """
+        Ids of the known tags
+
+        Args:
+            tags (Iterable[str]): Tags
+
+        Returns:
+            Dict[str, int]: Ids keyed by tag (unknown tags are left out)
+        """
+
+        tags = list(tags)
+        stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+        if stale and (self._loaded_at is None or any(tag not in self._ids for tag in tags)):
+            await self.load()
+
+        return {tag: self._ids[tag] for tag in tags if tag in self._ids}
+
+
+class StatsIngestor:
+    """
+    Aggregates statsquery payloads and applies them to the `up`/`down` counters in batches
+
+    Keyword Args:
+        cumulative (bool): Payloads hold running totals (`statsquery` without `-reset`), deltas are computed against
+            the previous payload (the first one is only a baseline, a lower value means Xray restarted)
+        tag_index (Optional[TagIndex]): Tag to id mapping (a new one by default)
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.stats import StatsIngestor, file_source
+
+        ingestor = StatsIngestor()
+        await ingestor.run(file_source('/tmp/stats.json', interval=10), interval=10)
+        ```
+    """
+
+    def __init__(self, *, cumulative: bool = False, tag_index: t.Optional[TagIndex] = None):
+        self.cumulative = cumulative
+        self.tag_index = tag_index or TagIndex()
+
+        # rows updated so far (one per inbound and flush), and unknown tags whose deltas were dropped
+        self.applied = 0
+        self.dropped = 0
+
+        self._pending: t.Dict[str, t.List[int]] = {}
+        self._last: t.Dict[str, t.Tuple[int, int]] = {}
+
+    def add(self, payload: Payload) -> int:
+        """
+        Add a payload to the pending deltas
+
+        Args:
+            payload (Union[str, bytes, dict, list]): statsquery output
+
+        Returns:
+            int: Number of inbounds in the payload
+        """
+
+        counters = parse_stats(payload)
+        for tag, (up, down) in counters.items():
+            if self.cumulative:
+                last = self._last.get(tag)
+                self._last[tag] = (up, down)
+                if last is None:
+                    # first sighting is the baseline, its traffic was counted before this ingestor started
+                    continue
+
+                last_up, last_down = last
+                up = up - last_up if up >= last_up else up
+                down = down - last_down if down >= last_down else down
+
+            if up or down:
+                pending = self._pending.setdefault(tag, [0, 0])
+                pending[0] += up
+                pending[1] += down
+
+        return len(counters)
+
+    async def flush(self) -> int:
+        """
+        Apply the pending deltas in one transaction
+
+        On error the deltas stay pending, to be applied by the next flush.
+
+        Returns:
+            int: Number of updated inbounds
+        """
+
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        try:
+            async with get_session():
+                ids = await self.tag_index.resolve(pending)
+                rowcount = await inbounds.increment_traffic(
+                    {ids[tag]: (up, down) for tag, (up, down) in pending.items() if tag in ids})
+        except BaseException:
+            # keep the deltas for the next flush
+            for tag, (up, down) in pending.items():
+                current = self._pending.setdefault(tag, [0, 0])
+                current[0] += up
+                current[1] += down
+            raise
+
+        self.applied += rowcount
+        self.dropped += len(pending) - len(ids)
+
+        return rowcount
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:  # noqa  # e.g. database locked by the panel, retry on the next tick
+            logger.exception('Stats flush failed, %s inbounds kept pending', len(self._pending))
+
+    async def run(self, source: StatsSource, *, interval: float = 10.0) -> None:
+        """
+        Consume `source`, flushing every `interval` seconds (whether payloads arrive or not) and once more when it is
+        exhausted
+
+        A failing periodic flush is logged and its deltas are retried on the next one, only the final flush raises. The
+        pending deltas are also flushed when the source fails or the task is cancelled.
+
+        Args:
+            source (AsyncIterable[Union[str, bytes, dict, list]]): Payloads
+            interval (float): Seconds between two flushes
+        """
+
+        async def consume() -> None:
+            async for payload in source:
+                self.add(payload)
+
+        consumer = asyncio.create_task(consume())
+        try:
+            while not consumer.done():
+                await asyncio.wait({consumer}, timeout=interval)
+                if not consumer.done():
+                    await self._flush_logged()
+
+            consumer.result()  # errors of the source
+        except BaseException:
+            # deltas read with `-reset` exist nowhere else, try to write them before stopping
+            await self._flush_logged()
+            raise
+        finally:
+            if not consumer.done():
+                consumer.cancel()
+                try:
+                    await consumer
+                except asyncio.CancelledError:
+                    pass
+
+        await self.flush()
+
+
+async def file_source(path: t.Union[str, Path], *, interval: t.Optional[float] = None) -> t.AsyncIterator[str]:
+    """
+    Read a statsquery output file once, or every `interval` seconds when it changed
+
+    Args:
+        path (Union[str, Path]): File written by e.g. `xray api statsquery -reset > stats.json`
+        interval (Optional[float]): Seconds between two checks (None: read once)
+
+    Yields:
+        str: File content
+    """
+
+    path = Path(path)
+    mtime = None
+    while True:
+        stat = path.stat()
+        if stat.st_mtime_ns != mtime:
+            mtime = stat.st_mtime_ns
+            yield await asyncio.to_thread(path.read_text)
+
+        if interval is None:
+            return
+        await asyncio.sleep(interval)
+
+
+async def stdin_source() -> t.AsyncIterator[dict]:
+    """
+    Read concatenated statsquery outputs (pretty printed or one per line) from stdin
+
+    Yields:
+        dict: Decoded payload
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        line = await asyncio.to_thread(sys.stdin.readline)
+        if not line:
+            break
+
+        first = not buffer
+        buffer += line
+        # a document ends on a line closing the top level object, or fits on one line
+        if first or line.startswith(('}', ']')):
+            try:
+                payload, _ = decoder.raw_decode(buffer.strip())
+            except ValueError:
+                continue
+            buffer = ''
+            yield payload
+
+    if buffer.strip():
+        yield decoder.raw_decode(buffer.strip())[0]
+
+
+class FakeStatsSource:
+    """
+    Local stand-in for Xray, yielding random `-reset` style payloads
+
+    Every payload has an uplink and a downlink counter for every tag, plus counters that must be ignored (`api`
+    inbound, outbounds, users). `totals` holds the sum of everything yielded.
+
+    Keyword Args:
+        tags (Sequence[str]): Inbound tags
+        rounds (int): Number of payloads
+        interval (float): Seconds between two payloads
+        max_delta (int): Largest random delta
+        seed (Optional[int]): Random seed
+    """
+
+    def __init__(
+            self,
+            *,
+            tags: t.Sequence[str],
+            rounds: int = 1,
+            interval: float = 0.0,
+            max_delta: int = 1 << 20,
+            seed: t.Optional[int] = None
+    ):
+        self.tags = list(tags)
+        self.rounds = rounds
+        self.interval = interval
+        self.max_delta = max_delta
+        self.totals: t.Dict[str, t.Tuple[int, int]] = {tag: (0, 0) for tag in self.tags}
+
+        self._random = random.Random(seed)
+
+    def payload(self) -> dict:
+        """
+        Next random payload (added to `totals`)
+
+        Returns:
+            dict: statsquery output
+        """
+
+        stat = [
+            {'name': 'inbound>>>api>>>traffic>>>uplink', 'value': str(self._random.randint(0, self.max_delta))},
+            {'name': 'outbound>>>direct>>>traffic>>>downlink', 'value': str(self._random.randint(0, self.max_delta))},
+            {'name': 'user>>>someone@example.com>>>traffic>>>uplink', 'value': '1'},
+        ]
+        for tag in self.tags:
+            up, down = self._random.randint(0, self.max_delta), self._random.randint(0, self.max_delta)
+            total_up, total_down = self.totals[tag]
+            self.totals[tag] = (total_up + up, total_down + down)
+
+            stat.append({'name': f'inbound>>>{tag}>>>traffic>>>uplink', 'value': str(up)})
+            # protobuf JSON leaves zero values out
+            stat.append({'name': f'inbound>>>{tag}>>>traffic>>>downlink', **({'value': str(down)} if down else {})})
+
+        return {'stat': stat}
+
+    async def __aiter__(self) -> t.AsyncIterator[dict]:
+        for i in range(self.rounds):
+            if i and self.interval:
+                await asyncio.sleep(self.interval)
+            yield self.payload()
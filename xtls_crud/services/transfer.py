@@ -0,0 +1,219 @@
+"""
+# Inbounds export and import
+
+Inbounds are moved as NDJSON, one JSON object (every column) per line, optionally gzip or zstd compressed (`zstd`
+needs the `zstandard` package, see the `zstd` extra). Both directions stream: memory does not grow with the number of
+inbounds.
+"""
+
+import contextlib
+import gzip
+import io
+import json
+import sys
+import typing as t
+from pathlib import Path
+
+from pydantic import BaseModel, ValidationError
+
+from ..database.crud.crud_inbounds import ConflictPolicy, inbounds
+from ..database.db.session import get_session
+from ..database.schemas.inbounds import InboundsCreate
+
+Compression = t.Literal['gzip', 'zstd']
+COMPRESSIONS: t.Tuple[Compression, ...] = t.get_args(Compression)
+
+_SUFFIXES: t.Dict[str, Compression] = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+
+
+class ImportReport(BaseModel):
+    """
+    Result of `import_inbounds`
+
+    Keyword Args:
+        inserted (int): New inbounds
+        updated (int): Existing inbounds overwritten
+        skipped (int): Rows left out because their port or tag exists
+    """
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+
+def _compression(path: t.Union[str, Path], compression: t.Optional[Compression]) -> t.Optional[Compression]:
+    if compression is not None:
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression: {compression!r} | {list(COMPRESSIONS)}')
+        return compression
+    if str(path) == '-':
+        return None
+
+    return _SUFFIXES.get(Path(path).suffix.lower())
+
+
+@contextlib.contextmanager
+def open_ndjson(
+        path: t.Union[str, Path], mode: t.Literal['r', 'w'], *, compression: t.Optional[Compression] = None
+) -> t.Iterator[t.TextIO]:
+    """
+    Open an NDJSON file as text, through gzip or zstd when asked or when the suffix says so
+
+    Args:
+        path (Union[str, Path]): File, `-` for stdin/stdout
+        mode (Literal['r', 'w']): Read or write
+        compression (Optional[Literal['gzip', 'zstd']]): Compression (default: from the suffix)
+
+    Yields:
+        TextIO: Text stream
+
+    Raises:
+        ValueError: On an unknown compression
+        ImportError: For zstd without the `zstandard` package
+    """
+
+    compression = _compression(path, compression)
+    if compression == 'zstd':
+        # before opening the file, so a missing package does not leave an empty export behind
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise ImportError("zstd compression needs the zstandard package: pip install 'xtls-crud[zstd]'") from exc
+
+    if str(path) == '-':
+        raw = (sys.stdin if mode == 'r' else sys.stdout).buffer
+        close_raw = False
+    else:
+        raw = open(path, f'{mode}b')
+        close_raw = True
+
+    try:
+        if compression == 'gzip':
+            binary = gzip.GzipFile(fileobj=raw, mode=mode)
+        elif compression == 'zstd':
+            if mode == 'r':
+                binary = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+            else:
+                binary = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+        else:
+            binary = raw
+
+        stream = io.TextIOWrapper(binary, encoding='utf-8', newline='\n')
+        try:
+            yield stream
+        finally:
+            if binary is raw and not close_raw:
+                # flush, but leave stdin/stdout open
+                stream.detach()
+            else:
+                stream.close()
+    finally:
+        if close_raw:
+            raw.close()
+
+
+async def export_inbounds(
+        path: t.Union[str, Path],
+        *,
+        compression: t.Optional[Compression] = None,
+        filters: t.Optional[t.Dict[str, t.Any]] = None,
+        batch_size: int = 1000
+) -> int:
+    """
+    Write inbounds to an NDJSON file, in id order
+
+    Args:
+        path (Union[str, Path]): File, `-` for stdout
+        compression (Optional[Literal['gzip', 'zstd']]): Compression (default: from the suffix)
+        filters (Optional[Dict[str, Any]]): Column equality filters (see `CRUDBase.stream`)
+        batch_size (int): Rows fetched (and written) at a time
+
+    Returns:
+        int: Number of exported inbounds
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.transfer import export_inbounds
+
+        count = await export_inbounds('inbounds.ndjson.gz')
+        ```
+    """
+
+    columns = inbounds.model.__table__.columns.keys()
+    count = 0
+
+    with open_ndjson(path, 'w', compression=compression) as file:
+        async with get_session():
+            async for batch in inbounds.stream(filters=filters, batch_size=batch_size, batches=True):
+                file.write(''.join(
+                    json.dumps({column: getattr(obj, column) for column in columns}, separators=(',', ':'),
+                               ensure_ascii=False) + '\n'
+                    for obj in batch
+                ))
+                count += len(batch)
+
+    return count
+
+
+async def import_inbounds(
+        path: t.Union[str, Path],
+        *,
+        on_conflict: ConflictPolicy = 'fail',
+        compression: t.Optional[Compression] = None,
+        chunk_size: int = 500
+) -> ImportReport:
+    """
+    Read inbounds from an NDJSON file, one transaction per `chunk_size` lines
+
+    Ids are not imported, the database assigns new ones. A failing chunk writes nothing, chunks before it stay
+    committed.
+
+    Args:
+        path (Union[str, Path]): File, `-` for stdin
+        on_conflict (Literal['skip', 'overwrite', 'fail']): What to do with an inbound whose port or tag exists
+            (see `CRUDInbounds.import_many`)
+        compression (Optional[Literal['gzip', 'zstd']]): Compression (default: from the suffix)
+        chunk_size (int): Inbounds per transaction
+
+    Returns:
+        ImportReport: Counters
+
+    Raises:
+        ValueError: On an invalid line (with its number), or a conflict (see `CRUDInbounds.import_many`)
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.transfer import import_inbounds
+
+        report = await import_inbounds('inbounds.ndjson.gz', on_conflict='skip')
+        ```
+    """
+
+    report = ImportReport()
+
+    async def flush(rows):
+        counts = await inbounds.import_many(rows=rows, on_conflict=on_conflict)
+        report.inserted += counts['inserted']
+        report.updated += counts['updated']
+        report.skipped += counts['skipped']
+
+    with open_ndjson(path, 'r', compression=compression) as file:
+        async with get_session():
+            rows = []
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+
+                try:
+                    rows.append(InboundsCreate(**json.loads(line)).dict())
+                except (ValueError, TypeError, ValidationError) as exc:
+                    raise ValueError(f'Invalid inbound on line {number}: {exc}') from exc
+
+                if len(rows) >= chunk_size:
+                    await flush(rows)
+                    rows = []
+
+            if rows:
+                await flush(rows)
+
+    return report
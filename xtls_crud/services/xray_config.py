@@ -0,0 +1,246 @@
+"""
+# Xray config renderer
+
+Writes the `inbounds` array of an Xray `config.json` from the enabled inbounds.
+
+Rows are streamed from the database, each inbound is serialised to a JSON fragment that is cached under a hash of its
+row, and the file is streamed fragment by fragment into a temporary file that atomically replaces the config. After a
+single change only that inbound is serialised again, and nothing is written when no inbound changed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import typing as t
+from pathlib import Path
+
+from pydantic import BaseModel
+from sqlalchemy.future import select
+
+from ..core.settings import settings
+from ..database.crud.crud_inbounds import inbounds
+from ..database.db.session import get_session
+from ..database.models.inbounds import Inbounds
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = (
+    Inbounds.id, Inbounds.listen, Inbounds.port, Inbounds.protocol, Inbounds.settings, Inbounds.stream_settings,
+    Inbounds.tag, Inbounds.sniffing,
+)
+
+
+class RenderReport(BaseModel):
+    """
+    Result of `ConfigRenderer.render`
+
+    Keyword Args:
+        rendered (int): Inbounds serialised by this run
+        reused (int): Inbounds served from the fragment cache
+        invalid (List[str]): Tags of the inbounds left out because a JSON column does not parse
+        written (bool): Whether the config file was (re)written
+    """
+
+    rendered: int = 0
+    reused: int = 0
+    invalid: t.List[str] = []
+    written: bool = False
+
+
+def render_inbound(
+        *, listen: t.Optional[str], port: int, protocol: str, settings: str, stream_settings: str, tag: str,
+        sniffing: str
+) -> str:
+    """
+    Xray inbound object of a row, as compact JSON
+
+    Args:
+        listen (Optional[str]): Listen address (left out when empty)
+        port (int): Port
+        protocol (str): Protocol
+        settings (str): Settings JSON
+        stream_settings (str): Stream settings JSON
+        tag (str): Tag
+        sniffing (str): Sniffing JSON
+
+    Returns:
+        str: JSON object
+
+    Raises:
+        ValueError: If a JSON column does not parse
+    """
+
+    inbound = {}
+    if listen:
+        inbound['listen'] = listen
+    inbound.update(
+        port=port,
+        protocol=protocol,
+        settings=json.loads(settings or '{}'),
+        streamSettings=json.loads(stream_settings or '{}'),
+        tag=tag,
+        sniffing=json.loads(sniffing or '{}'),
+    )
+
+    return json.dumps(inbound, separators=(',', ':'), ensure_ascii=False)
+
+
+def _row_hash(row: t.Sequence[t.Any]) -> bytes:
+    return hashlib.blake2b('\x1f'.join(map(str, row)).encode(), digest_size=16).digest()
+
+
+class ConfigRenderer:
+    """
+    Renders enabled inbounds into an Xray config file
+
+    Keep one instance around, its fragment cache is what makes regeneration incremental.
+
+    Keyword Args:
+        path (Union[str, Path]): Config file to write
+        template (Optional[Union[dict, str, Path]]): Rest of the config (`log`, `api`, `outbounds`, `routing`...), as a
+            dict or a JSON file. Its own `inbounds` (e.g. the `api` one) are kept before the rendered ones
+        batch_size (int): Rows fetched per round trip
+
+    Examples:
+        ```py linenums="1"
+        from xtls_crud.services.xray_config import ConfigRenderer
+
+        renderer = ConfigRenderer(path='/usr/local/x-ui/bin/config.json', template='/etc/xray/template.json')
+        report = await renderer.render()
+        print(report.rendered, report.reused, report.written)
+        ```
+    """
+
+    def __init__(
+            self,
+            *,
+            path: t.Union[str, Path],
+            template: t.Optional[t.Union[dict, str, Path]] = None,
+            batch_size: int = 500
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+
+        if template is None:
+            template = {}
+        elif not isinstance(template, dict):
+            template = json.loads(Path(template).read_text())
+
+        template = dict(template)
+        self._static = [json.dumps(inbound, separators=(',', ':'), ensure_ascii=False)
+                        for inbound in template.pop('inbounds', None) or []]
+        self._head = json.dumps(template, indent=2, ensure_ascii=False)[:-1].rstrip()
+
+        self._fragments: t.Dict[int, t.Tuple[bytes, str]] = {}
+
+    def invalidate(self) -> None:
+        """
+        Drop the fragment cache, the next `render` serialises and writes everything
+        """
+
+        self._fragments.clear()
+
+    async def render(self) -> RenderReport:
+        """
+        Stream the enabled inbounds and rewrite the config file if any of them changed
+
+        Returns:
+            RenderReport: Counters
+        """
+
+        report = RenderReport()
+        fragments: t.Dict[int, t.Tuple[bytes, str]] = {}
+
+        query = select(*_COLUMNS).where(Inbounds.enable == True).order_by(Inbounds.id).execution_options(  # noqa
+            yield_per=self.batch_size)
+
+        async with get_session():
+            result = await inbounds.session.stream(query)
+            try:
+                async for row in result:
+                    id_, *columns = row
+                    digest = _row_hash(columns)
+
+                    cached = self._fragments.get(id_)
+                    if cached is not None and cached[0] == digest:
+                        fragments[id_] = cached
+                        report.reused += 1
+                        continue
+
+                    listen, port, protocol, settings_, stream_settings, tag, sniffing = columns
+                    try:
+                        fragment = render_inbound(
+                            listen=listen, port=port, protocol=protocol, settings=settings_,
+                            stream_settings=stream_settings, tag=tag, sniffing=sniffing)
+                    except ValueError:
+                        logger.warning('Inbound %s left out of the Xray config: invalid JSON', tag)
+                        report.invalid.append(tag)
+                        continue
+
+                    fragments[id_] = (digest, fragment)
+                    report.rendered += 1
+            finally:
+                await result.close()
+
+        changed = report.rendered or fragments.keys() != self._fragments.keys()
+        self._fragments = fragments
+
+        if changed or not self.path.exists():
+            self._write(fragment for _, fragment in fragments.values())
+            report.written = True
+
+        return report
+
+    def _write(self, fragments: t.Iterable[str]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # mkstemp creates 0600, keep the config readable by an Xray running as another user
+        try:
+            mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                os.fchmod(file.fileno(), mode)
+                file.write(self._head)
+                file.write(',\n  "inbounds": [\n    ' if len(self._head) > 1 else '\n  "inbounds": [\n    ')
+
+                first = True
+                for fragment in (*self._static, *fragments):
+                    if not first:
+                        file.write(',\n    ')
+                    file.write(fragment)
+                    first = False
+
+                file.write('\n  ]\n}\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+
+async def render_config(
+        *, path: t.Optional[t.Union[str, Path]] = None, template: t.Optional[t.Union[str, Path]] = None
+) -> RenderReport:
+    """
+    Render the config once (see `ConfigRenderer`)
+
+    Args:
+        path (Optional[Union[str, Path]]): Config file (default: `XRAY_CONFIG_PATH`)
+        template (Optional[Union[str, Path]]): Template file (default: `XRAY_CONFIG_TEMPLATE`)
+
+    Returns:
+        RenderReport: Counters
+    """
+
+    return await ConfigRenderer(
+        path=path or settings.XRAY_CONFIG_PATH, template=template or settings.XRAY_CONFIG_TEMPLATE).render()
@@ -2,4 +2,10 @@
 # XTLS_CRUD utils
 
 [Builders](builders)
+
+[Bulk parsing](bulk)
+
+[Cache](cache)
+
+[Ports](ports)
 """
\ No newline at end of file
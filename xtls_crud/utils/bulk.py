@@ -0,0 +1,87 @@
+"""
+# Bulk parsing
+
+Applies a scalar parser to many values at once (e.g. a CSV column of quotas), returning the results as an int64 array
+plus an error mask instead of raising on the first bad value.
+
+Every distinct value is parsed once: imported columns are very repetitive (most inbounds share a handful of quotas),
+so the cost is one dict lookup per value. With NumPy installed (the `numpy` extra) the results are gathered with one
+fancy-indexing operation into `numpy.int64`/`numpy.bool_` arrays, otherwise an `array('q')` and a list of booleans are
+returned.
+"""
+
+import typing as t
+from array import array
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+# errors a parser may raise for a bad value, anything else is a bug and propagates
+PARSE_ERRORS = (ValueError, TypeError, ArithmeticError)
+
+
+def parse_many(
+        values: t.Iterable[t.Any], parse: t.Callable[[t.Any], int], *, use_numpy: t.Optional[bool] = None
+) -> t.Tuple[t.Sequence[int], t.Sequence[bool]]:
+    """
+    Parse every value with `parse`
+
+    Args:
+        values (Iterable[Any]): Values
+        parse (Callable[[Any], int]): Scalar parser, raising one of `PARSE_ERRORS` on a bad value
+        use_numpy (Optional[bool]): Return NumPy arrays (default: when NumPy is installed)
+
+    Returns:
+        Tuple[Sequence[int], Sequence[bool]]: Parsed values (`0` where invalid) and the error mask (`True` where
+            invalid), as NumPy arrays or as an `array('q')` and a list
+
+    Raises:
+        ImportError: If `use_numpy` is set without NumPy installed
+    """
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError("NumPy arrays need the numpy package: pip install 'xtls-crud[numpy]'")
+
+    codes = {}
+    parsed: t.List[t.Optional[int]] = []
+    indexes = array('q')
+
+    for value in values:
+        # keyed by type too, so that `1`, `1.0` and `True` are parsed separately
+        key = value if type(value) is str else (type(value), value)
+        try:
+            code = codes.get(key)
+        except TypeError:  # unhashable
+            code, key = None, None
+
+        if code is None:
+            code = len(parsed)
+            try:
+                result = parse(value)
+                if not _INT64_MIN <= result <= _INT64_MAX:
+                    result = None
+            except PARSE_ERRORS:
+                result = None
+
+            parsed.append(result)
+            if key is not None:
+                codes[key] = code
+
+        indexes.append(code)
+
+    if use_numpy:
+        lookup = numpy.fromiter((0 if result is None else result for result in parsed), numpy.int64, len(parsed))
+        invalid = numpy.fromiter((result is None for result in parsed), numpy.bool_, len(parsed))
+        positions = numpy.frombuffer(indexes, numpy.int64) if indexes else numpy.empty(0, numpy.int64)
+        return lookup[positions], invalid[positions]
+
+    return (
+        array('q', [0 if parsed[code] is None else parsed[code] for code in indexes]),
+        [parsed[code] is None for code in indexes],
+    )
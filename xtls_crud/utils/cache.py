@@ -0,0 +1,153 @@
+"""
+# In-process caches
+"""
+
+import time
+import typing as t
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded LRU cache with an optional time to live
+
+    Keys can belong to a group (e.g. every lookup key of one row), invalidating any key drops its whole group.
+
+    Keyword Args:
+        maxsize (int): Maximum number of keys, least recently used ones are evicted first
+        ttl (Optional[float]): Seconds a key stays valid (None: until evicted or invalidated)
+
+    ```python title="Example"
+    from xtls_crud.utils.cache import LRUCache
+
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set(('tag', 'inbound-443'), 'row', group=1)
+    cache.set(('port', 443), 'row', group=1)
+
+    cache.invalidate(('port', 443))
+    print(cache.get(('tag', 'inbound-443')), cache.stats())
+    ```
+
+    ```shell title="Output"
+    None {'hits': 0, 'misses': 1, 'size': 0, 'maxsize': 2}
+    ```
+    """
+
+    def __init__(self, *, maxsize: int = 1024, ttl: t.Optional[float] = 30.0):
+        if maxsize < 1:
+            raise ValueError('maxsize must be positive')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._data: 'OrderedDict[t.Hashable, t.Tuple[float, t.Any, t.Hashable]]' = OrderedDict()
+        self._groups: t.Dict[t.Hashable, t.Set[t.Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        """
+        Get a value, counting a hit or a miss
+
+        Args:
+            key (Hashable): Key
+            default (Any): Returned on miss
+
+        Returns:
+            Any: Cached value, or `default`
+        """
+
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value, _ = entry
+            if expires_at >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+            self._pop(key)
+
+        self.misses += 1
+        return default
+
+    def set(self, key: t.Hashable, value: t.Any, *, group: t.Hashable = None) -> None:
+        """
+        Set a value, evicting the least recently used keys above `maxsize`
+
+        Args:
+            key (Hashable): Key
+            value (Any): Value
+            group (Hashable): Group the key belongs to
+        """
+
+        self._pop(key)
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        self._data[key] = (expires_at, value, group)
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+
+        while len(self._data) > self.maxsize:
+            self._pop(next(iter(self._data)))
+
+    def invalidate(self, key: t.Hashable) -> None:
+        """
+        Drop a key and every key of its group
+
+        Args:
+            key (Hashable): Key
+        """
+
+        entry = self._data.get(key)
+        if entry is None:
+            return
+
+        if entry[2] is None:
+            self._pop(key)
+        else:
+            self.invalidate_group(entry[2])
+
+    def invalidate_group(self, group: t.Hashable) -> None:
+        """
+        Drop every key of a group
+
+        Args:
+            group (Hashable): Group
+        """
+
+        for key in list(self._groups.get(group, ())):
+            self._pop(key)
+
+    def clear(self) -> None:
+        """
+        Drop every key (counters are kept)
+        """
+
+        self._data.clear()
+        self._groups.clear()
+
+    def stats(self) -> t.Dict[str, int]:
+        """
+        Hit/miss counters and size
+
+        Returns:
+            Dict[str, int]: `hits`, `misses`, `size` and `maxsize`
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def _pop(self, key: t.Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+
+        keys = self._groups.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[entry[2]]
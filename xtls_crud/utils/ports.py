@@ -0,0 +1,221 @@
+"""
+# Port allocation
+"""
+
+import time
+import typing as t
+from collections import OrderedDict
+
+MAX_PORT = 65535
+
+_WORDS = (MAX_PORT + 1) // 64
+_FULL = (1 << 64) - 1
+
+PortRange = t.Tuple[int, int]
+
+
+class PortBitmap:
+    """
+    65536 bit set of used ports, stored as 1024 words of 64 bits
+
+    Keyword Args:
+        ports (Iterable[int]): Ports to mark as used
+    """
+
+    def __init__(self, ports: t.Iterable[int] = ()):
+        self._words = [0] * _WORDS
+        for port in ports:
+            self.add(port)
+
+    def __contains__(self, port: int) -> bool:
+        return 0 <= port <= MAX_PORT and bool(self._words[port >> 6] >> (port & 63) & 1)
+
+    def __len__(self) -> int:
+        return sum(bin(word).count('1') for word in self._words)
+
+    def add(self, port: int) -> None:
+        self._words[port >> 6] |= 1 << (port & 63)
+
+    def discard(self, port: int) -> None:
+        self._words[port >> 6] &= ~(1 << (port & 63))
+
+    def first_free(self, start: int, stop: int) -> t.Optional[int]:
+        """
+        Lowest free port in `[start, stop]`, skipping full words
+
+        Args:
+            start (int): First port
+            stop (int): Last port (inclusive)
+
+        Returns:
+            Optional[int]: Free port, `None` when the range is full
+        """
+
+        port = start
+        while port <= stop:
+            index, offset = port >> 6, port & 63
+            # bits below `offset` count as used
+            word = self._words[index] | ((1 << offset) - 1)
+            if word != _FULL:
+                free = (index << 6) | ((~word & (word + 1)).bit_length() - 1)
+                return free if free <= stop else None
+            port = (index + 1) << 6
+
+        return None
+
+
+class PortAllocator:
+    """
+    Hands out free ports from configured ranges
+
+    Every range keeps a next-fit cursor, so consecutive allocations do not rescan the used part of the range.
+    Allocated ports are reserved until they are `commit`ed (the row was written), `release`d, or `reserve_ttl`
+    expires.
+
+    Keyword Args:
+        ranges (Sequence[Tuple[int, int]]): Inclusive `(first, last)` port ranges, tried in order
+        used (Iterable[int]): Ports already taken
+        reserve_ttl (Optional[float]): Seconds a reservation is kept (None: until committed or released)
+
+    ```python title="Example"
+    from xtls_crud.utils.ports import PortAllocator
+
+    allocator = PortAllocator(ranges=[(10000, 10002)], used=[10000])
+    port = allocator.allocate()
+    allocator.commit(port)
+    print(port, allocator.allocate(), allocator.allocate())
+    ```
+
+    ```shell title="Output"
+    10001 10002 None
+    ```
+    """
+
+    def __init__(
+            self,
+            *,
+            ranges: t.Sequence[PortRange] = ((10000, MAX_PORT),),
+            used: t.Iterable[int] = (),
+            reserve_ttl: t.Optional[float] = 300.0
+    ):
+        for first, last in ranges:
+            if not 0 < first <= last <= MAX_PORT:
+                raise ValueError(f'Invalid port range: {first}-{last}')
+
+        self.ranges = [tuple(r) for r in ranges]
+        self.reserve_ttl = reserve_ttl
+        self.loaded_at = time.monotonic()
+        # set when used ports changed in a way the allocator could not follow, `load` clears it
+        self.stale = False
+
+        self._bitmap = PortBitmap(used)
+        # reservations share one ttl, so insertion order is expiry order
+        self._reserved: 'OrderedDict[int, float]' = OrderedDict()
+        self._cursors: t.Dict[PortRange, int] = {}
+
+    def __contains__(self, port: int) -> bool:
+        self._expire()
+        return port in self._bitmap
+
+    def load(self, used: t.Iterable[int]) -> None:
+        """
+        Replace the used ports (live reservations are kept)
+
+        Args:
+            used (Iterable[int]): Ports taken in the database
+        """
+
+        self._expire()
+        self._bitmap = PortBitmap(used)
+        for port in self._reserved:
+            self._bitmap.add(port)
+
+        self._cursors.clear()
+        self.loaded_at = time.monotonic()
+        self.stale = False
+
+    def allocate(self, *, ranges: t.Optional[t.Sequence[PortRange]] = None) -> t.Optional[int]:
+        """
+        Reserve a free port
+
+        Args:
+            ranges (Optional[Sequence[Tuple[int, int]]]): Ranges to allocate from (default: the configured ones)
+
+        Returns:
+            Optional[int]: Port, `None` when every range is full
+        """
+
+        self._expire()
+
+        for first, last in ranges or self.ranges:
+            key = (first, last)
+            cursor = self._cursors.get(key, first)
+
+            port = self._bitmap.first_free(cursor, last)
+            if port is None and cursor > first:
+                port = self._bitmap.first_free(first, cursor - 1)
+
+            if port is not None:
+                self._bitmap.add(port)
+                self._reserved[port] = time.monotonic() + self.reserve_ttl if self.reserve_ttl is not None \
+                    else float('inf')
+                self._cursors[key] = port + 1 if port < last else first
+                return port
+
+        return None
+
+    def allocate_many(self, count: int, *, ranges: t.Optional[t.Sequence[PortRange]] = None) -> t.List[int]:
+        """
+        Reserve `count` free ports, all or nothing
+
+        Args:
+            count (int): Number of ports
+            ranges (Optional[Sequence[Tuple[int, int]]]): Ranges to allocate from (default: the configured ones)
+
+        Returns:
+            List[int]: Ports
+
+        Raises:
+            ValueError: If the ranges do not have `count` free ports
+        """
+
+        ports = []
+        for _ in range(count):
+            port = self.allocate(ranges=ranges)
+            if port is None:
+                for port_ in ports:
+                    self.release(port_)
+                raise ValueError(f'Not enough free ports: {count} requested')
+            ports.append(port)
+
+        return ports
+
+    def commit(self, port: int) -> None:
+        """
+        Mark a port as used by a written row, dropping its reservation
+
+        Args:
+            port (int): Port
+        """
+
+        self._reserved.pop(port, None)
+        self._bitmap.add(port)
+
+    def release(self, port: int) -> None:
+        """
+        Free a port (reserved, or used by a row that was deleted or moved)
+
+        Args:
+            port (int): Port
+        """
+
+        self._reserved.pop(port, None)
+        self._bitmap.discard(port)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._reserved:
+            port, expires_at = next(iter(self._reserved.items()))
+            if expires_at >= now:
+                break
+            self.release(port)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from .. import deps
 from .endpoints import login, users, home, builders, inbounds_crud  # noqa F401
 
 api_router = APIRouter()
 
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(builders.router, prefix="/builders", tags=["builders"])
-api_router.include_router(inbounds_crud.router, prefix="/inbounds", tags=["inbounds"])
+api_router.include_router(
+    builders.router, prefix="/builders", tags=["builders"], dependencies=[Depends(deps.get_xui_db)])
+api_router.include_router(
+    inbounds_crud.router, prefix="/inbounds", tags=["inbounds"], dependencies=[Depends(deps.get_xui_db)])
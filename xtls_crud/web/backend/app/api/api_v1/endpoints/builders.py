@@ -1,10 +1,12 @@
 import typing as t
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, HTTPException
 
 from ... import deps
 from ....database import models
 
+from .......database import crud
+
 from .......utils.builders.inbounds_builder import (
     EasyInboundBuilder
 )
@@ -25,8 +27,17 @@ async def client_creator(
 ) -> t.Any:
     """
     Build a setting.
+
+    Without `port`, a port that is free right now is filled in. The setting is not saved, so the port is not reserved.
     """
 
+    if obj_in.port is None:
+        try:
+            obj_in.port = await crud.inbounds.allocate_port()
+        except ValueError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        crud.inbounds.release_port(obj_in.port)
+
     _ = EasyInboundBuilder().with_user_id(obj_in.user_id).with_up(obj_in.up).with_down(obj_in.down).with_total(
         obj_in.total).with_remark(obj_in.remark).with_enable(obj_in.enable).with_expiry_time(
         obj_in.expiry_time).with_listen(
@@ -1,11 +1,13 @@
+import time
 import typing as t
 
-from fastapi import APIRouter, Depends, Request, Query, HTTPException
+from fastapi import APIRouter, Depends, Request, Response, Query, HTTPException
 
 from ... import deps
+from ....core.settings import settings
 from ....database import models
 from .......models.inbounds.easy_inbounds_builder import ProtocolsType
-from .......models.inbounds.inbounds import PrettyInbound
+from .......models.inbounds.inbounds import PrettyInbound, pretty_inbounds_json
 from .......models.inbounds.easy_inbounds_builder import (
     EasyBuilderSchemaCreate
 )
@@ -25,26 +27,67 @@ router = APIRouter()
 @deps.limiter.limit('1/minute', per_method=True)
 async def read_data(
         request: Request,
+        response: Response,
         user_id: t.Optional[int] = Query(None, title="User ID", description="User ID"),
         enabled: t.Optional[bool] = Query(None, title="Enabled", description="Enabled"),
         port: t.Optional[int] = Query(None, title="Port", description="Port"),
         protocol: t.Optional[ProtocolsType] = Query(None, title="Protocol", description="Protocol"),
         tag: t.Optional[str] = Query(None, title="Tag", description="Tag"),
+        user_id_in: t.Optional[t.List[int]] = Query(None, title="User IDs", description="User ID is one of"),
+        port_gte: t.Optional[int] = Query(None, title="Port from", description="Port at least"),
+        port_lte: t.Optional[int] = Query(None, title="Port to", description="Port at most"),
+        protocol_in: t.Optional[t.List[ProtocolsType]] = Query(
+            None, title="Protocols", description="Protocol is one of"),
+        tag_in: t.Optional[t.List[str]] = Query(None, title="Tags", description="Tag is one of"),
+        listen_is_null: t.Optional[bool] = Query(None, title="No listen", description="Listen address is (not) NULL"),
+        expires_within: t.Optional[int] = Query(
+            None, title="Expires within", ge=0, description="Expires (or expired) within this many seconds"),
+        usage_ratio_gte: t.Optional[float] = Query(
+            None, title="Usage from", ge=0, description="(up + down) / total at least, unlimited inbounds left out"),
+        usage_ratio_lt: t.Optional[float] = Query(
+            None, title="Usage below", ge=0, description="(up + down) / total below, unlimited inbounds left out"),
         skip: int = 0,
         limit: int = 100,
+        cursor: t.Optional[str] = Query(
+            None, title="Cursor", description="Opaque cursor from the `X-Next-Cursor` header of the previous page"),
         current_user: models.User = Depends(deps.get_current_active_user),
 ) -> t.Any:
     """
     Retrieve inbounds.
+
+    Pages are keyed on `id`: pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    Every filter is applied by the database, e.g. `?enabled=true&expires_within=604800&usage_ratio_gte=0.9`.
     """
-    filters = schemas.InboundsOrderGetFilter(
+    filters = schemas.InboundsFilter(
         user_id=user_id,
         enable=enabled,
         port=port,
         protocol=protocol,
         tag=tag,
+        user_id_in=user_id_in,
+        port_gte=port_gte,
+        port_lte=port_lte,
+        protocol_in=protocol_in,
+        tag_in=tag_in,
+        listen_is_null=listen_is_null,
+        expires_within=expires_within,
+        usage_ratio_gte=usage_ratio_gte,
+        usage_ratio_lt=usage_ratio_lt,
     )
-    data = await crud.inbounds.get_multi_filter(filters=filters, skip=skip, limit=limit)
+    try:
+        data = await crud.inbounds.get_multi_filter(filters=filters, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    next_cursor = crud.inbounds.next_cursor(data, limit=limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    if settings.FAST_JSON_RESPONSES:
+        # same body as the response_model path, without validating and encoding it twice
+        return Response(
+            content=pretty_inbounds_json(data), media_type="application/json",
+            headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
     result = []
     for item in data:
@@ -57,6 +100,44 @@ async def read_data(
     return result
 
 
+@router.get(
+    "/stats", response_model=t.List[t.Dict[str, t.Any]],
+)
+@deps.limiter.limit('10/minute', per_method=True)
+async def read_stats(
+        request: Request,
+        group_by: t.List[str] = Query(
+            [], title="Group by", description="Columns to group by: user_id, protocol, enable, listen"),
+        metrics: t.List[str] = Query(
+            ["count", "sum_up", "sum_down"], title="Metrics",
+            description="count, enabled, sum_up, sum_down, sum_traffic, sum_total, max_traffic, min_expiry_time, "
+                        "max_expiry_time"),
+        user_id: t.Optional[int] = Query(None, title="User ID", description="User ID"),
+        enabled: t.Optional[bool] = Query(None, title="Enabled", description="Enabled"),
+        protocol: t.Optional[ProtocolsType] = Query(None, title="Protocol", description="Protocol"),
+        expires_within: t.Optional[int] = Query(
+            None, title="Expires within", ge=0, description="Only inbounds expiring within this many seconds"),
+        current_user: models.User = Depends(deps.get_current_active_user),
+) -> t.Any:
+    """
+    Aggregate statistics, computed by the database (one row per group).
+    """
+
+    expires_before = None
+    if expires_within is not None:
+        expires_before = int((time.time() + expires_within) * 1000)
+
+    try:
+        return await crud.inbounds.aggregate(
+            group_by=group_by,
+            metrics=metrics,
+            filters={"user_id": user_id, "enable": enabled, "protocol": protocol},
+            expires_before=expires_before,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 @router.post("/", response_model=PrettyInbound)
 @deps.limiter.limit('10/minute', per_method=True)
 async def add_new(
@@ -67,8 +148,17 @@ async def add_new(
 ) -> t.Any:
     """
     Build a setting.
+
+    Without `port`, a free port is allocated.
     """
 
+    allocated = obj_in.port is None
+    if allocated:
+        try:
+            obj_in.port = await crud.inbounds.allocate_port()
+        except ValueError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+
     _ = EasyInboundBuilder().with_user_id(obj_in.user_id).with_up(obj_in.up).with_down(obj_in.down).with_total(
         obj_in.total).with_remark(obj_in.remark).with_enable(obj_in.enable).with_expiry_time(
         obj_in.expiry_time).with_listen(
@@ -76,6 +166,11 @@ async def add_new(
         obj_in.network).with_security(obj_in.security).with_server_name(obj_in.server_name).with_ws_path(
         obj_in.ws_path).with_tag(obj_in.tag).with_sniffing(obj_in.sniffing).build()
 
-    result = await crud.inbounds.create(obj_in=_)
+    try:
+        result = await crud.inbounds.create(obj_in=_)
+    except Exception:
+        if allocated:
+            crud.inbounds.release_port(obj_in.port)
+        raise
 
     return PrettyInbound.from_orm(result)
@@ -12,6 +12,7 @@ from slowapi.util import get_remote_address
 
 from ..database import crud, models, schemas
 from ..database.db.session import SessionLocal
+from .....database.db.session import get_session as get_xui_session
 from ..core import security
 from ..core.settings import settings
 
@@ -33,6 +34,11 @@ async def get_db() -> Generator:
         await session.close()
 
 
+async def get_xui_db() -> Generator:
+    async with get_xui_session() as session:
+        yield session
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> models.User:
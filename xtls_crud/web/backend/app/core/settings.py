@@ -19,6 +19,9 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = 'XTLS_CRUD'
 
+    # Write inbound listings straight from the rows instead of validating and encoding them through response_model
+    FAST_JSON_RESPONSES: bool = True
+
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_USER: str = "amiwr"
     POSTGRES_PASSWORD: str = "0024444103"
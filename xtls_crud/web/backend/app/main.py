@@ -9,6 +9,8 @@ from starlette.middleware.cors import CORSMiddleware
 
 from .api.api_v1.api import api_router
 from .core.settings import settings
+from ....core.settings import settings as core_settings
+from ....services.expiry import ExpirySweeper
 from .open_api.code_samples.samples import inbound__get, builders__post
 
 
@@ -53,6 +55,19 @@ if settings.BACKEND_CORS_ORIGINS:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+expiry_sweeper = ExpirySweeper(max_interval=core_settings.EXPIRY_SWEEP_MAX_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_expiry_sweeper():
+    if core_settings.EXPIRY_SWEEP:
+        expiry_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def stop_expiry_sweeper():
+    await expiry_sweeper.stop()
+
 
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next, *args, **kwargs):